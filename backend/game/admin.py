@@ -1,35 +1,89 @@
 from django.contrib import admin
-from .models import Room, Player, GameState, Action, Vote, GameLog
+from django.db.models import Count, Q
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from .models import Room, Player, GameState, Action, Vote, GameLog, ArchivedGame
+from . import metrics
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
-    list_display = ['code', 'status', 'max_players', 'created_at']
+    list_display = ['code', 'status', 'phase', 'player_count', 'alive_players', 'max_players', 'created_at']
     list_filter = ['status', 'created_at']
+    list_select_related = ['game_state']
     search_fields = ['code']
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            alive_count=Count('players', filter=Q(players__is_alive=True))
+        )
+
+    @admin.display(ordering='game_state__phase')
+    def phase(self, room):
+        try:
+            return room.game_state.phase
+        except GameState.DoesNotExist:
+            return None
+
+    @admin.display(ordering='alive_count')
+    def alive_players(self, room):
+        return room.alive_count
 
 @admin.register(Player)
 class PlayerAdmin(admin.ModelAdmin):
-    list_display = ['nickname', 'room', 'role', 'is_alive', 'is_leader']
-    list_filter = ['role', 'is_alive', 'is_leader']
+    list_display = ['nickname', 'room', 'role', 'is_alive', 'is_leader', 'is_bot']
+    list_filter = ['role', 'is_alive', 'is_leader', 'is_bot']
+    list_select_related = ['room']
+    raw_id_fields = ['room']
     search_fields = ['nickname', 'room__code']
+    show_full_result_count = False
 
 @admin.register(GameState)
 class GameStateAdmin(admin.ModelAdmin):
-    list_display = ['room', 'phase', 'night_number', 'day_number']
+    list_display = ['room', 'phase', 'night_number', 'day_number', 'phase_started_at', 'timer_end']
     list_filter = ['phase']
+    list_select_related = ['room']
+    raw_id_fields = ['room']
 
 @admin.register(Action)
 class ActionAdmin(admin.ModelAdmin):
     list_display = ['player', 'action_type', 'target', 'night_number', 'timestamp']
     list_filter = ['action_type', 'night_number']
+    list_select_related = ['player__room', 'target__room']
+    raw_id_fields = ['player', 'target']
+    show_full_result_count = False
 
 @admin.register(Vote)
 class VoteAdmin(admin.ModelAdmin):
-    list_display = ['player', 'target', 'vote_type', 'vote_phase', 'timestamp']
+    list_display = ['player', 'target', 'vote_type', 'vote_phase', 'round', 'timestamp']
     list_filter = ['vote_type', 'vote_phase']
+    list_select_related = ['player__room', 'target__room']
+    raw_id_fields = ['player', 'target']
+    show_full_result_count = False
 
 @admin.register(GameLog)
 class GameLogAdmin(admin.ModelAdmin):
     list_display = ['room', 'phase', 'message', 'timestamp']
     list_filter = ['phase', 'timestamp']
+    list_select_related = ['room']
+    raw_id_fields = ['room']
     search_fields = ['message']
+    show_full_result_count = False
+
+@admin.register(ArchivedGame)
+class ArchivedGameAdmin(admin.ModelAdmin):
+    list_display = ['code', 'created_at', 'finished_at', 'archived_at', 'codec']
+    search_fields = ['code']
+    exclude = ['payload']
+
+
+def ops_console(request):
+    """Live load: rooms by phase, players online, action latency, stuck rooms"""
+    now = timezone.now()
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Operations',
+        'now': now,
+        'metrics': metrics.snapshot(now),
+    }
+    return TemplateResponse(request, 'admin/game/ops.html', context)
@@ -0,0 +1,319 @@
+"""Columnar export of finished games for analysis.
+
+Finished games are read from both places they live: rooms still in the
+database and ArchivedGame rows (see lifecycle.py), as the same records the
+archive stores. They are flattened into four tables:
+
+- games: one row per game, with its role mix, winner and length.
+- players: role, fate (how and when they died) and speaking time.
+- actions: night actions and hunter kills, with the roles on both ends.
+- votes: every ballot, runoffs included, with the roles on both ends.
+
+A game's ``game_id`` is its code and end time, which stays the same when
+the game moves from the live tables to the archive. Games are read
+ANALYTICS_BATCH_SIZE at a time and each batch is written out before the
+next is read, so memory stays bounded however many games there are.
+Parquet needs pyarrow; without it the export is CSV. Player nicknames are
+left out.
+"""
+import csv
+import io
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .lifecycle import build_game_records
+from .models import Room, ArchivedGame
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet is optional, CSV is always available
+    pyarrow = None
+
+# Games that ended within this long are left for the next run, so one
+# still committing can't slip in behind an incremental checkpoint
+SETTLE = timedelta(minutes=1)
+
+TABLES = {
+    'games': [
+        ('game_id', 'string'), ('code', 'string'), ('source', 'string'),
+        ('created_at', 'timestamp'), ('finished_at', 'timestamp'),
+        ('winner', 'string'), ('reason', 'string'), ('players', 'int'),
+        ('num_wolves', 'int'), ('num_seers', 'int'), ('num_protectors', 'int'),
+        ('num_hunters', 'int'), ('nights', 'int'), ('days', 'int'),
+    ],
+    'players': [
+        ('game_id', 'string'), ('player_id', 'int'), ('role', 'string'),
+        ('survived', 'bool'), ('leader_at_end', 'bool'), ('death_cause', 'string'),
+        ('death_night', 'int'), ('death_day', 'int'), ('speaking_time_used', 'int'),
+    ],
+    'actions': [
+        ('game_id', 'string'), ('player_id', 'int'), ('role', 'string'),
+        ('action_type', 'string'), ('target_id', 'int'), ('target_role', 'string'),
+        ('night_number', 'int'), ('timestamp', 'timestamp'),
+    ],
+    'votes': [
+        ('game_id', 'string'), ('player_id', 'int'), ('role', 'string'),
+        ('vote_type', 'string'), ('target_id', 'int'), ('target_role', 'string'),
+        ('vote_phase', 'int'), ('round', 'int'), ('timestamp', 'timestamp'),
+    ],
+}
+
+FORMATS = ['parquet', 'csv']
+
+
+def default_format():
+    return 'parquet' if pyarrow is not None else 'csv'
+
+
+def as_datetime(value):
+    # Archived records went through JSON, live ones didn't
+    return parse_datetime(value) if isinstance(value, str) else value
+
+
+def game_rows(source, record):
+    """Rows for each table from one game record"""
+    room = record['room']
+    ended_at = as_datetime(room['finished_at'] or room['created_at'])
+    game_id = f"{room['code']}@{ended_at.isoformat()}"
+    roles = {player['id']: player['role'] for player in record['players']}
+
+    ended, deaths = {}, {}
+    for event in record['events']:
+        payload = event['payload']
+        if event['event_type'] == 'game_ended':
+            ended = payload
+        elif event['event_type'] == 'killed':
+            deaths[payload['player_id']] = (payload.get('cause'), payload.get('night_number'), None)
+        elif event['event_type'] == 'eliminated':
+            deaths[payload['player_id']] = ('vote', None, payload.get('day_number'))
+
+    state = record['game_state'] or {}
+    rows = {
+        'games': [{
+            'game_id': game_id,
+            'code': room['code'],
+            'source': source,
+            'created_at': as_datetime(room['created_at']),
+            'finished_at': as_datetime(room['finished_at']),
+            'winner': ended.get('winner'),
+            'reason': ended.get('reason'),
+            'players': len(record['players']),
+            'num_wolves': room['num_wolves'],
+            'num_seers': room['num_seers'],
+            'num_protectors': room['num_protectors'],
+            'num_hunters': room['num_hunters'],
+            'nights': state.get('night_number'),
+            'days': state.get('day_number'),
+        }],
+        'players': [],
+        'actions': [],
+        'votes': [],
+    }
+    for player in record['players']:
+        cause, night, day = deaths.get(player['id'], (None, None, None))
+        rows['players'].append({
+            'game_id': game_id,
+            'player_id': player['id'],
+            'role': player['role'],
+            'survived': player['is_alive'],
+            'leader_at_end': player['is_leader'],
+            'death_cause': cause,
+            'death_night': night,
+            'death_day': day,
+            'speaking_time_used': player['speaking_time_used'],
+        })
+    for action in record['actions']:
+        rows['actions'].append({
+            'game_id': game_id,
+            'player_id': action['player_id'],
+            'role': roles.get(action['player_id']),
+            'action_type': action['action_type'],
+            'target_id': action['target_id'],
+            'target_role': roles.get(action['target_id']),
+            'night_number': action['night_number'],
+            'timestamp': as_datetime(action['timestamp']),
+        })
+    for vote in record['votes']:
+        rows['votes'].append({
+            'game_id': game_id,
+            'player_id': vote['player_id'],
+            'role': roles.get(vote['player_id']),
+            'vote_type': vote['vote_type'],
+            'target_id': vote['target_id'],
+            'target_role': roles.get(vote['target_id']),
+            'vote_phase': vote['vote_phase'],
+            'round': vote['round'],
+            'timestamp': as_datetime(vote['timestamp']),
+        })
+    return rows
+
+
+def pages(queryset, since, until, batch_size):
+    """Finished games ending in (since, until], oldest first, a page at a time"""
+    queryset = queryset.annotate(ended_at=Coalesce('finished_at', 'created_at'))
+    queryset = queryset.filter(ended_at__lte=until)
+    if since is not None:
+        queryset = queryset.filter(ended_at__gt=since)
+    queryset = queryset.order_by('ended_at', 'id')
+
+    after = None
+    while True:
+        page = queryset
+        if after is not None:
+            page = page.filter(Q(ended_at__gt=after[0]) | Q(ended_at=after[0], id__gt=after[1]))
+        page = list(page[:batch_size])
+        if not page:
+            return
+        yield page
+        after = (page[-1].ended_at, page[-1].id)
+
+
+def export_batches(since=None, until=None, batch_size=None):
+    """Yield {table: rows} for each batch of finished games in (since, until]"""
+    batch_size = batch_size or settings.ANALYTICS_BATCH_SIZE
+    until = until or timezone.now() - SETTLE
+
+    # Live rooms first: one the reaper archives meanwhile then shows up in
+    # the archive read instead of falling between the two. Read before it
+    # was archived, it shows up in both, so archives of games already
+    # exported (same code and end time) are skipped.
+    exported = set()
+    for rooms in pages(Room.objects.filter(status='finished'), since, until, batch_size):
+        records = build_game_records(rooms)
+        batch = {table: [] for table in TABLES}
+        for room in rooms:
+            exported.add((room.code, room.ended_at))
+            for table, rows in game_rows('live', records[room.id]).items():
+                batch[table].extend(rows)
+        yield batch
+
+    for archives in pages(ArchivedGame.objects.all(), since, until, batch_size):
+        batch = {table: [] for table in TABLES}
+        for archive in archives:
+            if (archive.code, archive.ended_at) in exported:
+                continue
+            for table, rows in game_rows('archive', archive.load()).items():
+                batch[table].extend(rows)
+        yield batch
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class CsvWriter:
+    extension = 'csv'
+
+    def __init__(self, sink, columns):
+        self.sink = sink
+        self.columns = [name for name, _ in columns]
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(self.columns)
+        self.flush()
+
+    def write(self, rows):
+        for row in rows:
+            self.writer.writerow([csv_value(row[name]) for name in self.columns])
+        self.flush()
+
+    def flush(self):
+        self.sink.write(self.buffer.getvalue().encode('utf-8'))
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    extension = 'parquet'
+
+    def __init__(self, sink, columns):
+        if pyarrow is None:
+            raise RuntimeError('Parquet export requires the pyarrow package')
+        types = {
+            'string': pyarrow.string(),
+            'int': pyarrow.int64(),
+            'bool': pyarrow.bool_(),
+            'timestamp': pyarrow.timestamp('us', tz='UTC'),
+        }
+        self.schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(sink, self.schema, compression='zstd')
+
+    def write(self, rows):
+        # One row group per batch
+        if rows:
+            self.writer.write_table(pyarrow.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def writer_for(format, sink, table):
+    writer_class = ParquetWriter if format == 'parquet' else CsvWriter
+    return writer_class(sink, TABLES[table])
+
+
+class ChunkSink:
+    """Write-only file that hands back what was written since the last drain"""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_table(table, format, since=None, until=None):
+    """Yield one table as file chunks, a batch of games at a time"""
+    sink = ChunkSink()
+    writer = writer_for(format, sink, table)
+    for batch in export_batches(since, until):
+        writer.write(batch[table])
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+async def stream_table_async(table, format, since=None, until=None):
+    """stream_table for ASGI. Django buffers sync iterators whole there, so
+    each chunk is produced on the sync thread and handed over as it comes"""
+    chunks = stream_table(table, format, since, until)
+    while True:
+        chunk = await sync_to_async(next)(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,219 @@
+"""Server-side bot players.
+
+Bots fill empty seats (POST /api/rooms/{code}/add_bots/) and act whenever
+a phase asks something of them: night actions, ballots (runoffs and the
+leader's tie-break included) and passing their speaking turn. Their moves
+go through player_actions and speaking, the same rule paths as humans.
+
+Decisions run on one bounded pool per process: BOT_WORKERS threads and at
+most BOT_QUEUE_SIZE pending batches (a room's bots for one phase, moving in
+turn), beyond which new ones are dropped (and counted) rather than queued,
+so bots in thousands of rooms cannot starve request handling. Each decision scores candidates until its
+BOT_DECISION_BUDGET_MS of thread CPU time runs out and takes the best one
+found. A decision re-reads the game first and does nothing if the phase it
+was scheduled for has moved on. Decision CPU time, latency from scheduling
+to move, dropped batches and budget overruns are exposed in game.metrics.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import metrics
+from .models import Player, GameState
+
+logger = logging.getLogger(__name__)
+
+NIGHT_ROLES = ['wolf', 'seer', 'protector']
+
+
+class BotPool:
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on the pool; False if the pool is saturated"""
+        if not self.slots.acquire(blocking=False):
+            metrics.incr('bot_batches_dropped')
+            return False
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='bot')
+        self.executor.submit(self.run, fn, args)
+        return True
+
+    def run(self, fn, args):
+        close_old_connections()
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception('Bot work %s%r failed', fn.__name__, args)
+        finally:
+            close_old_connections()
+            self.slots.release()
+
+
+pool = BotPool(settings.BOT_WORKERS, settings.BOT_QUEUE_SIZE)
+
+
+class Budget:
+    """Thread CPU time allowed for one decision"""
+
+    def __init__(self, seconds):
+        self.start = time.thread_time()
+        self.deadline = self.start + seconds
+
+    def exhausted(self):
+        return time.thread_time() >= self.deadline
+
+    def spent(self):
+        return time.thread_time() - self.start
+
+
+def choose(candidates, score):
+    """Highest-scoring candidate found within the decision budget"""
+    budget = Budget(settings.BOT_DECISION_BUDGET_MS / 1000)
+    candidates = list(candidates)
+    random.shuffle(candidates)
+    best, best_score = None, None
+    for candidate in candidates:
+        value = score(candidate)
+        if best_score is None or value > best_score:
+            best, best_score = candidate, value
+        if budget.exhausted():
+            metrics.incr('bot_budget_overruns')
+            break
+    metrics.observe('bot_cpu', budget.spent())
+    return best
+
+
+def schedule(room_id, fn, bot_ids, *args):
+    """Queue fn(room_id, bot_id, *args) for each bot, one after another,
+    once the current transaction (if any) has committed"""
+    if bot_ids:
+        transaction.on_commit(
+            lambda: pool.submit(run_moves, fn, room_id, bot_ids, args, time.perf_counter())
+        )
+
+
+def run_moves(fn, room_id, bot_ids, args, queued_at):
+    # A room's bots move in turn, so they don't contend for the same rows
+    for bot_id in bot_ids:
+        fn(room_id, bot_id, *args)
+        metrics.observe('bot_decision', time.perf_counter() - queued_at)
+
+
+def living_bots(room, **filters):
+    return list(room.players.filter(is_bot=True, is_alive=True, **filters).values_list('id', flat=True))
+
+
+def night_started(room, night_number):
+    """Let every bot with a night role pick its target"""
+    schedule(room.id, night_move, living_bots(room, role__in=NIGHT_ROLES), night_number)
+
+
+def ballot_opened(room, game_state):
+    """Let bots vote on the ballot that just opened"""
+    filters = {'is_leader': True} if game_state.leader_decides else {}
+    schedule(room.id, ballot_move, living_bots(room, **filters), game_state.phase,
+             game_state.day_number, game_state.vote_round)
+
+
+def turn_started(room, speaker_id, started_at):
+    """A bot has nothing to say: hand the floor on"""
+    schedule(room.id, pass_move, [speaker_id], started_at)
+
+
+def load(room_id, bot_id):
+    game_state = GameState.objects.select_related('room').get(room_id=room_id)
+    bot = Player.objects.select_related('room').get(id=bot_id)
+    players = list(game_state.room.players.all())
+    return game_state, bot, players
+
+
+def known_wolves(bot, players):
+    """Players this bot knows to be wolves"""
+    if bot.role == 'wolf':
+        return {player.id for player in players if player.role == 'wolf'}
+    if bot.role == 'seer':
+        from .hotstate import get_store
+        inspected = get_store().seer_inspections(bot.room).get(bot.id, ())
+        return {player.id for player in players if player.id in inspected and player.role == 'wolf'}
+    return set()
+
+
+def night_move(room_id, bot_id, night_number):
+    from .player_actions import submit_night_action
+    from .hotstate import get_store
+
+    game_state, bot, players = load(room_id, bot_id)
+    if game_state.phase != 'night' or game_state.night_number != night_number or not bot.is_alive:
+        return
+    alive = [player for player in players if player.is_alive]
+
+    if bot.role == 'wolf':
+        # Leaders first: their vote counts double during the day
+        targets = [player for player in alive if player.role != 'wolf']
+        target = choose(targets, lambda player: (player.is_leader, random.random()))
+    elif bot.role == 'seer':
+        inspected = set(get_store().seer_inspections(bot.room).get(bot.id, ()))
+        targets = [player for player in alive if player.id != bot.id]
+        target = choose(targets, lambda player: (player.id not in inspected, random.random()))
+    else:
+        targets = [player for player in alive if player.id != bot.last_protected_player_id]
+        target = choose(targets, lambda player: (player.is_leader, random.random()))
+
+    if target is not None:
+        submit_night_action(bot, target)
+
+
+def ballot_move(room_id, bot_id, phase, day_number, round):
+    from .elections import ballot_of
+    from .hotstate import get_store
+    from .player_actions import submit_vote
+
+    game_state, bot, players = load(room_id, bot_id)
+    if ((game_state.phase, game_state.day_number, game_state.vote_round) != (phase, day_number, round)
+            or not bot.is_alive):
+        return
+    if game_state.leader_decides and not bot.is_leader:
+        return
+
+    candidates = [
+        player for player in players
+        if player.is_alive and player.id != bot.id
+        and (not game_state.ballot_candidates or player.id in game_state.ballot_candidates)
+    ]
+    if phase == 'leader_election':
+        target = choose(candidates, lambda player: random.random())
+    else:
+        wolves = known_wolves(bot, players)
+        leading, _ = get_store().ballot_leaders(bot.room, *ballot_of(game_state), round)
+        if bot.role == 'wolf':
+            # Follow the crowd, as long as it isn't heading for a wolf
+            score = lambda player: (player.id not in wolves, player.id in leading, random.random())
+        else:
+            score = lambda player: (player.id in wolves, player.id in leading, random.random())
+        target = choose(candidates, score)
+
+    if target is not None:
+        submit_vote(bot, target)
+
+
+def pass_move(room_id, bot_id, started_at):
+    from .game_logic import broadcast_game_update
+    from .speaking import pass_turn
+
+    game_state, bot, _ = load(room_id, bot_id)
+    if game_state.current_speaker_id != bot_id or game_state.speaker_started_at != started_at:
+        return
+    message, error = pass_turn(bot)
+    if not error:
+        broadcast_game_update(bot.room, message)
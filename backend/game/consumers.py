@@ -1,12 +1,39 @@
-import json
+import asyncio
+import random
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Room, Player, GameState
+from django.conf import settings
+from .models import Room, Player
+from .presence import tracker, presence_event
+from .ratelimit import TokenBucket
+from .spectators import get_hub, release_hub
+from .lobby import LOBBY_GROUP
+from .db_routers import replica_reads
+from .projections import projection
+from . import metrics, wire
+
+# Per-worker admission control for new sockets, so a reconnect storm after a
+# restart is spread out instead of hitting the DB thread pool all at once
+connect_bucket = TokenBucket(settings.WS_CONNECT_RATE, settings.WS_CONNECT_BURST)
+
+# Room code -> in-flight snapshot build shared by concurrent connects
+_state_builds = {}
 
 class GameConsumer(AsyncWebsocketConsumer):
+    player_id = None
+    player_token = None
+    admitted = False
+    
     async def connect(self):
         self.room_code = self.scope['url_route']['kwargs']['room_code']
         self.room_group_name = f'room_{self.room_code}'
+        self.codec, subprotocol = wire.negotiate(self.scope.get('subprotocols'))
+        self.message_bucket = TokenBucket(settings.WS_MESSAGE_RATE, settings.WS_MESSAGE_BURST)
+        
+        if not connect_bucket.try_acquire():
+            await self.reject_with_retry_hint(subprotocol)
+            return
         
         # Join room group
         await self.channel_layer.group_add(
@@ -14,14 +41,27 @@ class GameConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        await self.accept()
+        await self.accept(subprotocol=subprotocol)
+        self.admitted = True
+        tracker.register(self)
         
         # Send current game state
         game_data = await self.get_game_state()
-        await self.send(text_data=json.dumps({
+        await self.send_message({
             'type': 'initial_state',
-            'data': game_data
-        }))
+            'data': game_data,
+            'online': tracker.online_players(self.room_code)
+        })
+    
+    async def reject_with_retry_hint(self, subprotocol):
+        """Tell an over-budget client when to come back, with jitter, then close"""
+        retry_after = connect_bucket.retry_after() + random.uniform(0, settings.WS_RETRY_JITTER_SECONDS)
+        await self.accept(subprotocol=subprotocol)
+        await self.send_message({
+            'type': 'retry',
+            'retry_after_ms': int(retry_after * 1000)
+        })
+        await self.close(code=4429)
     
     async def disconnect(self, close_code):
         # Leave room group
@@ -29,60 +69,211 @@ class GameConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        
+        if self.admitted:
+            tracker.unregister(self)
+            if self.player_id and tracker.player_offline(self.room_code, self.player_id):
+                await self.channel_layer.group_send(
+                    self.room_group_name,
+                    presence_event(self.player_id, False)
+                )
+    
+    async def reap(self):
+        """Drop an idle socket: stop fan-out to it now, then close it"""
+        await self.channel_layer.group_discard(
+            self.room_group_name,
+            self.channel_name
+        )
+        await self.close(code=4000)
     
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Handle incoming WebSocket messages"""
-        data = json.loads(text_data)
+        received_at = time.time()
+        self.last_seen = time.monotonic()
+        if not self.message_bucket.try_acquire():
+            # Dropped before decoding or any DB work
+            metrics.incr('rate_limited_socket')
+            return
+        data = self.codec.decode(text_data if text_data is not None else bytes_data)
         message_type = data.get('type')
         
-        if message_type == 'ping':
-            await self.send(text_data=json.dumps({
+        if message_type == 'identify':
+            await self.identify(data.get('player_id'), data.get('token'))
+        elif message_type == 'ping':
+            await self.send_message({
                 'type': 'pong'
-            }))
+            })
+        elif message_type == 'clock_sync':
+            # NTP-style exchange: with its own send (t0) and receive times the
+            # client gets its offset from our clock and the round trip, then
+            # counts down to timer_end locally instead of polling
+            await self.send_message({
+                'type': 'clock_sync',
+                't0': data.get('t0'),
+                't1': received_at * 1000,
+                't2': time.time() * 1000
+            })
         elif message_type == 'request_state':
             game_data = await self.get_game_state()
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'state_update',
                 'data': game_data
-            }))
+            })
     
-    async def game_update(self, event):
-        """Handle game update broadcasts"""
-        await self.send(text_data=json.dumps({
-            'type': 'game_update',
-            'data': event['data']
-        }))
+    async def identify(self, player_id, token):
+        """Bind the socket to a player so their presence can be tracked"""
+        try:
+            player_id = int(player_id)
+        except (TypeError, ValueError):
+            return
+        if self.player_id or not await self.is_player(player_id, token):
+            return
+        self.player_id = player_id
+        self.player_token = token
+        if tracker.player_online(self.room_code, player_id):
+            await self.channel_layer.group_send(
+                self.room_group_name,
+                presence_event(player_id, True)
+            )
+        # initial_state was the public view; now send what this player may see
+        await self.send_message({
+            'type': 'state_update',
+            'data': await self.get_game_state()
+        })
     
     @database_sync_to_async
-    def get_game_state(self):
-        """Get current game state"""
-        try:
-            room = Room.objects.get(code=self.room_code)
-            
-            players = list(room.players.values(
-                'id', 'nickname', 'is_alive', 'is_leader'
-            ))
-            
-            try:
-                game_state = room.game_state
-                state_data = {
-                    'phase': game_state.phase,
-                    'night_number': game_state.night_number,
-                    'day_number': game_state.day_number,
-                    'current_speaker_id': game_state.current_speaker_id,
-                    'timer_end': game_state.timer_end.isoformat() if game_state.timer_end else None,
-                }
-            except GameState.DoesNotExist:
-                state_data = None
-            
-            return {
-                'room': {
-                    'code': room.code,
-                    'status': room.status,
-                    'max_players': room.max_players,
-                },
-                'players': players,
-                'game_state': state_data
-            }
-        except Room.DoesNotExist:
+    def is_player(self, player_id, token):
+        return bool(token) and Player.objects.filter(
+            id=player_id, token=token, room__code=self.room_code
+        ).exists()
+    
+    async def presence_update(self, event):
+        """Mirror a presence change into this worker and forward it"""
+        tracker.apply_remote(self.room_code, event['player_id'], event['online'])
+        await self.send_payload(wire.frame_for(event, self.codec))
+    
+    async def game_update(self, event):
+        """Forward a game update broadcast, encoded once per worker and codec"""
+        await self.send_payload(wire.frame_for(event, self.codec))
+    
+    async def send_message(self, message):
+        """Encode a message with the negotiated codec and send it"""
+        await self.send_payload(self.codec.encode(message))
+    
+    async def send_payload(self, payload):
+        """Send a payload produced by the negotiated codec"""
+        if self.codec.binary:
+            await self.send(bytes_data=payload)
+        else:
+            await self.send(text_data=payload)
+    
+    async def get_game_state(self):
+        """This socket's view of the room, sharing one load among concurrent callers"""
+        build = _state_builds.get(self.room_code)
+        if build is None:
+            build = asyncio.ensure_future(build_game_state(self.room_code))
+            _state_builds[self.room_code] = build
+            build.add_done_callback(lambda _, code=self.room_code: _state_builds.pop(code, None))
+        # shield: one caller disconnecting must not cancel everyone's build
+        views = await asyncio.shield(build)
+        if views is None:
             return {'error': 'Room not found'}
+        view = views.view(self.player_token)
+        return {
+            'room': {
+                'code': view['room']['code'],
+                'status': view['room']['status'],
+                'max_players': view['room']['max_players'],
+            },
+            'players': view['players'],
+            'game_state': view['game_state'],
+            'you': view['you'],
+        }
+
+@database_sync_to_async
+def build_game_state(room_code):
+    """Cached views of the room (from the replica unless the room was just written)"""
+    with replica_reads(room_code):
+        return read_game_state(room_code)
+
+def read_game_state(room_code):
+    try:
+        room = Room.objects.get(code=room_code)
+    except Room.DoesNotExist:
+        return None
+    return projection(room)
+
+
+class LobbyConsumer(AsyncWebsocketConsumer):
+    """Pushes lobby changes to clients browsing for a game.
+
+    Clients load pages from /api/rooms/lobby/ and apply these updates on top,
+    so browsing doesn't poll the database.
+    """
+    async def connect(self):
+        self.codec, subprotocol = wire.negotiate(self.scope.get('subprotocols'))
+        await self.channel_layer.group_add(LOBBY_GROUP, self.channel_name)
+        await self.accept(subprotocol=subprotocol)
+    
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(LOBBY_GROUP, self.channel_name)
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        """The lobby stream is one-way; incoming messages are ignored"""
+    
+    async def lobby_event(self, event):
+        """Forward a lobby change, encoded once per worker and codec"""
+        payload = wire.frame_for(event, self.codec)
+        if self.codec.binary:
+            await self.send(bytes_data=payload)
+        else:
+            await self.send(text_data=payload)
+
+class SpectatorConsumer(AsyncWebsocketConsumer):
+    """Read-only, delayed and redacted view of a room for non-players"""
+    hub = None
+    writer = None
+    
+    async def connect(self):
+        self.room_code = self.scope['url_route']['kwargs']['room_code']
+        
+        # No DB access here: the hub serves its cached view to every spectator
+        self.hub = await get_hub(self.room_code)
+        if self.hub is None:
+            await self.close()
+            return
+        
+        self.queue = asyncio.Queue(maxsize=settings.SPECTATOR_QUEUE_SIZE)
+        if not self.hub.subscribe(self):
+            return
+        await self.accept()
+        self.writer = asyncio.ensure_future(self.write_frames())
+    
+    async def disconnect(self, close_code):
+        if self.writer:
+            self.writer.cancel()
+        if self.hub:
+            self.hub.unsubscribe(self)
+            await release_hub(self.hub)
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        """Spectators can't act; incoming messages are ignored"""
+    
+    def push(self, frame):
+        """Queue a pre-encoded frame; called by the hub for every event.
+
+        Returns False if the spectator was dropped instead.
+        """
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop this spectator instead of buffering
+            self.hub.unsubscribe(self)
+            asyncio.ensure_future(self.close(code=4008))
+            return False
+        return True
+    
+    async def write_frames(self):
+        while True:
+            frame = await self.queue.get()
+            await self.send(text_data=frame)
@@ -0,0 +1,98 @@
+"""Send pure reads to a read replica, with read-your-writes pinning.
+
+Reads only go to the 'replica' database (configured by
+DATABASE_REPLICA_URL) inside ``replica_reads``, which ReplicaMiddleware
+enters for GET/HEAD requests and GameConsumer for its state snapshots;
+everything else, including every read made while handling a write, stays
+on 'default'. After a write, the room and the tokens it involved are
+pinned to the primary for REPLICA_PIN_SECONDS so that whoever just acted
+(or is watching that room) never reads a replica that hasn't caught up.
+Pins live in the cache, so they are shared between workers when the
+cache is Redis.
+"""
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+ROOM_PATH = re.compile(r'^/api/rooms/(?P<code>\w+)/')
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_enabled():
+    return REPLICA in settings.DATABASES
+
+
+def pin_keys(room_code=None, tokens=()):
+    keys = [f'primary-pin:token:{token}' for token in tokens if token]
+    if room_code:
+        keys.append(f'primary-pin:room:{room_code}')
+    return keys
+
+
+def pin_to_primary(room_code=None, tokens=()):
+    """Keep reads for this room and these tokens on the primary for a while"""
+    if replica_enabled():
+        keys = pin_keys(room_code, tokens)
+        if keys:
+            cache.set_many(dict.fromkeys(keys, True), settings.REPLICA_PIN_SECONDS)
+
+
+@contextmanager
+def replica_reads(room_code=None, tokens=()):
+    """Read from the replica in this block unless the room or tokens are pinned"""
+    keys = pin_keys(room_code, tokens)
+    if not replica_enabled() or (keys and cache.get_many(keys)):
+        yield False
+        return
+    reset = _use_replica.set(True)
+    try:
+        yield True
+    finally:
+        _use_replica.reset(reset)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_enabled():
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db == 'default'
+
+
+class ReplicaMiddleware:
+    """Route safe requests to the replica and pin after writes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_enabled():
+            return self.get_response(request)
+
+        match = ROOM_PATH.match(request.path_info)
+        room_code = match.group('code') if match else request.GET.get('room_code')
+        tokens = (request.headers.get('X-Player-Token'), request.headers.get('X-Admin-Token'))
+
+        if request.method in SAFE_METHODS:
+            with replica_reads(room_code, tokens):
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        pin_to_primary(room_code, tokens)
+        return response
@@ -0,0 +1,97 @@
+"""Ballots for leader elections and elimination votes.
+
+A ballot is (room, vote_type, day_number, round): round 0 is the first
+vote, later rounds are runoffs between tied candidates. Each process keeps
+a running tally per open ballot, updated on every vote in O(1) and
+streamed to players. A ballot this process hasn't seen yet is seeded from
+its Vote rows in one query, and resolution always reseeds, so the result
+is O(votes) and correct even when votes landed on another worker.
+"""
+import threading
+from collections import Counter
+
+from .models import Vote
+
+_tallies = {}
+_lock = threading.Lock()
+
+
+class Tally:
+    def __init__(self):
+        self.ballots = {}
+        self.counts = Counter()
+
+    def cast(self, voter_id, target_id, weight=1):
+        """Record or change a voter's ballot"""
+        previous = self.ballots.get(voter_id)
+        if previous:
+            old_target, old_weight = previous
+            self.counts[old_target] -= old_weight
+            if not self.counts[old_target]:
+                del self.counts[old_target]
+        self.ballots[voter_id] = (target_id, weight)
+        self.counts[target_id] += weight
+
+    def leaders(self):
+        """Candidates sharing the highest count, and that count"""
+        if not self.counts:
+            return [], 0
+        top = max(self.counts.values())
+        return sorted(pid for pid, count in self.counts.items() if count == top), top
+
+
+def ballot_of(game_state):
+    """Vote type and phase number of the ballot open in this game state"""
+    vote_type = 'leader' if game_state.phase == 'leader_election' else 'elimination'
+    return vote_type, game_state.day_number
+
+
+def vote_weight(vote_type, is_leader):
+    # The leader's elimination vote counts double
+    return 2 if vote_type == 'elimination' and is_leader else 1
+
+
+def load_tally(room_id, vote_type, vote_phase, round):
+    """Build a ballot's tally from its Vote rows"""
+    tally = Tally()
+    rows = Vote.objects.filter(
+        player__room_id=room_id, vote_type=vote_type, vote_phase=vote_phase, round=round
+    ).values_list('player_id', 'target_id', 'player__is_leader')
+    for voter_id, target_id, is_leader in rows:
+        tally.cast(voter_id, target_id, vote_weight(vote_type, is_leader))
+    return tally
+
+
+def tally_for(room_id, vote_type, vote_phase, round, refresh=False):
+    key = (room_id, vote_type, vote_phase, round)
+    with _lock:
+        tally = _tallies.get(key)
+    if tally is None or refresh:
+        tally = load_tally(room_id, vote_type, vote_phase, round)
+        with _lock:
+            _tallies[key] = tally
+    return tally
+
+
+def cast_vote(player, target, game_state):
+    """Store a vote on the open ballot and update its running tally"""
+    vote_type, vote_phase = ballot_of(game_state)
+    vote, created = Vote.objects.update_or_create(
+        player=player,
+        vote_type=vote_type,
+        vote_phase=vote_phase,
+        round=game_state.vote_round,
+        defaults={'target': target}
+    )
+    tally = tally_for(player.room_id, vote_type, vote_phase, game_state.vote_round)
+    with _lock:
+        tally.cast(player.id, target.id, vote_weight(vote_type, player.is_leader))
+        counts = dict(tally.counts)
+    return vote, counts
+
+
+def close_ballots(room_id):
+    """Forget every tally of a room once its ballot is resolved"""
+    with _lock:
+        for key in [key for key in _tallies if key[0] == room_id]:
+            del _tallies[key]
@@ -0,0 +1,87 @@
+"""Conditional GETs for room reads.
+
+Room details, game state, a player's role and the game log only change
+when Room.version does, so their ETags are built from the room's id and
+version (plus, for per-player reads, a digest of the player token). The
+current version comes from projections.current_version, which is a cache
+get in the common case, so a request whose If-None-Match still matches is
+answered 304 before the view runs: no query and no serialization.
+
+A response that is rendered is tagged with the version read, just before
+the view runs, from the database the view reads: a replica that lags the
+primary then tags its body with the version it has, never a newer one.
+Game state is tagged weak: its time_remaining counts down between versions.
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+from .models import Player
+from .projections import current_version, read_version
+
+
+def player_room_code(player_id):
+    """Code of the player's room; players never change rooms, so it stays cached"""
+    key = f'player_room:{player_id}'
+    code = cache.get(key)
+    if code is None:
+        code = Player.objects.filter(pk=player_id).values_list('room__code', flat=True).first()
+        if code is not None:
+            cache.set(key, code, settings.ROOM_VERSION_CACHE_SECONDS)
+    return code
+
+
+def make_etag(name, room_id, version, token=None, weak=False):
+    viewer = hashlib.blake2b(token.encode(), digest_size=8).hexdigest() if token else 'public'
+    etag = f'"{name}-{room_id}-{version}-{viewer}"'
+    return f'W/{etag}' if weak else etag
+
+
+def matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison
+    tags = parse_etags(if_none_match or '')
+    return '*' in tags or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in tags)
+
+
+def conditional(room_code, per_player=False, weak=False):
+    """ETag the view by room version and answer a matching If-None-Match with 304.
+
+    room_code(request, kwargs) names the room the view reads.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(viewset, request, *args, **kwargs):
+            code = room_code(request, kwargs)
+            current = current_version(code) if code else None
+            if current is None:
+                return view(viewset, request, *args, **kwargs)
+
+            token = request.headers.get('X-Player-Token') if per_player else None
+            etag = make_etag(view.__name__, *current, token=token, weak=weak)
+            if matches(request.headers.get('If-None-Match'), etag):
+                metrics.incr('not_modified')
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                # Read where the view reads, before it does: the body is at
+                # least this version
+                rendered = read_version(code)
+                response = view(viewset, request, *args, **kwargs)
+                if rendered is None or response.status_code != status.HTTP_200_OK:
+                    return response
+                etag = make_etag(view.__name__, *rendered, token=token, weak=weak)
+
+            response['ETag'] = etag
+            # Stored, but revalidated before every reuse
+            response['Cache-Control'] = 'private, no-cache' if per_player else 'no-cache'
+            if per_player:
+                patch_vary_headers(response, ['X-Player-Token'])
+            return response
+        return wrapper
+    return decorator
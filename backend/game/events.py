@@ -0,0 +1,123 @@
+"""Event-sourced game history.
+
+Every game transition appends a typed GameEvent. ``apply_event`` folds events
+into a plain-dict state, and a GameSnapshot of that state is stored at every
+phase change, so rebuilding a room never replays more than one phase worth
+of events. Player/GameState/Action/Vote rows are kept as the live read model.
+"""
+from .models import GameEvent, GameSnapshot
+
+
+def initial_state():
+    return {
+        'phase': 'setup',
+        'night_number': 0,
+        'day_number': 0,
+        'players': {},
+        'leader_id': None,
+        'winner': None,
+        'night': {'wolf_votes': {}, 'protected_id': None, 'inspected_id': None},
+        'votes': {},
+    }
+
+
+def apply_event(state, event_type, payload):
+    """Fold one event into the state dict (mutates and returns it).
+
+    JSON object keys are strings, so player ids are used as str(id).
+    """
+    players = state['players']
+
+    if event_type == 'role_assigned':
+        players[str(payload['player_id'])] = {
+            'nickname': payload['nickname'],
+            'role': payload['role'],
+            'is_alive': True,
+            'is_leader': False,
+        }
+    elif event_type == 'phase_changed':
+        state['phase'] = payload['phase']
+        state['night_number'] = payload['night_number']
+        state['day_number'] = payload['day_number']
+        if payload['phase'] == 'night':
+            state['night'] = {'wolf_votes': {}, 'protected_id': None, 'inspected_id': None}
+        elif payload['phase'] == 'voting':
+            state['votes'] = {}
+    elif event_type == 'wolf_vote':
+        state['night']['wolf_votes'][str(payload['player_id'])] = payload['target_id']
+    elif event_type == 'protected':
+        state['night']['protected_id'] = payload['target_id']
+    elif event_type == 'inspected':
+        state['night']['inspected_id'] = payload['target_id']
+    elif event_type in ('killed', 'eliminated'):
+        players[str(payload['player_id'])]['is_alive'] = False
+    elif event_type == 'vote_cast':
+        votes = state['votes'].setdefault(payload['vote_type'], {})
+        votes[str(payload['player_id'])] = payload['target_id']
+    elif event_type == 'leader_elected':
+        for player in players.values():
+            player['is_leader'] = False
+        players[str(payload['player_id'])]['is_leader'] = True
+        state['leader_id'] = payload['player_id']
+    elif event_type == 'game_ended':
+        state['phase'] = 'finished'
+        state['winner'] = payload['winner']
+
+    return state
+
+
+def record_event(room, event_type, **payload):
+    """Append one event; phase changes also store a snapshot"""
+    event = GameEvent.objects.create(room=room, event_type=event_type, payload=payload)
+    if event_type in ('phase_changed', 'game_ended'):
+        take_snapshot(room)
+    return event
+
+
+def record_events(room, event_type, payloads):
+    """Append several events of one type in a single INSERT"""
+    return GameEvent.objects.bulk_create([
+        GameEvent(room=room, event_type=event_type, payload=payload)
+        for payload in payloads
+    ])
+
+
+def rebuild_state(room, until=None):
+    """Current state from the latest snapshot plus the event tail.
+
+    With ``until``, the state as it was at that time instead.
+    Returns ``(state, last_event_id)``.
+    """
+    snapshots = GameSnapshot.objects.filter(room=room)
+    events = GameEvent.objects.filter(room=room)
+    if until is not None:
+        snapshots = snapshots.filter(created_at__lte=until)
+        events = events.filter(timestamp__lte=until)
+
+    snapshot = snapshots.first()
+    if snapshot:
+        state, last_event_id = snapshot.state, snapshot.last_event_id
+    else:
+        state, last_event_id = initial_state(), 0
+
+    tail = events.filter(id__gt=last_event_id).values_list('id', 'event_type', 'payload')
+    for last_event_id, event_type, payload in tail:
+        apply_event(state, event_type, payload)
+
+    return state, last_event_id
+
+
+def take_snapshot(room):
+    """Store the folded state so later rebuilds start from here"""
+    state, last_event_id = rebuild_state(room)
+    return GameSnapshot.objects.create(room=room, last_event_id=last_event_id, state=state)
+
+
+def history(room, night_number=None, day_number=None):
+    """Events of a room, optionally restricted to one night or one day"""
+    events = GameEvent.objects.filter(room=room)
+    if night_number is not None:
+        events = events.filter(payload__night_number=night_number)
+    if day_number is not None:
+        events = events.filter(payload__day_number=day_number)
+    return events
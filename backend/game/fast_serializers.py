@@ -0,0 +1,100 @@
+"""Hand-written equivalents of the hot read-path serializers.
+
+Each function returns exactly what the matching DRF serializer's ``.data``
+would, without building a field graph per call. Keep them in sync with
+serializers.py; ``manage.py bench_serializers`` checks that the rendered
+bytes are identical.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+
+def current_timezone():
+    """Timezone DRF renders datetimes in; resolve once per payload, it's not free"""
+    return timezone.get_current_timezone() if settings.USE_TZ else None
+
+
+def format_datetime(value, current=None):
+    """Render a datetime the way DRF's DateTimeField does (ISO 8601, 'Z')"""
+    if value is None:
+        return None
+    if settings.USE_TZ:
+        current = current or timezone.get_current_timezone()
+        if timezone.is_aware(value):
+            value = value.astimezone(current)
+        else:
+            value = timezone.make_aware(value, current)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def serialize_player(player, include_role=False, tz=None):
+    """Same output as PlayerSerializer (PlayerDetailSerializer with include_role)"""
+    data = {
+        'id': player.id,
+        'nickname': player.nickname,
+        'is_alive': player.is_alive,
+        'is_leader': player.is_leader,
+        'is_bot': player.is_bot,
+        'joined_at': format_datetime(player.joined_at, tz),
+        'remaining_time': player.total_speaking_time - player.speaking_time_used,
+    }
+    if include_role:
+        data['role'] = player.role
+    return data
+
+
+def serialize_room(room):
+    """Same output as RoomSerializer; prefetch 'players' to avoid a query"""
+    players = room.players.all()
+    tz = current_timezone()
+    return {
+        'id': room.id,
+        'code': room.code,
+        'max_players': room.max_players,
+        'status': room.status,
+        'created_at': format_datetime(room.created_at, tz),
+        'players': [serialize_player(player, tz=tz) for player in players],
+        'player_count': len(players),
+        'num_wolves': room.num_wolves,
+        'num_seers': room.num_seers,
+        'num_protectors': room.num_protectors,
+        'num_hunters': room.num_hunters,
+    }
+
+
+def serialize_game_state(game_state, now=None):
+    """Same output as GameStateSerializer"""
+    time_remaining = None
+    if game_state.timer_end:
+        remaining = (game_state.timer_end - (now or timezone.now())).total_seconds()
+        time_remaining = max(0, int(remaining))
+    return {
+        'phase': game_state.phase,
+        'night_number': game_state.night_number,
+        'day_number': game_state.day_number,
+        'timer_end': format_datetime(game_state.timer_end),
+        'current_speaker_id': game_state.current_speaker_id,
+        'speaking_order': game_state.speaking_order,
+        'speaker_ends_at': format_datetime(game_state.speaker_ends_at),
+        'time_remaining': time_remaining,
+        'vote_round': game_state.vote_round,
+        'ballot_candidates': game_state.ballot_candidates,
+        'leader_decides': game_state.leader_decides,
+        'wolves_voted': game_state.wolves_voted,
+        'seer_acted': game_state.seer_acted,
+        'protector_acted': game_state.protector_acted,
+    }
+
+
+def serialize_game_log(log, tz=None):
+    """Same output as GameLogSerializer"""
+    return {
+        'id': log.id,
+        'phase': log.phase,
+        'message': log.message,
+        'timestamp': format_datetime(log.timestamp, tz),
+        'metadata': log.metadata,
+    }
@@ -1,42 +1,66 @@
 import random
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
-from .models import Player, GameState, Action, Vote, GameLog, Room
+from .models import Player, GameState, GameLog, Room
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from . import wire
+from .spectators import spectator_group_name, encode_spectator_event
+from .events import record_event, record_events
+from .hotstate import get_store
+from .db_routers import pin_to_primary
+from .projections import bump_version
 
-def assign_roles(room):
-    """Assign roles to all players in the room"""
-    players = list(room.players.all())
-    
-    if len(players) < room.max_players:
-        return False, "Not enough players"
-    
-    # Create role pool
+def build_role_pool(room, num_players):
+    """Shuffled roles for num_players, or None if special roles don't fit"""
     roles = ['wolf'] * room.num_wolves
     roles += ['seer'] * room.num_seers
     roles += ['protector'] * room.num_protectors
     roles += ['hunter'] * room.num_hunters
     
     # Fill remaining with citizens
-    remaining = len(players) - len(roles)
+    remaining = num_players - len(roles)
     if remaining < 0:
-        return False, "Too many special roles configured"
+        return None
     
     roles += ['citizen'] * remaining
-    
-    # Shuffle and assign
     random.shuffle(roles)
+    return roles
+
+def assign_roles(room):
+    """Assign roles to all players in the room"""
+    players = list(room.players.all())
+    
+    if len(players) < room.max_players:
+        return False, "Not enough players"
+    
+    roles = build_role_pool(room, len(players))
+    if roles is None:
+        return False, "Too many special roles configured"
+    
     for player, role in zip(players, roles):
         player.role = role
         player.save()
+    get_store().start_game(room, players)
+    
+    record_events(room, 'role_assigned', [
+        {'player_id': player.id, 'nickname': player.nickname, 'role': player.role}
+        for player in players
+    ])
     
     # Create game state
-    GameState.objects.create(room=room, phase='night', night_number=1)
+    game_state = GameState.objects.create(room=room, phase='night', night_number=1)
     room.status = 'playing'
     room.save()
+    bump_version(room)
     
     log_game_event(room, 'setup', 'Game started - Roles assigned')
+    record_phase_change(room, game_state)
+    from . import bots
+    bots.night_started(room, game_state.night_number)
     
     return True, "Roles assigned successfully"
 
@@ -69,31 +93,14 @@ def resolve_night(room):
     game_state = room.game_state
     night_number = game_state.night_number
     
-    # Get wolf votes
-    wolf_votes = Action.objects.filter(
-        player__room=room,
-        action_type='wolf_vote',
-        night_number=night_number
-    )
+    actions = get_store().night_actions(room, night_number)
     
     # Count votes for wolf target
-    from django.db.models import Count
-    wolf_target_votes = wolf_votes.values('target').annotate(
-        vote_count=Count('target')
-    ).order_by('-vote_count')
-    
-    wolf_target_id = None
-    if wolf_target_votes:
-        wolf_target_id = wolf_target_votes[0]['target']
+    wolf_votes = Counter(actions.get('wolf_vote', {}).values())
+    wolf_target_id = wolf_votes.most_common(1)[0][0] if wolf_votes else None
     
     # Get protector action
-    protector_action = Action.objects.filter(
-        player__room=room,
-        action_type='protector_protect',
-        night_number=night_number
-    ).first()
-    
-    protected_player_id = protector_action.target.id if protector_action else None
+    protected_player_id = next(iter(actions.get('protector_protect', {}).values()), None)
     
     # Resolve death
     deaths = []
@@ -101,7 +108,10 @@ def resolve_night(room):
         player = Player.objects.get(id=wolf_target_id)
         player.is_alive = False
         player.save()
+        get_store().player_died(room, player.id)
         deaths.append(player)
+        record_event(room, 'killed', player_id=player.id, cause='wolves',
+                     night_number=night_number)
         
         log_game_event(room, 'night', f'{player.nickname} was killed by wolves')
         
@@ -110,15 +120,11 @@ def resolve_night(room):
             log_game_event(room, 'night', f'{player.nickname} was a hunter! They can take revenge.')
     
     # Process seer action (just log it, result already stored)
-    seer_action = Action.objects.filter(
-        player__room=room,
-        action_type='seer_inspect',
-        night_number=night_number
-    ).first()
+    seer_id = next(iter(actions.get('seer_inspect', {})), None)
     
-    if seer_action:
+    if seer_id:
         log_game_event(room, 'night', f'The seer inspected a player', 
-                      {'seer_id': seer_action.player.id})
+                      {'seer_id': seer_id})
     
     return deaths
 
@@ -129,12 +135,14 @@ def advance_to_day(room):
     deaths = resolve_night(room)
     
     game_state.phase = 'day'
+    game_state.phase_started_at = timezone.now()
     game_state.day_number += 1
     game_state.timer_end = timezone.now() + timedelta(minutes=5)
     game_state.wolves_voted = False
     game_state.seer_acted = False
     game_state.protector_acted = False
     game_state.save()
+    record_phase_change(room, game_state)
     
     # Check win condition
     winner, reason = check_win_condition(room)
@@ -146,59 +154,203 @@ def advance_to_day(room):
         'type': 'phase_change',
         'phase': 'day',
         'deaths': [{'id': p.id, 'nickname': p.nickname, 'role': p.role} for p in deaths],
-        'day_number': game_state.day_number
+        'day_number': game_state.day_number,
+        'timer_end': game_state.timer_end.isoformat()
     })
+    
+    from .speaking import start_speaking_turns
+    broadcast_game_update(room, start_speaking_turns(room, game_state))
+
+def needs_leader(room):
+    """True when no alive player leads the village"""
+    return not room.players.filter(is_leader=True, is_alive=True).exists()
+
+def open_ballot(room, game_state, phase, seconds, candidates=(), round=0, leader_decides=False):
+    """Open a ballot and schedule its resolution, so a room never waits on an admin"""
+    from . import bots
+    from .scheduler import scheduler
+    if game_state.phase != phase:
+        game_state.phase_started_at = timezone.now()
+    game_state.phase = phase
+    game_state.vote_round = round
+    game_state.ballot_candidates = list(candidates)
+    game_state.leader_decides = leader_decides
+    game_state.timer_end = timezone.now() + timedelta(seconds=seconds)
+    game_state.save()
+    scheduler.schedule_on_commit(room.id, seconds, ballot_timed_out, room.id, phase, game_state.day_number, round)
+    bots.ballot_opened(room, game_state)
+
+def open_runoff(room, game_state, candidates, leader_decides=False):
+    """Re-run a tied ballot between the tied candidates only"""
+    seconds = settings.LEADER_DECISION_SECONDS if leader_decides else settings.BALLOT_RUNOFF_SECONDS
+    open_ballot(room, game_state, game_state.phase, seconds, candidates,
+                round=game_state.vote_round + 1, leader_decides=leader_decides)
+    
+    names = ', '.join(Player.objects.filter(id__in=candidates).values_list('nickname', flat=True))
+    if leader_decides:
+        log_game_event(room, game_state.phase, f'Tie vote again - the leader decides between {names}')
+    else:
+        log_game_event(room, game_state.phase, f'Tie vote - runoff between {names}')
+    
+    broadcast_game_update(room, {
+        'type': 'runoff',
+        'phase': game_state.phase,
+        'round': game_state.vote_round,
+        'candidates': candidates,
+        'leader_decides': leader_decides,
+        'timer_end': game_state.timer_end.isoformat()
+    })
+
+def ballot_timed_out(room_id, phase, day_number, round):
+    """Scheduler callback: resolve the ballot if it is still the open one.
+
+    The outcome is decided and written under the row lock; its broadcasts
+    and the next wakeup go out once the transaction commits.
+    """
+    with transaction.atomic():
+        game_state = GameState.objects.select_for_update().select_related('room').get(room_id=room_id)
+        if (game_state.phase, game_state.day_number, game_state.vote_round) != (phase, day_number, round):
+            return
+        room = game_state.room
+        if phase == 'leader_election':
+            resolve_leader_election(room)
+        else:
+            resolve_vote(room)
+
+def recover_deadlines(now=None, rearm=True):
+    """Act on ballot and speaking-turn deadlines whose wakeup was lost.
+
+    Wakeups live in the process that scheduled them, so a restart or deploy
+    drops them. Deadlines already past are resolved here; with rearm, the
+    ones still running are scheduled in this process again. The callbacks
+    re-check the room under its row lock, so running this in several
+    processes at once is harmless. Returns how many deadlines were resolved.
+    """
+    from .scheduler import scheduler
+    from .speaking import turn_timed_out
+
+    now = now or timezone.now()
+    playing = GameState.objects.filter(room__status='playing')
+    deadlines = [
+        (timer_end, ballot_timed_out, (room_id, phase, day_number, round))
+        for room_id, phase, day_number, round, timer_end in playing.filter(
+            phase__in=('voting', 'leader_election'), timer_end__isnull=False
+        ).values_list('room_id', 'phase', 'day_number', 'vote_round', 'timer_end')
+    ]
+    deadlines += [
+        (ends_at, turn_timed_out, (room_id, speaker_id, started_at))
+        for room_id, speaker_id, started_at, ends_at in playing.filter(
+            phase='day', current_speaker_id__isnull=False, speaker_ends_at__isnull=False
+        ).values_list('room_id', 'current_speaker_id', 'speaker_started_at', 'speaker_ends_at')
+    ]
+
+    resolved = 0
+    for deadline, callback, args in deadlines:
+        if deadline <= now:
+            callback(*args)
+            resolved += 1
+        elif rearm:
+            scheduler.schedule(args[0], (deadline - now).total_seconds(), callback, *args)
+    return resolved
+
+def advance_to_leader_election(room):
+    """Advance to leader election (when the village has no alive leader)"""
+    from .speaking import stop_speaking_turns
+    game_state = room.game_state
+    stop_speaking_turns(room, game_state)
+    open_ballot(room, game_state, 'leader_election', settings.LEADER_ELECTION_SECONDS)
+    record_phase_change(room, game_state)
+    
+    broadcast_game_update(room, {
+        'type': 'phase_change',
+        'phase': 'leader_election',
+        'day_number': game_state.day_number,
+        'timer_end': game_state.timer_end.isoformat()
+    })
+
+def resolve_leader_election(room):
+    """Elect the most voted player; ties go to a runoff, then to a random draw"""
+    game_state = room.game_state
+    candidates, _ = get_store().ballot_leaders(
+        room, 'leader', game_state.day_number, game_state.vote_round
+    )
+    
+    if not candidates:
+        # Nobody voted: draw among everyone still in the game
+        candidates = game_state.ballot_candidates or list(
+            get_alive_players(room).values_list('id', flat=True)
+        )
+    
+    if len(candidates) > 1 and game_state.vote_round < settings.BALLOT_RUNOFF_ROUNDS:
+        open_runoff(room, game_state, candidates)
+        return
+    
+    leader_id = candidates[0]
+    if len(candidates) > 1:
+        leader_id = random.choice(candidates)
+        log_game_event(room, 'leader_election', 'Leader election still tied - leader drawn at random')
+    
+    get_store().close_ballot(room)
+    elect_leader(room, leader_id)
+    advance_to_voting(room)
 
 def advance_to_voting(room):
     """Advance to voting phase"""
+    from .speaking import stop_speaking_turns
     game_state = room.game_state
-    game_state.phase = 'voting'
-    game_state.timer_end = timezone.now() + timedelta(minutes=2)
-    game_state.save()
+    stop_speaking_turns(room, game_state)
+    open_ballot(room, game_state, 'voting', 120)
+    record_phase_change(room, game_state)
     
     broadcast_game_update(room, {
         'type': 'phase_change',
         'phase': 'voting',
-        'day_number': game_state.day_number
+        'day_number': game_state.day_number,
+        'timer_end': game_state.timer_end.isoformat()
     })
 
 def resolve_vote(room):
-    """Resolve elimination vote"""
+    """Resolve elimination vote.
+    
+    A tie goes to a runoff between the tied players; if that ties too the
+    leader picks one of them, and without a leader (or a pick) one is drawn
+    at random, so the game always moves on.
+    """
     game_state = room.game_state
     day_number = game_state.day_number
     
-    votes = Vote.objects.filter(
-        player__room=room,
-        vote_type='elimination',
-        vote_phase=day_number
+    candidates, max_votes = get_store().ballot_leaders(
+        room, 'elimination', day_number, game_state.vote_round
     )
     
-    # Count votes (leader votes count as 2)
-    from collections import defaultdict
-    vote_counts = defaultdict(int)
-    
-    for vote in votes:
-        weight = 2 if vote.player.is_leader else 1
-        vote_counts[vote.target.id] += weight
-    
-    if not vote_counts:
+    if game_state.leader_decides:
+        if len(candidates) != 1:
+            candidates = game_state.ballot_candidates
+    elif not candidates:
+        get_store().close_ballot(room)
         log_game_event(room, 'voting', 'No votes cast - no elimination')
         advance_to_night(room)
         return
+    elif len(candidates) > 1:
+        if game_state.vote_round < settings.BALLOT_RUNOFF_ROUNDS:
+            open_runoff(room, game_state, candidates)
+            return
+        if not needs_leader(room):
+            open_runoff(room, game_state, candidates, leader_decides=True)
+            return
     
-    # Get player with most votes
-    max_votes = max(vote_counts.values())
-    candidates = [pid for pid, count in vote_counts.items() if count == max_votes]
-    
+    eliminated_id = candidates[0]
     if len(candidates) > 1:
-        log_game_event(room, 'voting', 'Tie vote - leader must decide or revote')
-        # In a real implementation, handle tie-breaking
-        return
+        eliminated_id = random.choice(candidates)
+        log_game_event(room, 'voting', 'Tie could not be broken - eliminated player drawn at random')
+    get_store().close_ballot(room)
     
-    eliminated_id = candidates[0]
     eliminated = Player.objects.get(id=eliminated_id)
     eliminated.is_alive = False
     eliminated.save()
+    get_store().player_died(room, eliminated.id)
+    record_event(room, 'eliminated', player_id=eliminated.id, votes=max_votes,
+                 day_number=day_number)
     
     log_game_event(room, 'voting', f'{eliminated.nickname} was eliminated by vote')
     
@@ -231,27 +383,38 @@ def advance_to_night(room):
     """Advance to night phase"""
     game_state = room.game_state
     game_state.phase = 'night'
+    game_state.phase_started_at = timezone.now()
     game_state.night_number += 1
     game_state.timer_end = timezone.now() + timedelta(minutes=3)
     game_state.save()
+    record_phase_change(room, game_state)
     
     broadcast_game_update(room, {
         'type': 'phase_change',
         'phase': 'night',
-        'night_number': game_state.night_number
+        'night_number': game_state.night_number,
+        'timer_end': game_state.timer_end.isoformat()
     })
+    from . import bots
+    bots.night_started(room, game_state.night_number)
 
 def end_game(room, winner, reason):
     """End the game"""
+    from .speaking import stop_speaking_turns
     game_state = room.game_state
+    stop_speaking_turns(room, game_state)
+    get_store().finish_game(room)
     game_state.phase = 'finished'
+    game_state.phase_started_at = timezone.now()
     game_state.timer_end = None
     game_state.save()
     
     room.status = 'finished'
+    room.finished_at = timezone.now()
     room.save()
     
     log_game_event(room, 'finished', f'Game ended - {winner} win: {reason}')
+    record_event(room, 'game_ended', winner=winner, reason=reason)
     
     broadcast_game_update(room, {
         'type': 'game_ended',
@@ -268,6 +431,8 @@ def elect_leader(room, player_id):
     player = Player.objects.get(id=player_id)
     player.is_leader = True
     player.save()
+    record_event(room, 'leader_elected', player_id=player.id,
+                 day_number=room.game_state.day_number)
     
     log_game_event(room, 'leader_election', f'{player.nickname} elected as leader')
     
@@ -279,6 +444,15 @@ def elect_leader(room, player_id):
         }
     })
 
+def record_phase_change(room, game_state):
+    """Append a phase_changed event (which also snapshots the history)"""
+    record_event(
+        room, 'phase_changed',
+        phase=game_state.phase,
+        night_number=game_state.night_number,
+        day_number=game_state.day_number
+    )
+
 def log_game_event(room, phase, message, metadata=None):
     """Log a game event"""
     GameLog.objects.create(
@@ -290,11 +464,29 @@ def log_game_event(room, phase, message, metadata=None):
 
 def broadcast_game_update(room, data):
     """Broadcast update to all players in room"""
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f'room_{room.code}',
-        {
+    # Anything worth broadcasting changes what someone sees
+    bump_version(room)
+    # Everyone in the room is about to re-read it; keep them off a lagging replica
+    pin_to_primary(room.code)
+    # Each worker encodes it once per codec in use, not once per socket
+    room_message = {
+        'type': 'game_update',
+        **wire.broadcast({
             'type': 'game_update',
             'data': data
-        }
-    )
+        })
+    }
+    # One redacted frame for all spectators; their hubs add the delay
+    spectator_message = {
+        'type': 'spectator_event',
+        'frame': encode_spectator_event(data)
+    }
+    # Sent once the transaction commits (right away outside one), so nobody
+    # hears about a state that could still roll back
+    code = room.code
+    transaction.on_commit(lambda: send_room_update(code, room_message, spectator_message))
+
+def send_room_update(room_code, room_message, spectator_message):
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(f'room_{room_code}', room_message)
+    async_to_sync(channel_layer.group_send)(spectator_group_name(room_code), spectator_message)
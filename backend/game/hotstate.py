@@ -0,0 +1,317 @@
+"""Where in-progress game state lives: the database (default) or Redis.
+
+GAME_STATE_BACKEND picks the store for the hot paths of a running game:
+night actions, ballots and who is still alive. With 'db' every action is
+an Action/Vote row as before. With 'redis' a started game is mirrored into
+Redis (role map, alive set, one night-action ledger hash per night, one
+ballot hash plus a tally sorted set per ballot), each action or vote is a
+single Lua script call that validates and applies it atomically, and the
+Action/Vote rows are only written in bulk when the game ends. Player and
+GameState stay in the database either way, and the typed event log keeps
+its per-action append as the durable history.
+
+Keys share a {room_id} hash tag so a room's scripts work on Redis Cluster,
+and expire after GAME_STATE_TTL_SECONDS of inactivity in case a game is
+abandoned before it ends.
+"""
+
+from django.conf import settings
+from django.utils import timezone
+
+from .elections import ballot_of, cast_vote, close_ballots, tally_for, vote_weight
+from .models import Action, Vote
+
+NIGHT_ACTION_SCRIPT = """
+if redis.call('SISMEMBER', KEYS[2], ARGV[1]) == 0 then
+  return {'error', 'Dead players cannot act'}
+end
+if redis.call('SISMEMBER', KEYS[2], ARGV[2]) == 0 then
+  return {'error', 'Cannot target dead player'}
+end
+if ARGV[3] == 'protector_protect' then
+  if redis.call('HGET', KEYS[4], ARGV[1]) == ARGV[2] then
+    return {'error', 'Cannot protect same player twice in a row'}
+  end
+  redis.call('HSET', KEYS[4], ARGV[1], ARGV[2])
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3] .. ':' .. ARGV[2])
+redis.call('SADD', KEYS[5], KEYS[3])
+for _, key in ipairs(KEYS) do
+  redis.call('EXPIRE', key, ARGV[4])
+end
+local done = 1
+if ARGV[3] == 'wolf_vote' then
+  for _, pid in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    if redis.call('HGET', KEYS[1], pid) == 'wolf' then
+      local entry = redis.call('HGET', KEYS[3], pid)
+      if not entry or string.sub(entry, 1, 10) ~= 'wolf_vote:' then
+        done = 0
+        break
+      end
+    end
+  end
+end
+return {'ok', tostring(done)}
+"""
+
+CAST_VOTE_SCRIPT = """
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 0 then
+  return {'error', 'Dead players cannot vote'}
+end
+if redis.call('SISMEMBER', KEYS[1], ARGV[2]) == 0 then
+  return {'error', 'Cannot vote for dead player'}
+end
+local previous = redis.call('HGET', KEYS[2], ARGV[1])
+if previous then
+  local sep = string.find(previous, ':')
+  local old_target = string.sub(previous, 1, sep - 1)
+  local old_weight = tonumber(string.sub(previous, sep + 1))
+  if tonumber(redis.call('ZINCRBY', KEYS[3], -old_weight, old_target)) <= 0 then
+    redis.call('ZREM', KEYS[3], old_target)
+  end
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2] .. ':' .. ARGV[3])
+redis.call('ZINCRBY', KEYS[3], ARGV[3], ARGV[2])
+redis.call('SADD', KEYS[4], KEYS[2])
+for _, key in ipairs(KEYS) do
+  redis.call('EXPIRE', key, ARGV[4])
+end
+return {'ok', redis.call('ZRANGE', KEYS[3], 0, -1, 'WITHSCORES')}
+"""
+
+
+def leaders_of(counts):
+    """Candidates sharing the highest count, and that count"""
+    if not counts:
+        return [], 0
+    top = max(counts.values())
+    return sorted(pid for pid, count in counts.items() if count == top), top
+
+
+class DatabaseStore:
+    """Every action and vote is a row, as the game has always worked"""
+
+    def start_game(self, room, players):
+        pass
+
+    def record_night_action(self, player, target, action_type, night_number):
+        """Store a night action; returns (error, all_wolves_voted)"""
+        if player.role == 'protector' and player.last_protected_player_id == target.id:
+            return 'Cannot protect same player twice in a row', False
+
+        Action.objects.update_or_create(
+            player=player,
+            action_type=action_type,
+            night_number=night_number,
+            defaults={
+                'target': target,
+                'result_data': {'target_role': target.role} if player.role == 'seer' else None
+            }
+        )
+
+        # Update protector tracking
+        if player.role == 'protector':
+            player.last_protected_player_id = target.id
+            player.save()
+
+        if player.role != 'wolf':
+            return None, True
+        wolves = player.room.players.filter(role='wolf', is_alive=True)
+        wolf_votes = Action.objects.filter(
+            player__in=wolves,
+            action_type='wolf_vote',
+            night_number=night_number
+        ).count()
+        return None, wolf_votes == wolves.count()
+
+    def night_actions(self, room, night_number):
+        """{action_type: {player_id: target_id}} for one night"""
+        actions = {}
+        for player_id, action_type, target_id in Action.objects.filter(
+            player__room=room, night_number=night_number
+        ).order_by('timestamp').values_list('player_id', 'action_type', 'target_id'):
+            actions.setdefault(action_type, {})[player_id] = target_id
+        return actions
+
+    def seer_inspections(self, room):
+        """{seer_id: [target_id, ...]} over the whole game"""
+        inspections = {}
+        for seer_id, target_id in Action.objects.filter(
+            player__room=room, action_type='seer_inspect'
+        ).values_list('player_id', 'target_id'):
+            inspections.setdefault(seer_id, []).append(target_id)
+        return inspections
+
+    def cast_vote(self, player, target, game_state):
+        """Store a vote on the open ballot; returns (error, vote, counts)"""
+        vote, counts = cast_vote(player, target, game_state)
+        return None, vote, counts
+
+    def ballot_leaders(self, room, vote_type, vote_phase, round):
+        return tally_for(room.id, vote_type, vote_phase, round, refresh=True).leaders()
+
+    def close_ballot(self, room):
+        close_ballots(room.id)
+
+    def player_died(self, room, player_id):
+        pass
+
+    def finish_game(self, room):
+        close_ballots(room.id)
+
+
+class RedisStore:
+    """Hot state in Redis, flushed to Action/Vote rows at the end of the game"""
+
+    def __init__(self, url):
+        # Imported here so the db backend never pays for loading redis
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('GAME_STATE_BACKEND=redis requires the redis package')
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.night_action_script = self.client.register_script(NIGHT_ACTION_SCRIPT)
+        self.cast_vote_script = self.client.register_script(CAST_VOTE_SCRIPT)
+
+    def key(self, room_id, *parts):
+        return ':'.join([f'game:{{{room_id}}}', *map(str, parts)])
+
+    def start_game(self, room, players):
+        roles = self.key(room.id, 'roles')
+        alive = self.key(room.id, 'alive')
+        pipe = self.client.pipeline()
+        pipe.delete(roles, alive)
+        pipe.hset(roles, mapping={player.id: player.role for player in players})
+        pipe.sadd(alive, *[player.id for player in players if player.is_alive])
+        pipe.expire(roles, settings.GAME_STATE_TTL_SECONDS)
+        pipe.expire(alive, settings.GAME_STATE_TTL_SECONDS)
+        pipe.execute()
+
+    def record_night_action(self, player, target, action_type, night_number):
+        room_id = player.room_id
+        status, result = self.night_action_script(
+            keys=[
+                self.key(room_id, 'roles'),
+                self.key(room_id, 'alive'),
+                self.key(room_id, 'night', night_number),
+                self.key(room_id, 'last_protected'),
+                self.key(room_id, 'index'),
+            ],
+            args=[player.id, target.id, action_type, settings.GAME_STATE_TTL_SECONDS],
+        )
+        if status == 'error':
+            return result, False
+        return None, result == '1'
+
+    def night_actions(self, room, night_number):
+        actions = {}
+        for player_id, entry in self.client.hgetall(self.key(room.id, 'night', night_number)).items():
+            action_type, target_id = entry.split(':')
+            actions.setdefault(action_type, {})[int(player_id)] = int(target_id)
+        return actions
+
+    def seer_inspections(self, room):
+        nights = [key for key in self.client.smembers(self.key(room.id, 'index'))
+                  if key.split(':')[2] == 'night']
+        pipe = self.client.pipeline()
+        for key in nights:
+            pipe.hgetall(key)
+        inspections = {}
+        for entries in pipe.execute():
+            for player_id, entry in entries.items():
+                action_type, target_id = entry.split(':')
+                if action_type == 'seer_inspect':
+                    inspections.setdefault(int(player_id), []).append(int(target_id))
+        return inspections
+
+    def ballot_keys(self, room_id, vote_type, vote_phase, round):
+        ballot = self.key(room_id, 'ballot', vote_type, vote_phase, round)
+        return ballot, ballot + ':tally'
+
+    def cast_vote(self, player, target, game_state):
+        vote_type, vote_phase = ballot_of(game_state)
+        ballot, tally = self.ballot_keys(player.room_id, vote_type, vote_phase, game_state.vote_round)
+        status, result = self.cast_vote_script(
+            keys=[self.key(player.room_id, 'alive'), ballot, tally, self.key(player.room_id, 'index')],
+            args=[player.id, target.id, vote_weight(vote_type, player.is_leader),
+                  settings.GAME_STATE_TTL_SECONDS],
+        )
+        if status == 'error':
+            return result, None, None
+
+        counts = {int(result[i]): int(float(result[i + 1])) for i in range(0, len(result), 2)}
+        # Not saved: the row is written when the game ends
+        vote = Vote(player=player, target=target, vote_type=vote_type, vote_phase=vote_phase,
+                    round=game_state.vote_round, timestamp=timezone.now())
+        return None, vote, counts
+
+    def ballot_leaders(self, room, vote_type, vote_phase, round):
+        _, tally = self.ballot_keys(room.id, vote_type, vote_phase, round)
+        counts = {int(pid): int(score) for pid, score in self.client.zrange(tally, 0, -1, withscores=True)}
+        return leaders_of(counts)
+
+    def close_ballot(self, room):
+        pass
+
+    def player_died(self, room, player_id):
+        self.client.srem(self.key(room.id, 'alive'), player_id)
+
+    def finish_game(self, room):
+        """Write the whole game's actions and votes as rows, then drop the keys"""
+        index = self.key(room.id, 'index')
+        keys = self.client.smembers(index)
+        roles = self.client.hgetall(self.key(room.id, 'roles'))
+
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.hgetall(key)
+        ledgers = dict(zip(keys, pipe.execute()))
+
+        actions, votes = [], []
+        for key, entries in ledgers.items():
+            parts = key.split(':')
+            if parts[2] == 'night':
+                night_number = int(parts[3])
+                for player_id, entry in entries.items():
+                    action_type, target_id = entry.split(':')
+                    actions.append(Action(
+                        player_id=int(player_id),
+                        action_type=action_type,
+                        target_id=int(target_id),
+                        night_number=night_number,
+                        result_data={'target_role': roles.get(target_id)}
+                        if action_type == 'seer_inspect' else None,
+                    ))
+            else:
+                _, _, _, vote_type, vote_phase, round = parts
+                for player_id, entry in entries.items():
+                    target_id, _ = entry.split(':')
+                    votes.append(Vote(
+                        player_id=int(player_id),
+                        target_id=int(target_id),
+                        vote_type=vote_type,
+                        vote_phase=int(vote_phase),
+                        round=int(round),
+                    ))
+
+        Action.objects.bulk_create(actions)
+        Vote.objects.bulk_create(votes)
+
+        tallies = [key + ':tally' for key in keys if key.split(':')[2] == 'ballot']
+        self.client.delete(
+            index, self.key(room.id, 'roles'), self.key(room.id, 'alive'),
+            self.key(room.id, 'last_protected'), *keys, *tallies
+        )
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if settings.GAME_STATE_BACKEND == 'redis':
+            _store = RedisStore(settings.GAME_STATE_REDIS_URL)
+        else:
+            _store = DatabaseStore()
+    return _store
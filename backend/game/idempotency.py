@@ -0,0 +1,94 @@
+"""Replay retried player actions from memory.
+
+Clients may send an ``Idempotency-Key`` header with night_action, vote,
+speaking and hunter_revenge. The first successful response is kept per
+(action, player, player token, key) in a bounded in-process TTL cache
+(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_KEYS) and a retry with the same
+key gets it back before the view runs, without a query. Only 2xx
+responses are kept: an error may stop being one (the phase changes), so a
+retry after it runs again. A retry that lands on another worker also runs
+again, which is why the effects themselves stay safe to repeat (see the
+one-time hunter_kill Action). The kept response remembers a digest of the
+request body, and reusing its key for a different body gets a 422.
+"""
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework import status as http_status
+from rest_framework.response import Response
+
+from . import metrics
+
+
+class TTLCache:
+    """At most max_size entries, each dropped ttl seconds after it was set"""
+
+    def __init__(self, ttl, max_size, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self.entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (self.clock() + self.ttl, value)
+            # Insertion order is expiry order, so the oldest go first
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+responses = TTLCache(settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_MAX_KEYS)
+
+
+def body_digest(request):
+    """Digest of the parsed body, so the same request in other whitespace matches"""
+    data = request.data.dict() if hasattr(request.data, 'dict') else request.data
+    raw = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def idempotent(view):
+    """Replay the first successful response to a retried Idempotency-Key"""
+    @functools.wraps(view)
+    def wrapper(viewset, request, pk=None):
+        key = request.headers.get('Idempotency-Key')
+        token = request.headers.get('X-Player-Token')
+        if not key or not token:
+            return view(viewset, request, pk=pk)
+
+        cache_key = (view.__name__, pk, token, key)
+        digest = body_digest(request)
+        cached = responses.get(cache_key)
+        if cached is not None:
+            body, data, status = cached
+            if body != digest:
+                return Response(
+                    {'error': 'Idempotency-Key was already used for a different request'},
+                    status=http_status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            metrics.incr('idempotent_replays')
+            return Response(data, status=status, headers={'Idempotent-Replayed': 'true'})
+
+        response = view(viewset, request, pk=pk)
+        if 200 <= response.status_code < 300:
+            responses.set(cache_key, (digest, response.data, response.status_code))
+        return response
+    return wrapper
@@ -0,0 +1,196 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .lobby import notify_lobby
+from .projections import forget_versions
+from .models import (
+    Room, Player, GameState, Action, Vote, GameLog, GameEvent, GameSnapshot, ArchivedGame
+)
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+
+def compress_record(record):
+    """Encode a game record as JSON and compress it with zstd (or gzip)"""
+    raw = json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=10).compress(raw)
+    return 'gzip', gzip.compress(raw, compresslevel=6)
+
+
+def decompress_record(codec, payload):
+    """Inverse of compress_record"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstandard is required to read zstd archives')
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    else:
+        raw = gzip.decompress(payload)
+    return json.loads(raw)
+
+
+def build_game_records(rooms):
+    """Build self-contained history records for a batch of rooms"""
+    room_ids = [room.id for room in rooms]
+
+    players = {}
+    for row in Player.objects.filter(room_id__in=room_ids).order_by('joined_at').values(
+        'id', 'room_id', 'nickname', 'role', 'is_alive', 'is_leader', 'joined_at',
+        'speaking_time_used'
+    ):
+        players.setdefault(row.pop('room_id'), []).append(row)
+
+    states = {
+        row.pop('room_id'): row
+        for row in GameState.objects.filter(room_id__in=room_ids).values(
+            'room_id', 'phase', 'night_number', 'day_number'
+        )
+    }
+
+    actions = {}
+    for row in Action.objects.filter(player__room_id__in=room_ids).order_by('timestamp').values(
+        'player__room_id', 'player_id', 'action_type', 'target_id', 'night_number',
+        'timestamp', 'result_data'
+    ):
+        actions.setdefault(row.pop('player__room_id'), []).append(row)
+
+    votes = {}
+    for row in Vote.objects.filter(player__room_id__in=room_ids).order_by('timestamp').values(
+        'player__room_id', 'player_id', 'target_id', 'vote_type', 'vote_phase', 'round', 'timestamp'
+    ):
+        votes.setdefault(row.pop('player__room_id'), []).append(row)
+
+    logs = {}
+    for row in GameLog.objects.filter(room_id__in=room_ids).order_by('timestamp').values(
+        'room_id', 'phase', 'message', 'timestamp', 'metadata'
+    ):
+        logs.setdefault(row.pop('room_id'), []).append(row)
+
+    events = {}
+    for row in GameEvent.objects.filter(room_id__in=room_ids).order_by('id').values(
+        'room_id', 'event_type', 'payload', 'timestamp'
+    ):
+        events.setdefault(row.pop('room_id'), []).append(row)
+
+    return {
+        room.id: {
+            'room': {
+                'code': room.code,
+                'max_players': room.max_players,
+                'created_at': room.created_at,
+                'finished_at': room.finished_at,
+                'num_wolves': room.num_wolves,
+                'num_seers': room.num_seers,
+                'num_protectors': room.num_protectors,
+                'num_hunters': room.num_hunters,
+            },
+            'players': players.get(room.id, []),
+            'game_state': states.get(room.id),
+            'actions': actions.get(room.id, []),
+            'votes': votes.get(room.id, []),
+            'logs': logs.get(room.id, []),
+            'events': events.get(room.id, []),
+        }
+        for room in rooms
+    }
+
+
+def delete_rooms(room_ids):
+    """Delete rooms and their children leaf-first, one bulk DELETE per table"""
+    codes = list(Room.objects.filter(id__in=room_ids).values_list('code', flat=True))
+    Vote.objects.filter(player__room_id__in=room_ids).delete()
+    Action.objects.filter(player__room_id__in=room_ids).delete()
+    GameLog.objects.filter(room_id__in=room_ids).delete()
+    GameSnapshot.objects.filter(room_id__in=room_ids).delete()
+    GameEvent.objects.filter(room_id__in=room_ids).delete()
+    GameState.objects.filter(room_id__in=room_ids).delete()
+    Player.objects.filter(room_id__in=room_ids).delete()
+    Room.objects.filter(id__in=room_ids).delete()
+    transaction.on_commit(lambda: forget_versions(codes))
+
+
+def expire_idle_rooms(ttl=None, batch_size=None, now=None):
+    """Delete waiting rooms that nobody joined within the TTL"""
+    ttl = ttl if ttl is not None else timedelta(minutes=settings.ROOM_WAITING_TTL_MINUTES)
+    batch_size = batch_size or settings.ROOM_REAPER_BATCH_SIZE
+    cutoff = (now or timezone.now()) - ttl
+
+    expired = 0
+    while True:
+        room_ids = list(
+            Room.objects.filter(status='waiting', created_at__lt=cutoff)
+            .annotate(last_activity=Coalesce(Max('players__joined_at'), 'created_at'))
+            .filter(last_activity__lt=cutoff)
+            .order_by('created_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not room_ids:
+            return expired
+
+        with transaction.atomic():
+            delete_rooms(room_ids)
+        expired += len(room_ids)
+
+
+def archive_finished_rooms(grace=None, batch_size=None, now=None):
+    """Compact finished games into ArchivedGame rows and drop their live rows"""
+    grace = grace if grace is not None else timedelta(minutes=settings.ROOM_ARCHIVE_GRACE_MINUTES)
+    batch_size = batch_size or settings.ROOM_REAPER_BATCH_SIZE
+    cutoff = (now or timezone.now()) - grace
+
+    archived = 0
+    while True:
+        # Rooms finished before finished_at existed fall back to created_at
+        rooms = list(
+            Room.objects.filter(status='finished', created_at__lt=cutoff)
+            .annotate(ended_at=Coalesce('finished_at', 'created_at'))
+            .filter(ended_at__lt=cutoff)
+            .order_by('created_at')[:batch_size]
+        )
+        if not rooms:
+            return archived
+
+        records = build_game_records(rooms)
+        archives = []
+        for room in rooms:
+            codec, payload = compress_record(records[room.id])
+            archives.append(ArchivedGame(
+                code=room.code,
+                created_at=room.created_at,
+                finished_at=room.finished_at,
+                codec=codec,
+                payload=payload,
+            ))
+
+        with transaction.atomic():
+            ArchivedGame.objects.bulk_create(archives)
+            delete_rooms([room.id for room in rooms])
+        archived += len(rooms)
+
+
+def reap_rooms(now=None):
+    """Run one full lifecycle pass: expire idle rooms, archive finished ones
+    and resolve deadlines nobody was left to act on"""
+    from .game_logic import recover_deadlines
+
+    now = now or timezone.now()
+    expired = expire_idle_rooms(now=now)
+    if expired:
+        notify_lobby()
+    return {
+        'expired': expired,
+        'archived': archive_finished_rooms(now=now),
+        # Only what is already due: this process may not stay up for the rest
+        'recovered': recover_deadlines(now=now, rearm=False),
+    }
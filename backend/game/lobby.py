@@ -0,0 +1,141 @@
+"""Lobby listing of open rooms.
+
+Pages are keyset-paginated on (created_at, id), newest first, and served
+from the cache for LOBBY_CACHE_SECONDS. Every cached page is keyed by a
+lobby version that is bumped whenever a waiting room appears, changes or
+leaves the lobby, so a change invalidates all pages at once. The same
+changes are pushed to the 'lobby' group for clients browsing over a socket.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from . import wire
+from .fast_serializers import format_datetime
+from .models import Room
+
+LOBBY_GROUP = 'lobby'
+VERSION_KEY = 'lobby:version'
+
+ROLE_FILTERS = {
+    'wolves': 'num_wolves',
+    'seers': 'num_seers',
+    'protectors': 'num_protectors',
+    'hunters': 'num_hunters',
+}
+
+LOBBY_FIELDS = [
+    'id', 'code', 'max_players', 'player_count', 'created_at',
+    'num_wolves', 'num_seers', 'num_protectors', 'num_hunters',
+]
+
+
+def lobby_entry(room):
+    """Public summary of a waiting room; no players, no tokens"""
+    return {
+        'code': room.code,
+        'max_players': room.max_players,
+        'player_count': room.player_count,
+        'free_slots': room.max_players - room.player_count,
+        'created_at': format_datetime(room.created_at),
+        'roles': {
+            'wolves': room.num_wolves,
+            'seers': room.num_seers,
+            'protectors': room.num_protectors,
+            'hunters': room.num_hunters,
+        },
+    }
+
+
+def encode_cursor(room):
+    raw = f'{room.created_at.isoformat()}|{room.id}'.encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor; raises ValueError if it's malformed"""
+    try:
+        created_at, room_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').split('|')
+        return datetime.fromisoformat(created_at), int(room_id)
+    except (binascii.Error, UnicodeError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def lobby_version():
+    return cache.get_or_set(VERSION_KEY, 0, timeout=None)
+
+
+def query_lobby(filters, cursor=None, limit=20):
+    """One page of open rooms straight from the database"""
+    rooms = Room.objects.filter(status='waiting', player_count__lt=F('max_players'))
+
+    if filters.get('size') is not None:
+        rooms = rooms.filter(max_players=filters['size'])
+    if filters.get('min_free') is not None:
+        rooms = rooms.filter(max_players__gte=F('player_count') + filters['min_free'])
+    for name, field in ROLE_FILTERS.items():
+        if filters.get(name) is not None:
+            rooms = rooms.filter(**{field: filters[name]})
+
+    if cursor:
+        created_at, room_id = decode_cursor(cursor)
+        rooms = rooms.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=room_id)
+        )
+
+    # One extra row tells whether there is a next page
+    page = list(rooms.only(*LOBBY_FIELDS).order_by('-created_at', '-id')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return {
+        'rooms': [lobby_entry(room) for room in page],
+        'next_cursor': encode_cursor(page[-1]) if has_more else None,
+    }
+
+
+def lobby_page(filters, cursor=None, limit=20):
+    """Cached page of open rooms"""
+    params = '&'.join(
+        f'{name}={value}' for name, value in sorted(filters.items()) if value is not None
+    )
+    key = f'lobby:{lobby_version()}:{params}:{cursor}:{limit}'
+    page = cache.get(key)
+    if page is None:
+        page = query_lobby(filters, cursor, limit)
+        cache.set(key, page, settings.LOBBY_CACHE_SECONDS)
+    return page
+
+
+def notify_lobby(room=None):
+    """Invalidate cached pages and push the room's new lobby entry.
+
+    Rooms that are no longer open (started or full) are sent as removals so
+    browsing clients can drop them. Without a room (bulk changes) clients
+    are told to refetch instead.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+    if room is None:
+        message = {'type': 'lobby_refresh'}
+    elif room.status == 'waiting' and room.player_count < room.max_players:
+        message = {'type': 'lobby_update', 'room': lobby_entry(room)}
+    else:
+        message = {'type': 'lobby_remove', 'code': room.code}
+
+    async_to_sync(get_channel_layer().group_send)(
+        LOBBY_GROUP,
+        {
+            'type': 'lobby_event',
+            **wire.broadcast(message)
+        }
+    )
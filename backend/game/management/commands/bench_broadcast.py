@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from game import wire
+
+
+def sample_update(num_players):
+    """A player_eliminated-sized broadcast plus a roster, like phase changes"""
+    return {
+        'type': 'game_update',
+        'data': {
+            'type': 'phase_change',
+            'phase': 'day',
+            'day_number': 3,
+            'deaths': [{'id': 1003, 'nickname': 'player_03', 'role': 'seer'}],
+            'players': [
+                {'id': 1000 + i, 'nickname': f'player_{i:02d}', 'is_alive': i != 3}
+                for i in range(num_players)
+            ],
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = 'CPU per broadcast: encode per socket vs encode once per worker and codec'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[8, 20, 50, 200])
+        parser.add_argument('--broadcasts', type=int, default=500)
+
+    def handle(self, *args, **options):
+        broadcasts = options['broadcasts']
+        codec = wire.DEFAULT_CODEC
+        self.stdout.write(f"{'sockets':>7} {'per-socket us':>14} {'once us':>9} {'saving':>7}")
+        for size in options['sizes']:
+            message = sample_update(size)
+            sent = []
+
+            # Old path: every GameConsumer.game_update encodes the same dict
+            start = time.process_time()
+            for _ in range(broadcasts):
+                for _ in range(size):
+                    sent.append(codec.encode(message))
+            per_socket = (time.process_time() - start) / broadcasts
+
+            # New path: the first socket per codec encodes, the rest reuse it
+            start = time.process_time()
+            for _ in range(broadcasts):
+                event = wire.broadcast(message)
+                for _ in range(size):
+                    sent.append(wire.frame_for(event, codec))
+            once = (time.process_time() - start) / broadcasts
+
+            sent.clear()
+            self.stdout.write(
+                f'{size:>7} {per_socket * 1e6:>14.1f} {once * 1e6:>9.1f} '
+                f'{per_socket / once:>6.1f}x'
+            )
@@ -0,0 +1,108 @@
+import asyncio
+import secrets
+import statistics
+import time
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from game import consumers
+from game.game_logic import assign_roles, broadcast_game_update
+from game.models import Room, Player
+from game.views import RoomViewSet
+
+
+class Command(BaseCommand):
+    help = 'Compare per-second state polling with a clock_sync handshake for one full room'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=20)
+        parser.add_argument('--seconds', type=int, default=120,
+                            help='Length of the phase being counted down (default: 120)')
+        parser.add_argument('--samples', type=int, default=5,
+                            help='clock_sync exchanges per client (default: 5)')
+
+    def handle(self, *args, **options):
+        players, seconds, samples = options['players'], options['seconds'], options['samples']
+        room = Room.objects.create(
+            admin_token=secrets.token_urlsafe(24), max_players=players,
+            num_wolves=max(1, players // 5)
+        )
+        Player.objects.bulk_create([
+            Player(room=room, nickname=f'bench_{i}', token=secrets.token_urlsafe(24))
+            for i in range(players)
+        ])
+        try:
+            # In-memory layer: measure the app, not Redis
+            with override_settings(CHANNEL_LAYERS={
+                'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+            }):
+                assign_roles(room)
+                polls, poll_queries, poll_elapsed = self.poll(room.code, players * seconds)
+                rtts, offsets, sync_elapsed = asyncio.run(self.sync(room, players, samples))
+        finally:
+            room.delete()
+
+        exchanges = players * samples
+        self.stdout.write(f'{players} players counting down a {seconds}s phase')
+        self.stdout.write(
+            f'  polling state every second: {polls} requests, {poll_queries} queries, '
+            f'{poll_elapsed:.2f}s of server time'
+        )
+        self.stdout.write(
+            f'  clock_sync handshake:       {exchanges} socket messages, 0 queries, '
+            f'{sync_elapsed:.2f}s, then 0 requests (timer_end comes with the phase event)'
+        )
+        self.stdout.write(f'  requests saved:             {polls} ({polls / exchanges:.0f}x fewer messages)')
+        self.stdout.write(
+            f'  best RTT ms:                median {statistics.median(rtts):.2f}, max {max(rtts):.2f}; '
+            f'offset error ms max {max(abs(offset) for offset in offsets):.2f}'
+        )
+
+    def poll(self, room_code, requests):
+        view = RoomViewSet.as_view({'get': 'state'})
+        factory = RequestFactory()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(requests):
+                view(factory.get(f'/api/rooms/{room_code}/state/'), code=room_code)
+            elapsed = time.perf_counter() - start
+        return requests, len(queries), elapsed
+
+    async def sync(self, room, players, samples):
+        clients = []
+        for _ in range(players):
+            communicator = WebsocketCommunicator(
+                consumers.GameConsumer.as_asgi(), f'/ws/game/{room.code}/'
+            )
+            communicator.scope['url_route'] = {'kwargs': {'room_code': room.code}}
+            await communicator.connect(timeout=60)
+            await communicator.receive_json_from(timeout=60)
+            clients.append(communicator)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self.handshake(client, samples) for client in clients))
+        elapsed = time.perf_counter() - start
+
+        # The countdown itself needs nothing more than the phase event
+        await asyncio.to_thread(broadcast_game_update, room, {'type': 'phase_change'})
+        for client in clients:
+            await client.receive_json_from(timeout=60)
+            await client.disconnect()
+        return [rtt for rtt, _ in results], [offset for _, offset in results], elapsed
+
+    async def handshake(self, client, samples):
+        best = None
+        for _ in range(samples):
+            t0 = time.time() * 1000
+            await client.send_json_to({'type': 'clock_sync', 't0': t0})
+            reply = await client.receive_json_from(timeout=60)
+            t3 = time.time() * 1000
+            rtt = (t3 - t0) - (reply['t2'] - reply['t1'])
+            offset = ((reply['t1'] - t0) + (reply['t2'] - t3)) / 2
+            if best is None or rtt < best[0]:
+                best = (rtt, offset)
+        return best
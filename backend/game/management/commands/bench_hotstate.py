@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from game.hotstate import DatabaseStore, RedisStore
+from game.models import Room, Player, GameState
+
+
+class Command(BaseCommand):
+    help = 'Cost per vote and night action: database store vs Redis store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=20)
+        parser.add_argument('--rounds', type=int, default=50,
+                            help='Times every player re-casts their vote')
+        parser.add_argument('--redis-url', default=settings.GAME_STATE_REDIS_URL)
+        parser.add_argument('--fake', action='store_true',
+                            help='Use fakeredis (with lupa for Lua) instead of a server')
+
+    def redis_store(self, options):
+        store = RedisStore(options['redis_url'])
+        if options['fake']:
+            try:
+                import fakeredis
+            except ImportError:
+                raise CommandError('--fake needs fakeredis[lua]')
+            store.client = fakeredis.FakeRedis(decode_responses=True)
+            store.night_action_script = store.client.register_script(store.night_action_script.script)
+            store.cast_vote_script = store.client.register_script(store.cast_vote_script.script)
+        return store
+
+    def handle(self, *args, **options):
+        stores = [('db', DatabaseStore()), ('redis', self.redis_store(options))]
+        count = options['players']
+
+        self.stdout.write(f"{'store':>6} {'vote us':>9} {'action us':>10} {'flush ms':>9}")
+        for name, store in stores:
+            with transaction.atomic():
+                room = Room.objects.create(admin_token=f'bench-hotstate-{name}', max_players=count,
+                                           status='playing')
+                players = Player.objects.bulk_create([
+                    Player(room=room, nickname=f'p{i}', token=f'bench-hotstate-{name}-{i}',
+                           role='wolf' if i < 3 else 'citizen')
+                    for i in range(count)
+                ])
+                if any(player.pk is None for player in players):
+                    players = list(room.players.all())
+                game_state = GameState.objects.create(room=room, phase='voting', day_number=1)
+                store.start_game(room, players)
+
+                start = time.perf_counter()
+                for round in range(options['rounds']):
+                    for index, player in enumerate(players):
+                        error, _, _ = store.cast_vote(player, players[(index + round + 1) % count], game_state)
+                        assert error is None, error
+                votes = time.perf_counter() - start
+
+                start = time.perf_counter()
+                for round in range(options['rounds']):
+                    for index, player in enumerate(players[:3]):
+                        error, _ = store.record_night_action(
+                            player, players[3 + (index + round) % (count - 3)], 'wolf_vote', round + 1
+                        )
+                        assert error is None, error
+                actions = time.perf_counter() - start
+
+                start = time.perf_counter()
+                store.finish_game(room)
+                flush = time.perf_counter() - start
+
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{name:>6} {votes / (options['rounds'] * count) * 1e6:9.0f} "
+                f"{actions / (options['rounds'] * 3) * 1e6:10.0f} {flush * 1e3:9.1f}"
+            )
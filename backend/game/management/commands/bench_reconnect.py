@@ -0,0 +1,73 @@
+import asyncio
+import secrets
+import statistics
+import time
+
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from game import consumers
+from game.models import Room, Player
+
+
+class Command(BaseCommand):
+    help = 'Simulate a reconnect storm against GameConsumer on one worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=5000)
+        parser.add_argument('--players', type=int, default=20)
+
+    def handle(self, *args, **options):
+        room = Room.objects.create(admin_token=secrets.token_urlsafe(24), max_players=options['players'])
+        Player.objects.bulk_create([
+            Player(room=room, nickname=f'bench_{i}', token=secrets.token_urlsafe(24))
+            for i in range(options['players'])
+        ])
+        try:
+            # In-memory layer: measure the consumer, not Redis
+            with override_settings(CHANNEL_LAYERS={
+                'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+            }):
+                asyncio.run(self.storm(room.code, options['clients']))
+        finally:
+            room.delete()
+
+    async def storm(self, room_code, clients):
+        builds = 0
+        build_game_state = consumers.build_game_state
+
+        async def counting_build(code):
+            nonlocal builds
+            builds += 1
+            return await build_game_state(code)
+
+        consumers.build_game_state = counting_build
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(self.reconnect(room_code) for _ in range(clients)))
+            elapsed = time.perf_counter() - start
+        finally:
+            consumers.build_game_state = build_game_state
+
+        admitted = [result for kind, result in results if kind == 'initial_state']
+        hints = sorted(result for kind, result in results if kind == 'retry')
+        self.stdout.write(f'{clients} simultaneous reconnects in {elapsed:.2f}s')
+        self.stdout.write(f'  admitted:        {len(admitted)}')
+        self.stdout.write(f'  snapshot builds: {builds}')
+        self.stdout.write(f'  retry hints:     {len(hints)}')
+        if hints:
+            self.stdout.write(
+                f'  retry after ms:  min {hints[0]}, median {int(statistics.median(hints))}, '
+                f'max {hints[-1]}'
+            )
+
+    async def reconnect(self, room_code):
+        communicator = WebsocketCommunicator(consumers.GameConsumer.as_asgi(), f'/ws/game/{room_code}/')
+        communicator.scope['url_route'] = {'kwargs': {'room_code': room_code}}
+        await communicator.connect(timeout=60)
+        message = await communicator.receive_json_from(timeout=60)
+        await communicator.disconnect()
+        if message['type'] == 'retry':
+            return 'retry', message['retry_after_ms']
+        return message['type'], None
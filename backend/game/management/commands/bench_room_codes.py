@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from game import room_codes
+
+
+class Command(BaseCommand):
+    help = 'Benchmark room code generation and check uniqueness at scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2_000_000,
+                            help='Codes to derive in memory and check for duplicates')
+        parser.add_argument('--allocate', type=int, default=0,
+                            help='Also allocate this many codes through the DB counter')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        start = time.perf_counter()
+        codes = {room_codes.code_for(value) for value in range(count)}
+        elapsed = time.perf_counter() - start
+        if len(codes) != count:
+            raise CommandError(f'{count - len(codes)} duplicate codes')
+        self.stdout.write(
+            f'Derived {count:,} unique codes in {elapsed:.2f}s '
+            f'({count / elapsed:,.0f} codes/s, {len(codes) / room_codes.CODE_SPACE:.4%} of the space)'
+        )
+
+        if options['allocate']:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                allocated = {room_codes.allocate_room_code() for _ in range(options['allocate'])}
+                elapsed = time.perf_counter() - start
+            if len(allocated) != options['allocate']:
+                raise CommandError('Allocator returned duplicate codes')
+            self.stdout.write(
+                f"Allocated {options['allocate']:,} codes in {elapsed:.2f}s "
+                f'with {len(queries)} queries'
+            )
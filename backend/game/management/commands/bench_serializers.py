@@ -0,0 +1,63 @@
+import timeit
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from game.fast_serializers import serialize_room, serialize_game_state
+from game.models import Room, Player, GameState
+from game.renderers import FastJSONRenderer
+from game.serializers import RoomSerializer, GameStateSerializer
+
+
+def sample_room(num_players):
+    """Unsaved room with a prefetched player list, so no query is issued"""
+    now = timezone.now()
+    room = Room(id=1, code='ABC123', admin_token='x', max_players=num_players,
+                status='playing', created_at=now)
+    players = [
+        Player(id=100 + i, room=room, nickname=f'joueuré_{i} ', token=f'tok{i}',
+               is_alive=i % 3 != 0, is_leader=i == 1, joined_at=now,
+               speaking_time_used=i)
+        for i in range(num_players)
+    ]
+    room._prefetched_objects_cache = {'players': players}
+    return room
+
+
+class Command(BaseCommand):
+    help = 'Check fast serializers match DRF byte for byte and compare their cost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[8, 20, 50])
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        drf_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+
+        # A past timer keeps time_remaining deterministic (always 0)
+        game_state = GameState(phase='day', night_number=2, day_number=2,
+                               timer_end=timezone.now() - timedelta(seconds=1),
+                               speaking_order=[101, 102])
+        cases = [('state', lambda: GameStateSerializer(game_state).data,
+                  lambda: serialize_game_state(game_state))]
+        for size in options['sizes']:
+            room = sample_room(size)
+            cases.append((f'room/{size}', lambda room=room: RoomSerializer(room).data,
+                          lambda room=room: serialize_room(room)))
+
+        self.stdout.write(f"{'payload':>10} {'drf us':>9} {'fast us':>9} {'speedup':>8}")
+        for name, drf, fast in cases:
+            expected = drf_renderer.render(drf())
+            if fast_renderer.render(fast()) != expected:
+                raise CommandError(f'{name}: fast output differs from DRF')
+
+            drf_time = timeit.timeit(lambda: drf_renderer.render(drf()), number=iterations)
+            fast_time = timeit.timeit(lambda: fast_renderer.render(fast()), number=iterations)
+            self.stdout.write(
+                f'{name:>10} {drf_time / iterations * 1e6:>9.1f} '
+                f'{fast_time / iterations * 1e6:>9.1f} {drf_time / fast_time:>7.1f}x'
+            )
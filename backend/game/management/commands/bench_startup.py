@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: load the ASGI app, then serve one GET in-process
+PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+from loupgarou.asgi import application
+loaded = time.perf_counter()
+
+async def first_response():
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': sys.argv[1], 'raw_path': sys.argv[1].encode(),
+        'query_string': b'', 'root_path': '', 'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    request = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if request:
+            return request.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    return sent[0]['status']
+
+status = asyncio.run(first_response())
+done = time.perf_counter()
+print(json.dumps({
+    'status': status, 'load': loaded - start, 'request': done - loaded, 'finished_at': time.time(),
+}))
+"""
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)')
+
+
+class Command(BaseCommand):
+    help = 'Cold start per settings profile: time to first response and import-time breakdown'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-profiles', nargs='+',
+                            default=['loupgarou.settings', 'loupgarou.settings_api'])
+        parser.add_argument('--path', default='/api/rooms/lobby/',
+                            help='GET served as the first request (needs a migrated database)')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=12,
+                            help='Packages to list in the import breakdown')
+
+    def probe(self, profile, path):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=profile)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+        started_at = time.time()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'{profile} failed to start:\n{result.stderr[-2000:]}')
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report['first_response'] = report['finished_at'] - started_at
+
+        imports = Counter()
+        for line in result.stderr.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match:
+                imports[match.group(2).split('.')[0]] += int(match.group(1))
+        return report, imports
+
+    def handle(self, *args, **options):
+        for profile in options['settings_profiles']:
+            reports, imports = [], Counter()
+            for _ in range(options['runs']):
+                report, run_imports = self.probe(profile, options['path'])
+                reports.append(report)
+                imports.update(run_imports)
+
+            def median_ms(key):
+                return statistics.median(report[key] for report in reports) * 1e3
+
+            statuses = sorted({report['status'] for report in reports})
+            self.stdout.write(
+                f"{profile}: first response {median_ms('first_response'):.0f} ms "
+                f"(app load {median_ms('load'):.0f} ms, first request {median_ms('request'):.0f} ms, "
+                f"status {', '.join(map(str, statuses))})"
+            )
+            total = sum(imports.values()) / options['runs']
+            self.stdout.write(f"  imports {total / 1e3:.0f} ms, by top-level package:")
+            for package, micros in imports.most_common(options['top']):
+                self.stdout.write(f"  {package:>24} {micros / options['runs'] / 1e3:7.1f} ms")
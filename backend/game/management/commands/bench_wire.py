@@ -0,0 +1,67 @@
+import timeit
+import zlib
+
+from django.core.management.base import BaseCommand
+
+from game import wire
+
+
+def sample_initial_state(num_players):
+    """Build an initial_state frame shaped like GameConsumer.get_game_state"""
+    return {
+        'type': 'initial_state',
+        'data': {
+            'room': {'code': 'ABC123', 'status': 'playing', 'max_players': num_players},
+            'players': [
+                {
+                    'id': 1000 + i,
+                    'nickname': f'player_{i:02d}',
+                    'is_alive': i % 3 != 0,
+                    'is_leader': i == 1,
+                }
+                for i in range(num_players)
+            ],
+            'game_state': {
+                'phase': 'day',
+                'night_number': 2,
+                'day_number': 2,
+                'current_speaker_id': 1001,
+                'timer_end': '2026-01-27T21:19:00+00:00',
+            },
+        },
+    }
+
+
+def deflated_size(payload):
+    """Approximate the size of a frame under permessage-deflate"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return len(compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH))
+
+
+class Command(BaseCommand):
+    help = 'Compare bytes per frame and encode CPU of the WebSocket codecs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[8, 20, 50])
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        self.stdout.write(
+            f"{'players':>7} {'codec':>8} {'bytes':>7} {'deflate':>8} "
+            f"{'encode us':>10} {'decode us':>10}"
+        )
+        for size in options['sizes']:
+            message = sample_initial_state(size)
+            for codec in wire.CODECS.values():
+                payload = codec.encode(message)
+                assert codec.decode(payload) == message
+                encode = timeit.timeit(lambda: codec.encode(message), number=iterations)
+                decode = timeit.timeit(lambda: codec.decode(payload), number=iterations)
+                self.stdout.write(
+                    f'{size:>7} {codec.name:>8} {len(payload):>7} '
+                    f'{deflated_size(payload):>8} '
+                    f'{encode / iterations * 1e6:>10.1f} {decode / iterations * 1e6:>10.1f}'
+                )
@@ -0,0 +1,72 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from game.analytics import FORMATS, SETTLE, TABLES, default_format, export_batches, writer_for
+
+CHECKPOINT = '_checkpoint.json'
+
+
+class Command(BaseCommand):
+    help = 'Export finished games as games/players/actions/votes tables (Parquet or CSV)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Directory; each run adds <table>/<timestamp>.<format>')
+        parser.add_argument('--format', choices=FORMATS, default=default_format(),
+                            help='parquet (needs pyarrow, the default when installed) or csv')
+        parser.add_argument('--incremental', action='store_true',
+                            help=f'Only games finished since the last run (kept in {CHECKPOINT})')
+        parser.add_argument('--since', help='Only games finished after this ISO timestamp')
+        parser.add_argument('--batch-size', type=int, help='Games read per batch')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        checkpoint = os.path.join(output, CHECKPOINT)
+        since = options['since'] and parse_datetime(options['since'])
+        if options['since'] and since is None:
+            raise CommandError(f"Invalid --since: {options['since']}")
+        if options['incremental'] and since is None and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                since = parse_datetime(json.load(f)['until'])
+        until = timezone.now() - SETTLE
+
+        # Files start with '_' until the run completes, so dataset readers skip them
+        name = until.strftime('%Y%m%dT%H%M%S')
+        paths = {}
+        files = {}
+        writers = {}
+        for table in TABLES:
+            os.makedirs(os.path.join(output, table), exist_ok=True)
+            paths[table] = os.path.join(output, table, f"{name}.{options['format']}")
+            files[table] = open(os.path.join(output, table, f"_{name}.{options['format']}"), 'wb')
+            writers[table] = writer_for(options['format'], files[table], table)
+
+        started = time.perf_counter()
+        counts = dict.fromkeys(TABLES, 0)
+        try:
+            for batch in export_batches(since, until, options['batch_size']):
+                for table, rows in batch.items():
+                    writers[table].write(rows)
+                    counts[table] += len(rows)
+        finally:
+            for table in TABLES:
+                writers[table].close()
+                files[table].close()
+
+        for table in TABLES:
+            partial = files[table].name
+            if counts['games']:
+                os.replace(partial, paths[table])
+            else:
+                os.remove(partial)
+        if options['incremental']:
+            with open(checkpoint, 'w') as f:
+                json.dump({'until': until.isoformat()}, f)
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {table}' for table, count in counts.items())
+        self.stdout.write(f"Exported {summary} as {options['format']} in {elapsed:.2f}s")
@@ -0,0 +1,46 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.provisioning import provision_rooms
+
+
+class Command(BaseCommand):
+    help = 'Create many rooms with preassigned players, optionally starting them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10, help='Number of rooms')
+        parser.add_argument('--players', type=int, default=8, help='Players per room')
+        parser.add_argument('--wolves', type=int, default=2)
+        parser.add_argument('--seers', type=int, default=1)
+        parser.add_argument('--protectors', type=int, default=1)
+        parser.add_argument('--hunters', type=int, default=1)
+        parser.add_argument('--start', action='store_true', help='Assign roles and start every game')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--output', help='Write codes and tokens as JSON to this file')
+
+    def handle(self, *args, **options):
+        spec = {
+            'max_players': options['players'],
+            'num_wolves': options['wolves'],
+            'num_seers': options['seers'],
+            'num_protectors': options['protectors'],
+            'num_hunters': options['hunters'],
+        }
+        specs = [
+            dict(spec, players=[f'Player {i + 1}' for i in range(options['players'])])
+            for _ in range(options['count'])
+        ]
+
+        started = time.perf_counter()
+        try:
+            rooms = provision_rooms(specs, start=options['start'], batch_size=options['batch_size'])
+        except ValueError as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - started
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(rooms, output, indent=2)
+        self.stdout.write(f'Provisioned {len(rooms)} rooms in {elapsed:.2f}s')
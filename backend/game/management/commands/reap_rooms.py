@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from game.lifecycle import reap_rooms
+
+
+class Command(BaseCommand):
+    help = 'Expire idle waiting rooms, archive finished games and resolve overdue deadlines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running, reaping every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval', type=int, default=300,
+            help='Seconds between passes in --loop mode (default: 300)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            result = reap_rooms()
+            self.stdout.write(
+                f"Expired {result['expired']} idle rooms, "
+                f"archived {result['archived']} finished games, "
+                f"resolved {result['recovered']} overdue deadlines"
+            )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,146 @@
+"""Live load figures for the ops console (admin/ops/).
+
+Room figures come from a handful of grouped aggregate queries, so they
+cost the same with ten rooms or a hundred thousand. Latencies, counters
+and online players are in memory in the current worker process:
+latencies are kept for the last METRICS_LATENCY_WINDOW samples per
+name (action endpoints, bot decisions), and online players are the
+presence tracker's view.
+"""
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import Room, Player, GameState
+from .presence import tracker
+
+_latencies = {}
+_counters = Counter()
+_lock = threading.Lock()
+
+
+class Latency:
+    def __init__(self, window):
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        if not recent:
+            return {'count': self.count, 'p50_ms': None, 'p95_ms': None, 'max_ms': None}
+        return {
+            'count': self.count,
+            'p50_ms': recent[len(recent) // 2] * 1e3,
+            'p95_ms': recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1e3,
+            'max_ms': recent[-1] * 1e3,
+        }
+
+
+def observe(name, seconds):
+    with _lock:
+        latency = _latencies.get(name)
+        if latency is None:
+            latency = _latencies[name] = Latency(settings.METRICS_LATENCY_WINDOW)
+        latency.observe(seconds)
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+@contextmanager
+def timed(name):
+    """Record how long the block (or decorated view) takes under name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def latency_summary():
+    with _lock:
+        return {name: latency.summary() for name, latency in sorted(_latencies.items())}
+
+
+def counters():
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def online_player_count():
+    rooms = set(tracker.local) | set(tracker.remote)
+    return sum(len(tracker.online_players(code)) for code in rooms)
+
+
+def room_metrics(now=None):
+    """Rooms by status and phase, time in phase, and rooms that look stuck"""
+    now = now or timezone.now()
+    grace = now - timedelta(seconds=settings.OPS_STUCK_GRACE_SECONDS)
+
+    rooms_by_status = dict(Room.objects.values_list('status').annotate(Count('id')).order_by())
+
+    playing = GameState.objects.filter(room__status='playing')
+    phases = [
+        {
+            'phase': row['phase'],
+            'rooms': row['rooms'],
+            'longest_seconds': (now - row['oldest']).total_seconds() if row['oldest'] else None,
+        }
+        for row in playing.values('phase').annotate(
+            rooms=Count('id'), oldest=Min('phase_started_at')
+        ).order_by('phase')
+    ]
+
+    players = Player.objects.filter(room__status='playing').aggregate(
+        total=Count('id'), alive=Count('id', filter=Q(is_alive=True))
+    )
+
+    # Past their timer (the scheduler or an admin should have moved them on),
+    # or held up by a tie: a runoff or the leader deciding
+    stuck = playing.filter(
+        Q(timer_end__lt=grace) | Q(leader_decides=True) | Q(vote_round__gt=0)
+    )
+    stuck_rooms = [
+        {
+            'code': code,
+            'phase': phase,
+            'reason': 'timer expired' if timer_end and timer_end < grace
+            else 'leader decides' if leader_decides else f'runoff round {vote_round}',
+            'in_phase_seconds': (now - started).total_seconds(),
+        }
+        for code, phase, timer_end, leader_decides, vote_round, started in stuck.order_by(
+            'phase_started_at'
+        ).values_list(
+            'room__code', 'phase', 'timer_end', 'leader_decides', 'vote_round', 'phase_started_at'
+        )[:settings.OPS_STUCK_LIMIT]
+    ]
+
+    return {
+        'rooms_by_status': rooms_by_status,
+        'phases': phases,
+        'players': players,
+        'stuck_count': stuck.count(),
+        'stuck_rooms': stuck_rooms,
+    }
+
+
+def snapshot(now=None):
+    """Everything the ops console shows"""
+    return {
+        **room_metrics(now),
+        'online_players': online_player_count(),
+        'latency': latency_summary(),
+        'counters': counters(),
+    }
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_room_lifecycle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('role_assigned', 'Role Assigned'), ('phase_changed', 'Phase Changed'), ('wolf_vote', 'Wolf Vote'), ('inspected', 'Seer Inspected'), ('protected', 'Protected'), ('killed', 'Killed'), ('vote_cast', 'Vote Cast'), ('eliminated', 'Eliminated'), ('leader_elected', 'Leader Elected'), ('game_ended', 'Game Ended')], max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='game.room')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['room', 'id'], name='game_gameev_room_id_1f8a18_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GameSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.BigIntegerField()),
+                ('state', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='game.room')),
+            ],
+            options={
+                'ordering': ['-last_event_id'],
+                'indexes': [models.Index(fields=['room', '-last_event_id'], name='game_gamesn_room_id_e27937_idx')],
+            },
+        ),
+    ]
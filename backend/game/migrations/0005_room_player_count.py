@@ -0,0 +1,35 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:41
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_player_count(apps, schema_editor):
+    Room = apps.get_model('game', 'Room')
+    Player = apps.get_model('game', 'Player')
+    counts = (
+        Player.objects.filter(room=OuterRef('pk'))
+        .values('room').annotate(count=Count('id')).values('count')
+    )
+    Room.objects.update(player_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_room_code_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='player_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_player_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='game_room_lobby_idx'),
+        ),
+    ]
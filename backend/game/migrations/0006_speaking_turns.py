@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_room_player_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamestate',
+            name='speaker_ends_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gamestate',
+            name='speaker_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
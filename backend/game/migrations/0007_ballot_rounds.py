@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_speaking_turns'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='gamestate',
+            name='ballot_candidates',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='gamestate',
+            name='leader_decides',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='gamestate',
+            name='vote_round',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='round',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together={('player', 'vote_type', 'vote_phase', 'round')},
+        ),
+    ]
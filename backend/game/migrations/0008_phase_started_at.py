@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-19 11:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_ballot_rounds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamestate',
+            name='phase_started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
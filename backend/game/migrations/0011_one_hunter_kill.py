@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_player_is_bot'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='action',
+            constraint=models.UniqueConstraint(condition=models.Q(('action_type', 'hunter_kill')), fields=('player',), name='one_hunter_kill_per_player'),
+        ),
+    ]
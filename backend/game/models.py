@@ -1,10 +1,16 @@
 from django.db import models
 from django.utils import timezone
-import random
-import string
 
 def generate_room_code():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+    from .room_codes import allocate_room_code
+    return allocate_room_code()
+
+class RoomCodeCounter(models.Model):
+    """Single-row counter that room codes are derived from (see room_codes.py)"""
+    next_value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"Room code counter at {self.next_value}"
 
 class Room(models.Model):
     STATUS_CHOICES = [
@@ -18,6 +24,11 @@ class Room(models.Model):
     max_players = models.IntegerField(default=8)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
     created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Denormalized so the lobby can filter on free slots without a join
+    player_count = models.IntegerField(default=0)
+    # Bumped on every visible change; keys the cached views (see projections.py)
+    version = models.PositiveIntegerField(default=0)
     
     # Role configuration
     num_wolves = models.IntegerField(default=2)
@@ -30,6 +41,10 @@ class Room(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', '-created_at', '-id'], name='game_room_lobby_idx'),
+        ]
 
 class Player(models.Model):
     ROLE_CHOICES = [
@@ -46,6 +61,8 @@ class Player(models.Model):
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, null=True, blank=True)
     is_alive = models.BooleanField(default=True)
     is_leader = models.BooleanField(default=False)
+    # Played by the server (see bots.py)
+    is_bot = models.BooleanField(default=False)
     joined_at = models.DateTimeField(auto_now_add=True)
     
     # Speaking time tracking
@@ -77,10 +94,18 @@ class GameState(models.Model):
     night_number = models.IntegerField(default=0)
     day_number = models.IntegerField(default=0)
     timer_end = models.DateTimeField(null=True, blank=True)
+    phase_started_at = models.DateTimeField(default=timezone.now)
     
     # Current speaking player
     current_speaker_id = models.IntegerField(null=True, blank=True)
     speaking_order = models.JSONField(default=list)  # List of player IDs
+    speaker_started_at = models.DateTimeField(null=True, blank=True)
+    speaker_ends_at = models.DateTimeField(null=True, blank=True)
+    
+    # Current ballot (leader election or elimination); see elections.py
+    vote_round = models.IntegerField(default=0)
+    ballot_candidates = models.JSONField(default=list)  # Empty means any alive player
+    leader_decides = models.BooleanField(default=False)
     
     # Night action tracking
     wolves_voted = models.BooleanField(default=False)
@@ -112,6 +137,13 @@ class Action(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        constraints = [
+            # A hunter's revenge is a one-time action
+            models.UniqueConstraint(
+                fields=['player'], condition=models.Q(action_type='hunter_kill'),
+                name='one_hunter_kill_per_player'
+            ),
+        ]
 
 class Vote(models.Model):
     VOTE_TYPE_CHOICES = [
@@ -123,13 +155,14 @@ class Vote(models.Model):
     target = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='votes_received')
     vote_type = models.CharField(max_length=20, choices=VOTE_TYPE_CHOICES)
     vote_phase = models.IntegerField()  # day_number for elimination, unique identifier for leader
+    round = models.IntegerField(default=0)  # 0 for the first ballot, then runoffs
     timestamp = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.player.nickname} votes for {self.target.nickname}"
     
     class Meta:
-        unique_together = ['player', 'vote_type', 'vote_phase']
+        unique_together = ['player', 'vote_type', 'vote_phase', 'round']
         ordering = ['-timestamp']
 
 class GameLog(models.Model):
@@ -144,3 +177,73 @@ class GameLog(models.Model):
     
     class Meta:
         ordering = ['timestamp']
+
+class ArchivedGame(models.Model):
+    """Compressed snapshot of a finished game whose live rows were deleted"""
+    CODEC_CHOICES = [
+        ('gzip', 'gzip'),
+        ('zstd', 'zstd'),
+    ]
+    
+    code = models.CharField(max_length=6, db_index=True)
+    created_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    codec = models.CharField(max_length=10, choices=CODEC_CHOICES)
+    payload = models.BinaryField()
+    
+    def __str__(self):
+        return f"Archive of {self.code}"
+    
+    def load(self):
+        """Decompress and decode the archived game record"""
+        from .lifecycle import decompress_record
+        return decompress_record(self.codec, bytes(self.payload))
+    
+    class Meta:
+        ordering = ['-archived_at']
+
+class GameEvent(models.Model):
+    """Append-only, typed record of everything that happened in a room"""
+    EVENT_TYPE_CHOICES = [
+        ('role_assigned', 'Role Assigned'),
+        ('phase_changed', 'Phase Changed'),
+        ('wolf_vote', 'Wolf Vote'),
+        ('inspected', 'Seer Inspected'),
+        ('protected', 'Protected'),
+        ('killed', 'Killed'),
+        ('vote_cast', 'Vote Cast'),
+        ('eliminated', 'Eliminated'),
+        ('leader_elected', 'Leader Elected'),
+        ('game_ended', 'Game Ended'),
+    ]
+    
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='events')
+    event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES)
+    payload = models.JSONField(default=dict)
+    timestamp = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.room_id} - {self.event_type} #{self.id}"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['room', 'id']),
+        ]
+
+class GameSnapshot(models.Model):
+    """Folded game state as of a given event, so replays only read the tail"""
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='snapshots')
+    last_event_id = models.BigIntegerField()
+    state = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Snapshot of {self.room_id} at event {self.last_event_id}"
+    
+    class Meta:
+        ordering = ['-last_event_id']
+        indexes = [
+            models.Index(fields=['room', '-last_event_id']),
+        ]
@@ -0,0 +1,117 @@
+"""Night actions and votes, shared by the REST views and server-side bots.
+
+Callers authenticate the player and look up the target; everything after
+that (rule checks, storing, events, broadcasts) happens here, so a bot's
+move goes through exactly the same rules as a human's. Each function
+returns (response data, error).
+"""
+from .events import record_event
+from .game_logic import broadcast_game_update
+from .hotstate import get_store
+from .projections import bump_version
+from .serializers import VoteSerializer
+
+EVENT_TYPE_BY_ROLE = {
+    'wolf': 'wolf_vote',
+    'seer': 'inspected',
+    'protector': 'protected',
+}
+
+ACTION_TYPE_BY_ROLE = {
+    'wolf': 'wolf_vote',
+    'seer': 'seer_inspect',
+    'protector': 'protector_protect',
+}
+
+
+def submit_night_action(player, target):
+    """Record a night action against target"""
+    if not player.is_alive:
+        return None, 'Dead players cannot act'
+
+    game_state = player.room.game_state
+    if game_state.phase != 'night':
+        return None, 'Not night phase'
+
+    if not target.is_alive:
+        return None, 'Cannot target dead player'
+
+    action_type = ACTION_TYPE_BY_ROLE.get(player.role)
+    if not action_type:
+        return None, 'Your role has no night action'
+
+    # Store the action (also enforces the protector's no-repeat rule)
+    error, wolves_done = get_store().record_night_action(
+        player, target, action_type, game_state.night_number
+    )
+    if error:
+        return None, error
+
+    record_event(
+        player.room, EVENT_TYPE_BY_ROLE[player.role],
+        player_id=player.id, target_id=target.id,
+        night_number=game_state.night_number
+    )
+
+    # Update game state flags
+    if player.role == 'wolf':
+        if wolves_done and not game_state.wolves_voted:
+            game_state.wolves_voted = True
+            game_state.save()
+    elif player.role == 'seer':
+        game_state.seer_acted = True
+        game_state.save()
+    elif player.role == 'protector':
+        game_state.protector_acted = True
+        game_state.save()
+
+    # After the flags are saved: the seer's view gains a role, everyone's the flags
+    bump_version(player.room)
+
+    response_data = {'message': 'Action submitted'}
+    if player.role == 'seer':
+        response_data['result'] = {
+            'target_nickname': target.nickname,
+            'target_role': target.role
+        }
+    return response_data, None
+
+
+def submit_vote(player, target):
+    """Cast or change a vote on the open ballot and stream the tally"""
+    if not player.is_alive:
+        return None, 'Dead players cannot vote'
+
+    game_state = player.room.game_state
+    if game_state.phase not in ['voting', 'leader_election']:
+        return None, 'Not a voting phase'
+
+    if not target.is_alive:
+        return None, 'Cannot vote for dead player'
+
+    if game_state.ballot_candidates and target.id not in game_state.ballot_candidates:
+        return None, 'This runoff is between other players'
+
+    if game_state.leader_decides and not player.is_leader:
+        return None, 'Only the leader breaks this tie'
+
+    # Create or update vote, and stream the running tally
+    error, vote, counts = get_store().cast_vote(player, target, game_state)
+    if error:
+        return None, error
+    record_event(
+        player.room, 'vote_cast',
+        player_id=player.id, target_id=target.id, vote_type=vote.vote_type,
+        day_number=vote.vote_phase, round=vote.round
+    )
+    broadcast_game_update(player.room, {
+        'type': 'vote_tally',
+        'vote_type': vote.vote_type,
+        'round': vote.round,
+        'counts': {str(target_id): count for target_id, count in counts.items()}
+    })
+
+    return {
+        'message': 'Vote submitted',
+        'vote': VoteSerializer(vote).data
+    }, None
@@ -0,0 +1,102 @@
+"""Server-driven heartbeats and player presence for GameConsumer sockets.
+
+One loop per worker process sends a heartbeat to every socket each
+WS_HEARTBEAT_INTERVAL seconds and closes sockets that have been silent for
+WS_HEARTBEAT_TIMEOUT, which also removes them from their room group so
+broadcasts stop fanning out to dead connections. Which players are online is
+held in memory: counts of this worker's own sockets, plus the last state
+announced by other workers through presence broadcasts on the room group.
+"""
+import asyncio
+import logging
+import time
+
+from django.conf import settings
+
+from . import wire
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_FRAMES = wire.encode_frames({'type': 'heartbeat'})
+
+
+def presence_event(player_id, online):
+    """Channel-layer message announcing a presence change to a room group"""
+    return {
+        'type': 'presence_update',
+        'player_id': player_id,
+        'online': online,
+        **wire.broadcast({
+            'type': 'presence',
+            'player_id': player_id,
+            'online': online
+        }),
+    }
+
+
+class PresenceTracker:
+    def __init__(self):
+        self.connections = set()
+        self.local = {}
+        self.remote = {}
+        self.task = None
+
+    def register(self, consumer):
+        consumer.last_seen = time.monotonic()
+        self.connections.add(consumer)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.run())
+
+    def unregister(self, consumer):
+        self.connections.discard(consumer)
+
+    def player_online(self, room_code, player_id):
+        """Count a socket for the player; True if it's their first on this worker"""
+        sockets = self.local.setdefault(room_code, {})
+        sockets[player_id] = sockets.get(player_id, 0) + 1
+        return sockets[player_id] == 1
+
+    def player_offline(self, room_code, player_id):
+        """Uncount a socket; True if the player has none left on this worker"""
+        sockets = self.local.get(room_code, {})
+        remaining = sockets.get(player_id, 1) - 1
+        if remaining > 0:
+            sockets[player_id] = remaining
+            return False
+        sockets.pop(player_id, None)
+        if not sockets:
+            self.local.pop(room_code, None)
+        return True
+
+    def apply_remote(self, room_code, player_id, online):
+        """Record a presence change announced on the room group"""
+        announced = self.remote.setdefault(room_code, {})
+        if online:
+            announced[player_id] = True
+        else:
+            announced.pop(player_id, None)
+            if not announced:
+                self.remote.pop(room_code, None)
+
+    def online_players(self, room_code):
+        return sorted(set(self.local.get(room_code, ())) | set(self.remote.get(room_code, ())))
+
+    async def run(self):
+        """Heartbeat every socket and reap the ones that went quiet"""
+        while self.connections:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+            deadline = time.monotonic() - settings.WS_HEARTBEAT_TIMEOUT
+            for consumer in list(self.connections):
+                try:
+                    if consumer.last_seen < deadline:
+                        self.connections.discard(consumer)
+                        await consumer.reap()
+                    else:
+                        await consumer.send_payload(HEARTBEAT_FRAMES[consumer.codec.name])
+                except Exception:
+                    # A socket closing under us must not stop the loop for the others
+                    self.connections.discard(consumer)
+                    logger.warning('Heartbeat to %s failed', consumer.channel_name, exc_info=True)
+
+
+tracker = PresenceTracker()
@@ -0,0 +1,244 @@
+"""What each viewer of a room may see, rendered once per room version.
+
+Roles are the only secret in a room's state, and who may see which role
+depends on a handful of viewer classes:
+
+- 'public': anyone, and living citizens, protectors and hunters. Roles of
+  dead players are revealed, as in the death announcements.
+- 'wolf': public, plus who the other wolves are.
+- 'seer:<id>': public, plus the roles that seer has inspected.
+- 'all': dead players, and everyone once the game is finished.
+
+Every write that changes what someone sees bumps Room.version. The first
+read of a version renders every class in one pass and caches them together
+under (room, version), so REST reads and socket snapshots cost a cache get
+and a dict lookup instead of a per-request serializer run. Each player's
+own role comes from the cached ``viewers`` map as ``you``; tokens are
+never part of a view.
+
+The current version of each room is also cached by code (see
+current_version), so conditional GETs (etags.py) can answer 304 without a
+query. Once a bump commits, bump_version pins the room to the primary and
+refreshes that entry; readers only fill it when it is missing, so a read
+that raced the bump cannot put the old version back.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .db_routers import pin_to_primary
+from .fast_serializers import (
+    current_timezone, format_datetime, serialize_game_state, serialize_game_log
+)
+from .hotstate import get_store
+from .models import Room, GameState, GameLog
+
+PUBLIC = 'public'
+EVERYTHING = 'all'
+# Log metadata that tells who holds a role
+PRIVATE_LOG_KEYS = {'seer_id'}
+
+
+def bump_version(room):
+    """Invalidate every cached view of the room"""
+    Room.objects.filter(pk=room.pk).update(version=F('version') + 1)
+    # After commit, or a concurrent read could cache the old version again
+    code = room.code
+    transaction.on_commit(lambda: version_committed(code))
+
+
+def version_committed(code):
+    # Replicas lag the new version for a while: read it from the primary
+    pin_to_primary(code)
+    refresh_version(code)
+
+
+def version_key(code):
+    return f'room_version:{code}'
+
+
+def read_version(code, using=None):
+    """(room id, version) of the room with this code, read from the database"""
+    rooms = Room.objects.using(using) if using else Room.objects
+    return rooms.filter(code=code).values_list('id', 'version').first()
+
+
+def refresh_version(code):
+    """Cache the committed version of the room.
+
+    Two refreshes can interleave, so after each set the version is read
+    again: the last refresh to set the entry has seen it match the primary.
+    """
+    key = version_key(code)
+    current = read_version(code, using='default')
+    while current is not None:
+        cache.set(key, current, settings.ROOM_VERSION_CACHE_SECONDS)
+        latest = read_version(code, using='default')
+        if latest == current:
+            return
+        current = latest
+    cache.delete(key)
+
+
+def current_version(code):
+    """(room id, version) of the room with this code, or None if there is none"""
+    key = version_key(code)
+    current = cache.get(key)
+    if current is None:
+        # From the primary: a lagging replica would get its version cached
+        current = read_version(code, using='default')
+        if current is None:
+            return None
+        # Only fills a missing entry, never overwrites a refreshed one
+        cache.add(key, current, settings.ROOM_VERSION_CACHE_SECONDS)
+    return current
+
+
+def forget_versions(codes):
+    cache.delete_many([version_key(code) for code in codes])
+
+
+def redact_log(entry):
+    """A serialized log entry without the metadata that gives roles away"""
+    metadata = entry['metadata']
+    if not metadata or PRIVATE_LOG_KEYS.isdisjoint(metadata):
+        return entry
+    return {**entry, 'metadata': {key: value for key, value in metadata.items()
+                                  if key not in PRIVATE_LOG_KEYS}}
+
+
+def viewer_class(player, finished):
+    if finished or not player.is_alive:
+        return EVERYTHING
+    if player.role == 'wolf':
+        return 'wolf'
+    if player.role == 'seer':
+        return f'seer:{player.id}'
+    return PUBLIC
+
+
+def render_views(room):
+    """Render every viewer class of the room as it is now"""
+    tz = current_timezone()
+    finished = room.status == 'finished'
+    players = list(room.players.all())
+    roles = {player.id: player.role for player in players}
+    inspections = get_store().seer_inspections(room) if room.status == 'playing' else {}
+
+    public = EVERYTHING if finished else PUBLIC
+    classes = {public: set(roles) if finished else set()}
+    viewers = {}
+    for player in players:
+        name = viewer_class(player, finished)
+        viewers[player.token] = (name, {
+            'id': player.id,
+            'nickname': player.nickname,
+            'role': player.role,
+            'role_display': player.get_role_display() if player.role else None,
+            'is_alive': player.is_alive,
+            'is_leader': player.is_leader,
+        })
+        if name == 'wolf':
+            classes[name] = {pid for pid, role in roles.items() if role == 'wolf'}
+        elif name.startswith('seer:'):
+            classes[name] = set(inspections.get(player.id, ()))
+        elif name == EVERYTHING:
+            classes[name] = set(roles)
+
+    try:
+        game_state = room.game_state
+    except GameState.DoesNotExist:
+        game_state = None
+
+    room_data = {
+        'id': room.id,
+        'code': room.code,
+        'max_players': room.max_players,
+        'status': room.status,
+        'created_at': format_datetime(room.created_at, tz),
+        'player_count': len(players),
+        'num_wolves': room.num_wolves,
+        'num_seers': room.num_seers,
+        'num_protectors': room.num_protectors,
+        'num_hunters': room.num_hunters,
+    }
+    state_data = serialize_game_state(game_state) if game_state else None
+
+    views = {}
+    for name, revealed in classes.items():
+        views[name] = {
+            'room': room_data,
+            'players': [
+                {
+                    'id': player.id,
+                    'nickname': player.nickname,
+                    'is_alive': player.is_alive,
+                    'is_leader': player.is_leader,
+                    'is_bot': player.is_bot,
+                    'joined_at': format_datetime(player.joined_at, tz),
+                    'remaining_time': player.total_speaking_time - player.speaking_time_used,
+                    'role': player.role if not player.is_alive or player.id in revealed else None,
+                }
+                for player in players
+            ],
+            'game_state': state_data,
+        }
+
+    return Projection(room.version, public, viewers, views,
+                      game_state.timer_end if game_state else None)
+
+
+class Projection:
+    """All views of one room version"""
+
+    def __init__(self, version, public, viewers, views, timer_end):
+        self.version = version
+        self.public = public
+        self.viewers = viewers
+        self.views = views
+        self.timer_end = timer_end
+
+    def view(self, token=None):
+        """The view for whoever holds this player token (public without one)"""
+        name, you = self.viewers.get(token, (self.public, None)) if token else (self.public, None)
+        view = self.views[name]
+        game_state = view['game_state']
+        if game_state is not None and self.timer_end is not None:
+            # The only part that changes without a new version
+            remaining = (self.timer_end - timezone.now()).total_seconds()
+            game_state = {**game_state, 'time_remaining': max(0, int(remaining))}
+        return {**view, 'game_state': game_state, 'you': you}
+
+    def sees_everything(self, token=None):
+        """Whether this player token may see every role (and private log metadata)"""
+        name = self.viewers.get(token, (self.public, None))[0] if token else self.public
+        return name == EVERYTHING
+
+
+def projection(room):
+    """Cached views of the room at room.version, rendered on first use"""
+    key = f'projection:{room.id}:{room.version}'
+    cached = cache.get(key)
+    if cached is None:
+        cached = render_views(room)
+        cache.set(key, cached, settings.PROJECTION_CACHE_SECONDS)
+    return cached
+
+
+def log_tail(room, everything=False):
+    """The room's last ROOM_BUNDLE_LOG_TAIL log entries at room.version, oldest first.
+
+    Every log entry is followed by a bump (the broadcast that announces
+    it), so the tail can be cached by version like the views. Private
+    metadata is only left in for viewers who see everything.
+    """
+    key = f'log_tail:{room.id}:{room.version}'
+    cached = cache.get(key)
+    if cached is None:
+        tz = current_timezone()
+        logs = GameLog.objects.filter(room=room).order_by('-timestamp', '-id')
+        cached = [serialize_game_log(log, tz) for log in logs[:settings.ROOM_BUNDLE_LOG_TAIL]][::-1]
+        cache.set(key, cached, settings.PROJECTION_CACHE_SECONDS)
+    return cached if everything else [redact_log(entry) for entry in cached]
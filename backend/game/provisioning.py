@@ -0,0 +1,115 @@
+import secrets
+
+from django.db import transaction
+
+from .models import Room, Player, GameState, GameLog, GameEvent
+from .game_logic import build_role_pool
+from .room_codes import allocate_room_codes
+from .hotstate import get_store
+
+ROOM_CONFIG_FIELDS = ['max_players', 'num_wolves', 'num_seers', 'num_protectors', 'num_hunters']
+
+
+def provision_batch(specs, start=False):
+    """Create one batch of rooms with their players in a single transaction.
+
+    Each spec is a dict of room config fields plus 'players', a list of
+    nicknames. With start=True every room must be full and gets roles,
+    a GameState and its opening history rows, exactly like start_game.
+    Raises ValueError, before writing anything, if a room can't start.
+    """
+    rooms = [
+        Room(
+            admin_token=secrets.token_urlsafe(24),
+            status='playing' if start else 'waiting',
+            player_count=len(spec['players']),
+            **{field: spec[field] for field in ROOM_CONFIG_FIELDS if field in spec}
+        )
+        for spec in specs
+    ]
+    role_pools = [None] * len(rooms)
+    if start:
+        for index, room in enumerate(rooms):
+            if room.player_count != room.max_players:
+                raise ValueError('Started rooms must be full')
+            role_pools[index] = build_role_pool(room, room.player_count)
+            if role_pools[index] is None:
+                raise ValueError('Too many special roles configured')
+
+    for room, code in zip(rooms, allocate_room_codes(len(specs))):
+        room.code = code
+
+    with transaction.atomic():
+        rooms = Room.objects.bulk_create(rooms)
+        if any(room.pk is None for room in rooms):
+            # Backends without RETURNING on bulk insert: look the ids up
+            ids = dict(Room.objects.filter(code__in=codes).values_list('code', 'id'))
+            for room in rooms:
+                room.pk = ids[room.code]
+
+        players = []
+        for room, spec, roles in zip(rooms, specs, role_pools):
+            for index, nickname in enumerate(spec['players']):
+                players.append(Player(
+                    room=room,
+                    nickname=nickname,
+                    token=secrets.token_urlsafe(24),
+                    role=roles[index] if roles else None,
+                ))
+        Player.objects.bulk_create(players)
+
+        if start:
+            GameState.objects.bulk_create([
+                GameState(room=room, phase='night', night_number=1) for room in rooms
+            ])
+            GameLog.objects.bulk_create([
+                GameLog(room=room, phase='setup', message='Game started - Roles assigned', metadata={})
+                for room in rooms
+            ])
+            if any(player.pk is None for player in players):
+                players = list(Player.objects.filter(room__in=rooms))
+            GameEvent.objects.bulk_create([
+                GameEvent(room_id=player.room_id, event_type='role_assigned', payload={
+                    'player_id': player.id, 'nickname': player.nickname, 'role': player.role
+                })
+                for player in players
+            ] + [
+                GameEvent(room=room, event_type='phase_changed', payload={
+                    'phase': 'night', 'night_number': 1, 'day_number': 0
+                })
+                for room in rooms
+            ])
+
+    if start:
+        store = get_store()
+        room_players = {}
+        for player in players:
+            room_players.setdefault(player.room_id, []).append(player)
+        for room in rooms:
+            store.start_game(room, room_players.get(room.id, []))
+    
+    by_room = {}
+    for player in players:
+        by_room.setdefault(player.room_id, []).append({
+            'id': player.id,
+            'nickname': player.nickname,
+            'token': player.token,
+        })
+
+    return [
+        {
+            'code': room.code,
+            'admin_token': room.admin_token,
+            'status': room.status,
+            'players': by_room.get(room.id, []),
+        }
+        for room in rooms
+    ]
+
+
+def provision_rooms(specs, start=False, batch_size=200):
+    """Create many rooms with preassigned players in a few batched transactions"""
+    results = []
+    for offset in range(0, len(specs), batch_size):
+        results += provision_batch(specs[offset:offset + batch_size], start=start)
+    return results
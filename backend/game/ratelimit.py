@@ -0,0 +1,160 @@
+"""Token buckets for admission control and per-client rate limits.
+
+TokenBucket is a single bucket (socket admission, per-socket message
+budgets). Limiter keeps one per key (player token, client IP) in process
+memory, optionally backed by a shared Redis tier (see game/throttles.py).
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.next_slot = 0.0
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available; never blocks"""
+        self.refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def wait_time(self, tokens=1):
+        """Seconds until `tokens` would be available"""
+        self.refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def retry_after(self):
+        """Seconds a rejected caller should wait, giving each one its own future
+        refill slot so a burst of rejections comes back spread at `rate`"""
+        wait = self.wait_time()
+        self.next_slot = max(self.next_slot, self.updated + wait) + 1 / self.rate
+        return self.next_slot - self.updated
+
+
+SHARED_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class BucketMap:
+    """A token bucket per key, keeping only the max_keys most recently used"""
+
+    def __init__(self, rate, capacity, max_keys):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def wait_time(self, key):
+        """0 if key may go ahead now (and takes a token), else seconds to wait"""
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity)
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            if bucket.try_acquire():
+                return 0.0
+            return bucket.wait_time()
+
+
+class SharedBuckets:
+    """The same buckets in Redis, so limits hold across worker processes"""
+
+    def __init__(self, url):
+        # Imported here so the in-memory tier never pays for loading redis
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RATELIMIT_REDIS_URL requires the redis package')
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.script = self.client.register_script(SHARED_BUCKET_SCRIPT)
+
+    def wait_time(self, name, key, rate, capacity):
+        digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+        return float(self.script(keys=[f'ratelimit:{name}:{digest}'], args=[rate, capacity]))
+
+
+_shared = None
+
+
+def shared_buckets():
+    """The Redis tier, or None when RATELIMIT_REDIS_URL is unset"""
+    global _shared
+    if _shared is None and settings.RATELIMIT_REDIS_URL:
+        _shared = SharedBuckets(settings.RATELIMIT_REDIS_URL)
+    return _shared
+
+
+class Limiter:
+    """Per-key limit: this process's buckets first, then the shared tier.
+
+    Rejections never leave the process; only requests the local bucket
+    lets through pay a Redis round trip, and if Redis is unreachable they
+    go ahead on the local limit alone.
+    """
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.local = BucketMap(rate, capacity, settings.RATELIMIT_MAX_KEYS)
+
+    def wait_time(self, key):
+        """0 if key may go ahead now, else seconds to wait (and counted)"""
+        wait = self.local.wait_time(key)
+        if not wait:
+            shared = shared_buckets()
+            if shared is None:
+                return 0.0
+            try:
+                wait = shared.wait_time(self.name, key, self.rate, self.capacity)
+            except Exception:
+                logger.warning('Shared rate limit unavailable', exc_info=True)
+                return 0.0
+            if not wait:
+                return 0.0
+        metrics.incr(f'rate_limited_{self.name}')
+        return wait
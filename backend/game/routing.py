@@ -3,4 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/game/(?P<room_code>\w+)/$', consumers.GameConsumer.as_asgi()),
+    re_path(r'ws/lobby/$', consumers.LobbyConsumer.as_asgi()),
+    re_path(r'ws/spectate/(?P<room_code>\w+)/$', consumers.SpectatorConsumer.as_asgi()),
 ]
@@ -0,0 +1,84 @@
+"""In-process timer wheel for game deadlines.
+
+A single daemon thread sleeps until the earliest deadline. Each key (e.g. a
+room) holds at most one pending wakeup, and scheduling it again replaces the
+previous one, so a room costs one heap entry no matter how often its timer
+moves. Wakeups live in the process that scheduled them; callbacks must check
+the database before acting, since a wakeup can fire after the state it was
+scheduled for has already moved on. Game code schedules through the
+*_on_commit variants, so a transition that rolls back leaves no wakeup.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.heap = []
+        self.pending = {}
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def schedule(self, key, delay, callback, *args):
+        """Run callback(*args) after `delay` seconds, replacing key's wakeup"""
+        with self.condition:
+            entry = [self.clock() + delay, next(self.counter), key, callback, args]
+            previous = self.pending.pop(key, None)
+            if previous:
+                previous[3] = None
+            self.pending[key] = entry
+            heapq.heappush(self.heap, entry)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='game-scheduler', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def cancel(self, key):
+        with self.condition:
+            entry = self.pending.pop(key, None)
+            if entry:
+                entry[3] = None
+
+    def schedule_on_commit(self, key, delay, callback, *args):
+        """schedule() once the current transaction commits (right away outside one)"""
+        transaction.on_commit(lambda: self.schedule(key, delay, callback, *args))
+
+    def cancel_on_commit(self, key):
+        """cancel() once the current transaction commits, in order with schedule_on_commit"""
+        transaction.on_commit(lambda: self.cancel(key))
+
+    def run(self):
+        while True:
+            with self.condition:
+                # Drop cancelled entries so they don't hold up the wait
+                while self.heap and self.heap[0][3] is None:
+                    heapq.heappop(self.heap)
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                wait = self.heap[0][0] - self.clock()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                _, _, key, callback, args = heapq.heappop(self.heap)
+                del self.pending[key]
+
+            close_old_connections()
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception('Scheduled callback for %s failed', key)
+            finally:
+                close_old_connections()
+
+
+scheduler = Scheduler()
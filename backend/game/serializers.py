@@ -1,14 +1,14 @@
 from rest_framework import serializers
-from .models import Room, Player, GameState, Action, Vote, GameLog
+from .models import Room, Player, GameState, Action, Vote, GameLog, GameEvent
 
 class PlayerSerializer(serializers.ModelSerializer):
     remaining_time = serializers.SerializerMethodField()
     
     class Meta:
         model = Player
-        fields = ['id', 'nickname', 'is_alive', 'is_leader', 'joined_at', 
-                  'remaining_time', 'token']
-        read_only_fields = ['id', 'joined_at', 'token']
+        fields = ['id', 'nickname', 'is_alive', 'is_leader', 'is_bot', 'joined_at', 
+                  'remaining_time']
+        read_only_fields = ['id', 'is_bot', 'joined_at']
     
     def get_remaining_time(self, obj):
         return obj.total_speaking_time - obj.speaking_time_used
@@ -30,20 +30,66 @@ class RoomSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'code', 'created_at']
     
     def get_player_count(self, obj):
-        return obj.players.count()
+        # len() reuses prefetched players instead of issuing a COUNT
+        return len(obj.players.all())
 
 class RoomCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Room
         fields = ['max_players', 'num_wolves', 'num_seers', 'num_protectors', 'num_hunters']
 
+class BulkRoomSerializer(RoomCreateSerializer):
+    players = serializers.ListField(
+        child=serializers.CharField(max_length=50), required=False, default=list
+    )
+    
+    class Meta(RoomCreateSerializer.Meta):
+        fields = RoomCreateSerializer.Meta.fields + ['players']
+    
+    def validate(self, data):
+        max_players = data.get('max_players', Room._meta.get_field('max_players').default)
+        if len(data['players']) > max_players:
+            raise serializers.ValidationError('More players than max_players')
+        if len(set(data['players'])) != len(data['players']):
+            raise serializers.ValidationError('Nicknames must be unique within a room')
+        return data
+
+class BulkProvisionSerializer(serializers.Serializer):
+    rooms = BulkRoomSerializer(many=True)
+    start = serializers.BooleanField(default=False)
+    
+    def validate_rooms(self, rooms):
+        from django.conf import settings
+        if not rooms:
+            raise serializers.ValidationError('At least one room is required')
+        if len(rooms) > settings.PROVISIONING_MAX_ROOMS:
+            raise serializers.ValidationError(
+                f'At most {settings.PROVISIONING_MAX_ROOMS} rooms per request'
+            )
+        return rooms
+    
+    def validate(self, data):
+        if data['start']:
+            for room in data['rooms']:
+                max_players = room.get('max_players', Room._meta.get_field('max_players').default)
+                specials = sum(
+                    room.get(field, Room._meta.get_field(field).default)
+                    for field in ['num_wolves', 'num_seers', 'num_protectors', 'num_hunters']
+                )
+                if len(room['players']) != max_players:
+                    raise serializers.ValidationError('Started rooms must be full')
+                if specials > max_players:
+                    raise serializers.ValidationError('Too many special roles configured')
+        return data
+
 class GameStateSerializer(serializers.ModelSerializer):
     time_remaining = serializers.SerializerMethodField()
     
     class Meta:
         model = GameState
         fields = ['phase', 'night_number', 'day_number', 'timer_end', 
-                  'current_speaker_id', 'speaking_order', 'time_remaining',
+                  'current_speaker_id', 'speaking_order', 'speaker_ends_at', 'time_remaining',
+                  'vote_round', 'ballot_candidates', 'leader_decides',
                   'wolves_voted', 'seer_acted', 'protector_acted']
     
     def get_time_remaining(self, obj):
@@ -70,7 +116,7 @@ class VoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vote
         fields = ['id', 'player', 'player_nickname', 'target', 'target_nickname', 
-                  'vote_type', 'vote_phase', 'timestamp']
+                  'vote_type', 'vote_phase', 'round', 'timestamp']
         read_only_fields = ['id', 'timestamp']
 
 class GameLogSerializer(serializers.ModelSerializer):
@@ -78,9 +124,38 @@ class GameLogSerializer(serializers.ModelSerializer):
         model = GameLog
         fields = ['id', 'phase', 'message', 'timestamp', 'metadata']
         read_only_fields = ['id', 'timestamp']
+    
+    def to_representation(self, instance):
+        from .projections import redact_log
+        data = super().to_representation(instance)
+        # Only viewers who see every role get the private metadata
+        return data if self.context.get('everything') else redact_log(data)
+
+class GameEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GameEvent
+        fields = ['id', 'event_type', 'payload', 'timestamp']
+        read_only_fields = fields
+
+class LobbyFilterSerializer(serializers.Serializer):
+    size = serializers.IntegerField(required=False, min_value=1)
+    min_free = serializers.IntegerField(required=False, min_value=1)
+    wolves = serializers.IntegerField(required=False, min_value=0)
+    seers = serializers.IntegerField(required=False, min_value=0)
+    protectors = serializers.IntegerField(required=False, min_value=0)
+    hunters = serializers.IntegerField(required=False, min_value=0)
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, default=20)
+    
+    def validate_limit(self, value):
+        from django.conf import settings
+        return min(value, settings.LOBBY_MAX_PAGE_SIZE)
 
 class JoinRoomSerializer(serializers.Serializer):
     nickname = serializers.CharField(max_length=50)
+
+class AddBotsSerializer(serializers.Serializer):
+    count = serializers.IntegerField(required=False, min_value=1)
     
 class NightActionSerializer(serializers.Serializer):
     target_id = serializers.IntegerField()
@@ -0,0 +1,136 @@
+"""Day-phase speaking turns.
+
+Alive players speak in turn, each for at most what is left of their
+total_speaking_time. A turn ends when the speaker passes or their time runs
+out; the latter is a single scheduler wakeup per room at speaker_ends_at.
+Nothing ticks per second: clients get speaker_ends_at once per turn and
+count down locally, and time is charged to the speaker when the turn ends.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .fast_serializers import format_datetime
+from .models import GameState, Player
+from .scheduler import scheduler
+
+
+def eligible_speakers(room):
+    """Alive players with speaking time left, in join order"""
+    return list(
+        room.players.filter(is_alive=True, speaking_time_used__lt=F('total_speaking_time'))
+        .values_list('id', flat=True)
+    )
+
+
+def charge_current_speaker(game_state, now):
+    """Charge the running turn to its speaker and clear it (no save)"""
+    if game_state.current_speaker_id and game_state.speaker_started_at:
+        elapsed = round((now - game_state.speaker_started_at).total_seconds())
+        Player.objects.filter(id=game_state.current_speaker_id).update(
+            speaking_time_used=Least(F('speaking_time_used') + elapsed, F('total_speaking_time'))
+        )
+    game_state.current_speaker_id = None
+    game_state.speaker_started_at = None
+    game_state.speaker_ends_at = None
+
+
+def next_turn(room, game_state, now):
+    """End the running turn and hand the floor to the next eligible speaker.
+
+    Saves the game state, (re)schedules the room's timeout and returns the
+    message to broadcast.
+    """
+    previous = game_state.current_speaker_id
+    charge_current_speaker(game_state, now)
+
+    eligible = set(eligible_speakers(room))
+    order = game_state.speaking_order
+    start = order.index(previous) + 1 if previous in order else 0
+    speaker = next((pid for pid in order[start:] if pid in eligible), None)
+
+    if speaker is None:
+        scheduler.cancel_on_commit(room.id)
+        game_state.save(update_fields=[
+            'current_speaker_id', 'speaker_started_at', 'speaker_ends_at'
+        ])
+        return {'type': 'speaking_finished'}
+
+    player = Player.objects.get(id=speaker)
+    remaining = player.total_speaking_time - player.speaking_time_used
+    game_state.current_speaker_id = speaker
+    game_state.speaker_started_at = now
+    game_state.speaker_ends_at = now + timedelta(seconds=remaining)
+    game_state.save(update_fields=[
+        'current_speaker_id', 'speaker_started_at', 'speaker_ends_at'
+    ])
+    scheduler.schedule_on_commit(room.id, remaining, turn_timed_out, room.id, speaker, now)
+    if player.is_bot:
+        from . import bots
+        bots.turn_started(room, speaker, now)
+
+    return {
+        'type': 'speaker_changed',
+        'speaker': {'id': player.id, 'nickname': player.nickname},
+        'ends_at': format_datetime(game_state.speaker_ends_at),
+        'remaining': remaining,
+    }
+
+
+def start_speaking_turns(room, game_state):
+    """Open a round of turns for every eligible player; returns the message"""
+    game_state.speaking_order = eligible_speakers(room)
+    game_state.current_speaker_id = None
+    game_state.save(update_fields=['speaking_order', 'current_speaker_id'])
+    return next_turn(room, game_state, timezone.now())
+
+
+def stop_speaking_turns(room, game_state):
+    """Close the running turn when the day ends (caller saves game_state)"""
+    scheduler.cancel_on_commit(room.id)
+    charge_current_speaker(game_state, timezone.now())
+
+
+def pass_turn(player):
+    """The current speaker yields the floor; returns (message, error)"""
+    room = player.room
+    with transaction.atomic():
+        game_state = GameState.objects.select_for_update().get(room=room)
+        if game_state.phase != 'day':
+            return None, 'Not day phase'
+        if game_state.current_speaker_id != player.id:
+            return None, 'Not your turn to speak'
+        return next_turn(room, game_state, timezone.now()), None
+
+
+def start_round(room):
+    """Start another round for players with time left; returns (message, error)"""
+    with transaction.atomic():
+        game_state = GameState.objects.select_for_update().get(room=room)
+        if game_state.phase != 'day':
+            return None, 'Not day phase'
+        if game_state.current_speaker_id is not None:
+            return None, 'Speaking turns already running'
+        message = start_speaking_turns(room, game_state)
+        if message['type'] == 'speaking_finished':
+            return None, 'No speaking time left'
+        return message, None
+
+
+def turn_timed_out(room_id, speaker_id, started_at):
+    """Scheduler callback: move on if this exact turn is still running"""
+    from .game_logic import broadcast_game_update
+
+    with transaction.atomic():
+        game_state = GameState.objects.select_for_update().select_related('room').get(room_id=room_id)
+        if (game_state.phase != 'day'
+                or game_state.current_speaker_id != speaker_id
+                or game_state.speaker_started_at != started_at):
+            return
+        room = game_state.room
+        message = next_turn(room, game_state, timezone.now())
+
+    broadcast_game_update(room, message)
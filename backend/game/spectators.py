@@ -0,0 +1,249 @@
+"""Read-only spectator stream.
+
+Each worker process keeps one SpectatorHub per watched room. The hub is the
+only thing subscribed to the room's spectator group, so an event costs one
+channel-layer delivery per process no matter how many people watch. Events
+are released after SPECTATOR_DELAY_SECONDS (so watchers can't relay night
+results live), stored in a ring buffer for late joiners and pushed as the
+same pre-encoded frame to every spectator's bounded queue. The hub's
+snapshot only advances past an event when it drops out of the buffer, so
+a late joiner gets the snapshot and then every buffered event after it
+(folding the oldest of them into its snapshot when they would not fit in
+half its queue). The hub's first snapshot is folded from the room's
+events as they stood SPECTATOR_DELAY_SECONDS ago, so reconnecting to a
+fresh hub shows nothing newer than the stream would. A spectator whose
+queue is full is disconnected instead of slowing the others down.
+"""
+import asyncio
+from collections import deque
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+
+from .events import rebuild_state
+from .models import Room, GameState
+from . import wire
+
+# Keys that never leave the server in spectator frames
+REDACTED_KEYS = {'token', 'admin_token', 'player_token', 'result_data', 'seer_id'}
+
+
+def spectator_group_name(room_code):
+    return f'spectate_{room_code}'
+
+
+def redact(value):
+    """Strip private fields from a payload before it reaches spectators"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items() if key not in REDACTED_KEYS}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def encode_spectator_event(data):
+    """Redact and encode a game update once for every spectator of the room"""
+    return wire.dumps({'type': 'game_update', 'data': redact(data)})
+
+
+def build_spectator_view(room_code):
+    """Public view of a room: who is alive, revealed roles of the dead, phase"""
+    try:
+        room = Room.objects.get(code=room_code)
+    except Room.DoesNotExist:
+        return None
+
+    players = [
+        {
+            'id': player['id'],
+            'nickname': player['nickname'],
+            'is_alive': player['is_alive'],
+            'is_leader': player['is_leader'],
+            # Roles are revealed on death, never before
+            'role': None if player['is_alive'] else player['role'],
+        }
+        for player in room.players.values('id', 'nickname', 'is_alive', 'is_leader', 'role')
+    ]
+
+    try:
+        game_state = room.game_state
+        state_data = {
+            'phase': game_state.phase,
+            'night_number': game_state.night_number,
+            'day_number': game_state.day_number,
+            'timer_end': game_state.timer_end.isoformat() if game_state.timer_end else None,
+        }
+    except GameState.DoesNotExist:
+        state_data = None
+
+    return {
+        'room': {
+            'code': room.code,
+            'status': room.status,
+            'max_players': room.max_players,
+        },
+        'players': players,
+        'game_state': state_data,
+    }
+
+
+def build_delayed_spectator_view(room_code):
+    """build_spectator_view as of SPECTATOR_DELAY_SECONDS ago, folded from the room's events"""
+    try:
+        room = Room.objects.get(code=room_code)
+    except Room.DoesNotExist:
+        return None
+
+    until = timezone.now() - timedelta(seconds=settings.SPECTATOR_DELAY_SECONDS)
+    state, _ = rebuild_state(room, until=until)
+    if not state['players']:
+        # Not started back then: only the lobby, which holds no secrets
+        return {
+            'room': {'code': room.code, 'status': 'waiting', 'max_players': room.max_players},
+            'players': [
+                {**player, 'is_alive': True, 'is_leader': False, 'role': None}
+                for player in room.players.values('id', 'nickname')
+            ],
+            'game_state': None,
+        }
+
+    players = [
+        {
+            'id': int(player_id),
+            'nickname': player['nickname'],
+            'is_alive': player['is_alive'],
+            'is_leader': player['is_leader'],
+            'role': None if player['is_alive'] else player['role'],
+        }
+        for player_id, player in state['players'].items()
+    ]
+    finished = state['phase'] == 'finished'
+    return {
+        'room': {
+            'code': room.code,
+            'status': 'finished' if finished else 'playing',
+            'max_players': room.max_players,
+        },
+        'players': players,
+        'game_state': None if finished else {
+            'phase': state['phase'],
+            'night_number': state['night_number'],
+            'day_number': state['day_number'],
+            # Deadlines aren't events; the next released update carries one
+            'timer_end': None,
+        },
+    }
+
+
+class SpectatorHub:
+    """Per-process fan-out point for one room's spectators"""
+
+    def __init__(self, room_code):
+        self.room_code = room_code
+        self.group_name = spectator_group_name(room_code)
+        self.channel_layer = get_channel_layer()
+        self.channel_name = None
+        self.subscribers = set()
+        self.buffer = deque(maxlen=settings.SPECTATOR_BUFFER_SIZE)
+        self.seq = 0
+        self.snapshot = None
+        self.pending = deque()
+        self.reader_task = None
+
+    async def start(self):
+        """Subscribe to the room's spectator group; False if the room is gone"""
+        view = await database_sync_to_async(build_delayed_spectator_view)(self.room_code)
+        if view is None:
+            return False
+        self.snapshot = self.encode_snapshot(self.seq, view)
+        self.channel_name = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        self.reader_task = asyncio.ensure_future(self.read_events())
+        return True
+
+    async def stop(self):
+        self.reader_task.cancel()
+        while self.pending:
+            self.pending.popleft().cancel()
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def read_events(self):
+        """Receive pre-encoded frames for this room and release them later"""
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await self.channel_layer.receive(self.channel_name)
+            # Capture the room view matching this event now, publish both later
+            view = await database_sync_to_async(build_spectator_view)(self.room_code)
+            self.pending.append(loop.call_later(
+                settings.SPECTATOR_DELAY_SECONDS, self.release, message['frame'], view
+            ))
+
+    def release(self, frame, view):
+        """Publish a delayed frame to the ring buffer and every spectator"""
+        self.pending.popleft()
+        self.seq += 1
+        if len(self.buffer) == self.buffer.maxlen:
+            # The oldest event is about to drop out: fold it into the snapshot
+            self.fold(*self.buffer[0])
+        self.buffer.append((self.seq, frame, view))
+        for subscriber in list(self.subscribers):
+            subscriber.push(frame)
+
+    def fold(self, seq, frame, view):
+        if view is not None:
+            self.snapshot = self.encode_snapshot(seq, view)
+
+    def encode_snapshot(self, seq, view):
+        return seq, wire.dumps({'type': 'spectator_state', 'seq': seq, 'data': view})
+
+    def subscribe(self, subscriber):
+        """Register a spectator: the snapshot, then the buffered events it doesn't cover.
+
+        Returns False if the spectator was dropped before it got them all.
+        """
+        seq, frame = self.snapshot
+        events = [event for event in self.buffer if event[0] > seq]
+        # Leave half the queue for events released before the socket drains it
+        overflow = len(events) - settings.SPECTATOR_QUEUE_SIZE // 2 + 1
+        if overflow > 0:
+            folded_seq, _, view = events[overflow - 1]
+            if view is not None:
+                seq, frame = self.encode_snapshot(folded_seq, view)
+            events = events[overflow:]
+
+        pushed = subscriber.push(frame)
+        for _, event_frame, _ in events:
+            pushed = pushed and subscriber.push(event_frame)
+        if pushed:
+            self.subscribers.add(subscriber)
+        return pushed
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+
+_hubs = {}
+_hubs_lock = asyncio.Lock()
+
+
+async def get_hub(room_code):
+    """Return this process's hub for a room, or None if the room doesn't exist"""
+    async with _hubs_lock:
+        hub = _hubs.get(room_code)
+        if hub is None:
+            hub = SpectatorHub(room_code)
+            if not await hub.start():
+                return None
+            _hubs[room_code] = hub
+        return hub
+
+
+async def release_hub(hub):
+    """Stop a hub once its last spectator has left"""
+    async with _hubs_lock:
+        if not hub.subscribers and _hubs.get(hub.room_code) is hub:
+            del _hubs[hub.room_code]
+            await hub.stop()
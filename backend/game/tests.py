@@ -0,0 +1,1176 @@
+from datetime import timedelta
+
+import asyncio
+import io
+import json
+import time
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from . import analytics, bots, consumers, game_logic, idempotency, player_actions, room_codes, wire
+from .hotstate import DatabaseStore, RedisStore
+from .lifecycle import archive_finished_rooms, build_game_records, expire_idle_rooms
+from .elections import close_ballots
+from .fast_serializers import serialize_room, serialize_player, serialize_game_state
+from .db_routers import REPLICA, ReplicaMiddleware, ReplicaRouter, pin_keys
+from .events import record_event, record_events
+from .models import (
+    Room, Player, GameState, Action, Vote, GameLog, GameEvent, GameSnapshot, ArchivedGame,
+    RoomCodeCounter,
+)
+from .presence import PresenceTracker
+from .provisioning import provision_batch
+from .projections import bump_version, current_version, version_key
+from .ratelimit import TokenBucket
+from .renderers import FastJSONRenderer
+from .serializers import RoomSerializer, PlayerSerializer, PlayerDetailSerializer, GameStateSerializer
+from .scheduler import scheduler
+from .speaking import pass_turn, start_speaking_turns, turn_timed_out
+from .spectators import SpectatorHub, build_delayed_spectator_view
+from .throttles import JoinThrottle
+
+try:
+    import fakeredis
+except ImportError:  # the Redis store tests need fakeredis (with Lua support)
+    fakeredis = None
+
+
+def make_room(num_players=4, **kwargs):
+    room = Room.objects.create(admin_token=f'admin-{Room.objects.count()}', max_players=num_players, **kwargs)
+    for i in range(num_players):
+        Player.objects.create(room=room, nickname=f'player_{i}', token=f'{room.code}-{i}')
+    return room
+
+
+class FastSerializerTests(TestCase):
+    """fast_serializers must render exactly what the DRF serializers do"""
+
+    def assertSameBytes(self, fast, drf):
+        self.assertEqual(FastJSONRenderer().render(fast), JSONRenderer().render(drf))
+
+    def test_room(self):
+        room = make_room(5)
+        Player.objects.filter(room=room, nickname='player_1').update(is_alive=False, is_leader=True)
+        room = Room.objects.prefetch_related('players').get(pk=room.pk)
+        self.assertSameBytes(serialize_room(room), RoomSerializer(room).data)
+
+    def test_player(self):
+        player = make_room(1).players.get()
+        player.nickname = 'joueuré   "quoted"'
+        player.role = 'seer'
+        self.assertSameBytes(serialize_player(player), PlayerSerializer(player).data)
+        self.assertSameBytes(serialize_player(player, include_role=True),
+                             PlayerDetailSerializer(player).data)
+
+    def test_game_state(self):
+        room = make_room(2)
+        # A past timer keeps time_remaining the same for both (0)
+        game_state = GameState.objects.create(
+            room=room, phase='day', night_number=2, day_number=2,
+            timer_end=timezone.now() - timedelta(seconds=1), speaking_order=[1, 2]
+        )
+        self.assertSameBytes(serialize_game_state(game_state), GameStateSerializer(game_state).data)
+
+    def test_renderer_escapes_line_separators(self):
+        data = {'message': 'line\u2028break\u2029'}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_renderer_falls_back_for_indented_output(self):
+        data = {'nickname': 'é'}
+        context = {'indent': 2}
+        self.assertEqual(FastJSONRenderer().render(data, renderer_context=context),
+                         JSONRenderer().render(data, renderer_context=context))
+
+
+    def test_renderer_coerces_non_string_keys(self):
+        self.assertSameBytes({1: 2, 'nested': [{3: 'x', None: True}]},
+                             {1: 2, 'nested': [{3: 'x', None: True}]})
+
+    def test_renderer_falls_back_for_what_orjson_rejects(self):
+        self.assertSameBytes({'big': 2 ** 70}, {'big': 2 ** 70})
+
+    def test_renderer_floats(self):
+        self.assertSameBytes({'plain': 0.25, 'large': 1234567.5}, {'plain': 0.25, 'large': 1234567.5})
+        # Exponents are spelled differently, but parse to the same values
+        data = {'tiny': 5e-05, 'huge': 1e16}
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+
+class Collector:
+    """Stands in for a SpectatorConsumer"""
+
+    def __init__(self):
+        self.frames = []
+
+    def push(self, frame):
+        self.frames.append(json.loads(frame))
+        return True
+
+
+@override_settings(
+    SPECTATOR_BUFFER_SIZE=2,
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class SpectatorHubTests(TestCase):
+    def make_hub(self):
+        hub = SpectatorHub('ROOM01')
+        hub.snapshot = hub.encode_snapshot(0, {'phase': 'waiting'})
+        return hub
+
+    def release(self, hub, number):
+        hub.pending.append(None)
+        hub.release(json.dumps({'type': 'game_update', 'data': {'event': number}}), {'phase': number})
+
+    def test_late_joiner_gets_buffered_events(self):
+        hub = self.make_hub()
+        self.release(hub, 1)
+        self.release(hub, 2)
+        spectator = Collector()
+        hub.subscribe(spectator)
+        self.assertEqual(spectator.frames[0], {'type': 'spectator_state', 'seq': 0, 'data': {'phase': 'waiting'}})
+        self.assertEqual([frame['data']['event'] for frame in spectator.frames[1:]], [1, 2])
+
+    def test_snapshot_folds_in_events_leaving_the_buffer(self):
+        hub = self.make_hub()
+        for number in range(1, 6):
+            self.release(hub, number)
+        spectator = Collector()
+        hub.subscribe(spectator)
+        # Events 1-3 fell out of the buffer and are in the snapshot; 4-5 are replayed
+        self.assertEqual(spectator.frames[0], {'type': 'spectator_state', 'seq': 3, 'data': {'phase': 3}})
+        self.assertEqual([frame['data']['event'] for frame in spectator.frames[1:]], [4, 5])
+
+    def test_subscribers_get_released_events(self):
+        hub = self.make_hub()
+        spectator = Collector()
+        hub.subscribe(spectator)
+        self.release(hub, 1)
+        self.assertEqual(spectator.frames[-1]['data']['event'], 1)
+
+    def spectator(self, hub, queue_size=None):
+        spectator = consumers.SpectatorConsumer()
+        spectator.hub = hub
+        spectator.queue = asyncio.Queue(maxsize=queue_size or settings.SPECTATOR_QUEUE_SIZE)
+        spectator.close = mock.AsyncMock()
+        return spectator
+
+    async def test_long_replay_fits_the_spectator_queue(self):
+        with self.settings(SPECTATOR_BUFFER_SIZE=200):
+            hub = self.make_hub()
+        for number in range(1, 101):
+            self.release(hub, number)
+        spectator = self.spectator(hub)
+
+        self.assertTrue(hub.subscribe(spectator))
+        await asyncio.sleep(0)
+        spectator.close.assert_not_called()
+        self.assertIn(spectator, hub.subscribers)
+        # Room is left for what gets released while the socket drains the queue
+        self.assertLessEqual(spectator.queue.qsize(), settings.SPECTATOR_QUEUE_SIZE // 2)
+
+        frames = [json.loads(spectator.queue.get_nowait()) for _ in range(spectator.queue.qsize())]
+        snapshot, events = frames[0], [frame['data']['event'] for frame in frames[1:]]
+        # The events that didn't fit are folded into the snapshot
+        self.assertEqual(snapshot['data'], {'phase': snapshot['seq']})
+        self.assertEqual(events, list(range(snapshot['seq'] + 1, 101)))
+
+    async def test_spectator_dropped_during_replay_is_not_registered(self):
+        hub = self.make_hub()
+        self.release(hub, 1)
+        spectator = self.spectator(hub, queue_size=1)
+
+        self.assertFalse(hub.subscribe(spectator))
+        await asyncio.sleep(0)
+        spectator.close.assert_called_once_with(code=4008)
+        self.assertNotIn(spectator, hub.subscribers)
+
+
+@override_settings(SPECTATOR_DELAY_SECONDS=15)
+class DelayedSpectatorViewTests(TestCase):
+    def test_first_snapshot_is_as_old_as_the_delay(self):
+        room = make_room(3, status='playing')
+        wolf, victim, citizen = room.players.all()
+        record_events(room, 'role_assigned', [
+            {'player_id': player.id, 'nickname': player.nickname, 'role': role}
+            for player, role in ((wolf, 'wolf'), (victim, 'seer'), (citizen, 'citizen'))
+        ])
+        record_event(room, 'phase_changed', phase='night', night_number=1, day_number=0)
+        earlier = timezone.now() - timedelta(minutes=1)
+        GameEvent.objects.update(timestamp=earlier)
+        GameSnapshot.objects.update(created_at=earlier)
+        # The kill happened inside the delay
+        record_event(room, 'killed', player_id=victim.id, cause='wolves')
+        Player.objects.filter(pk=victim.pk).update(is_alive=False)
+
+        view = build_delayed_spectator_view(room.code)
+        self.assertEqual(view['room']['status'], 'playing')
+        self.assertEqual(view['game_state']['phase'], 'night')
+        self.assertEqual(
+            {player['id']: (player['is_alive'], player['role']) for player in view['players']},
+            {wolf.id: (True, None), victim.id: (True, None), citizen.id: (True, None)},
+        )
+
+    def test_game_started_inside_the_delay_shows_the_lobby(self):
+        room = make_room(3, status='playing')
+        record_events(room, 'role_assigned', [
+            {'player_id': player.id, 'nickname': player.nickname, 'role': 'wolf'}
+            for player in room.players.all()
+        ])
+        view = build_delayed_spectator_view(room.code)
+        self.assertEqual(view['room']['status'], 'waiting')
+        self.assertIsNone(view['game_state'])
+        self.assertEqual({player['role'] for player in view['players']}, {None})
+        self.assertEqual(len(view['players']), 3)
+
+
+class FakeViews:
+    def view(self, token=None):
+        return {
+            'room': {'code': 'ROOM01', 'status': 'waiting', 'max_players': 4},
+            'players': [],
+            'game_state': None,
+            'you': token,
+        }
+
+
+class SnapshotCoalescingTests(SimpleTestCase):
+    """Concurrent connects to a room share one snapshot build"""
+
+    def setUp(self):
+        self.builds = 0
+        self.release = asyncio.Event()
+
+    async def build(self, room_code):
+        self.builds += 1
+        await self.release.wait()
+        return FakeViews()
+
+    def consumer(self, token=None):
+        consumer = consumers.GameConsumer()
+        consumer.room_code = 'ROOM01'
+        consumer.player_token = token
+        return consumer
+
+    async def test_concurrent_callers_share_one_build(self):
+        with mock.patch.object(consumers, 'build_game_state', self.build):
+            calls = [asyncio.ensure_future(self.consumer(f'token-{i}').get_game_state()) for i in range(5)]
+            await asyncio.sleep(0)
+            self.release.set()
+            results = await asyncio.gather(*calls)
+        self.assertEqual(self.builds, 1)
+        # Each caller still gets its own view
+        self.assertEqual([result['you'] for result in results], [f'token-{i}' for i in range(5)])
+        self.assertNotIn('ROOM01', consumers._state_builds)
+
+    async def test_cancelled_caller_does_not_cancel_the_build(self):
+        with mock.patch.object(consumers, 'build_game_state', self.build):
+            first = asyncio.ensure_future(self.consumer().get_game_state())
+            second = asyncio.ensure_future(self.consumer().get_game_state())
+            await asyncio.sleep(0)
+            first.cancel()
+            self.release.set()
+            result = await second
+        self.assertEqual(self.builds, 1)
+        self.assertEqual(result['room']['code'], 'ROOM01')
+
+    async def test_later_callers_start_a_new_build(self):
+        self.release.set()
+        with mock.patch.object(consumers, 'build_game_state', self.build):
+            await self.consumer().get_game_state()
+            await self.consumer().get_game_state()
+        self.assertEqual(self.builds, 2)
+
+
+class ConnectAdmissionTests(SimpleTestCase):
+    def test_rejected_sockets_get_spread_out_retry_slots(self):
+        now = [100.0]
+        bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0])
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+        hints = [bucket.retry_after() for _ in range(3)]
+        # Each rejection books the next free refill slot, 1/rate apart
+        self.assertEqual([round(b - a, 6) for a, b in zip(hints, hints[1:])], [0.1, 0.1])
+        self.assertGreaterEqual(hints[0], bucket.wait_time())
+
+
+class FakeSocket:
+    def __init__(self, name, fail=False):
+        self.channel_name = name
+        self.codec = wire.DEFAULT_CODEC
+        self.fail = fail
+        self.sent = []
+        self.reaped = False
+
+    async def send_payload(self, payload):
+        if self.fail:
+            raise RuntimeError('socket closed')
+        self.sent.append(payload)
+
+    async def reap(self):
+        self.reaped = True
+
+
+@override_settings(WS_HEARTBEAT_INTERVAL=0, WS_HEARTBEAT_TIMEOUT=60)
+class HeartbeatTests(SimpleTestCase):
+    async def test_failing_socket_does_not_stop_the_loop(self):
+        tracker = PresenceTracker()
+        broken, healthy = FakeSocket('broken', fail=True), FakeSocket('healthy')
+        idle = FakeSocket('idle')
+        for socket in (broken, healthy, idle):
+            tracker.register(socket)
+        idle.last_seen = 0
+
+        with self.assertLogs('game.presence', 'WARNING'):
+            for _ in range(5):
+                await asyncio.sleep(0)
+        self.assertFalse(tracker.task.done())
+        self.assertNotIn(broken, tracker.connections)
+        self.assertTrue(idle.reaped)
+        self.assertGreaterEqual(len(healthy.sent), 2)
+        tracker.task.cancel()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class BallotTimeoutTests(TestCase):
+    def setUp(self):
+        self.room = make_room(4, status='playing')
+        for player, role in zip(self.room.players.all(), ['wolf', 'seer', 'citizen', 'citizen']):
+            player.role = role
+            player.save()
+        GameState.objects.create(room=self.room, phase='voting', night_number=1, day_number=1)
+
+    def test_broadcasts_wait_for_commit(self):
+        with mock.patch.object(game_logic, 'send_room_update') as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                game_logic.ballot_timed_out(self.room.id, 'voting', 1, 0)
+                # Decided and written, but nothing sent from under the lock
+                self.assertEqual(GameState.objects.get(room=self.room).phase, 'night')
+                send.assert_not_called()
+        phases = [call.args[1]['message']['data'].get('phase') for call in send.call_args_list]
+        self.assertEqual(phases[-1], 'night')
+
+    def test_rolled_back_outcome_is_never_broadcast(self):
+        with mock.patch.object(game_logic, 'send_room_update') as send, \
+                mock.patch.object(bots, 'night_started', side_effect=RuntimeError):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(RuntimeError):
+                    game_logic.ballot_timed_out(self.room.id, 'voting', 1, 0)
+        self.assertEqual(callbacks, [])
+        send.assert_not_called()
+        self.assertEqual(GameState.objects.get(room=self.room).phase, 'voting')
+
+    def test_stale_wakeup_does_nothing(self):
+        with mock.patch.object(game_logic, 'send_room_update') as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                game_logic.ballot_timed_out(self.room.id, 'voting', 1, 1)
+        send.assert_not_called()
+        self.assertEqual(GameState.objects.get(room=self.room).phase, 'voting')
+
+
+class RecoverDeadlinesTests(TestCase):
+    def setUp(self):
+        self.room = make_room(4, status='playing')
+        self.now = timezone.now()
+
+    def test_overdue_ballot_is_resolved(self):
+        GameState.objects.create(room=self.room, phase='voting', night_number=1, day_number=1,
+                                 vote_round=1, timer_end=self.now - timedelta(minutes=5))
+        with mock.patch.object(game_logic, 'ballot_timed_out') as timed_out, \
+                mock.patch.object(scheduler, 'schedule') as schedule:
+            self.assertEqual(game_logic.recover_deadlines(now=self.now), 1)
+        timed_out.assert_called_once_with(self.room.id, 'voting', 1, 1)
+        schedule.assert_not_called()
+
+    def test_running_ballot_is_rearmed(self):
+        GameState.objects.create(room=self.room, phase='leader_election', day_number=1,
+                                 timer_end=self.now + timedelta(seconds=30))
+        with mock.patch.object(scheduler, 'schedule') as schedule:
+            self.assertEqual(game_logic.recover_deadlines(now=self.now), 0)
+        schedule.assert_called_once_with(
+            self.room.id, 30.0, game_logic.ballot_timed_out, self.room.id, 'leader_election', 1, 0
+        )
+
+        # The reaper only acts on what is due
+        with mock.patch.object(scheduler, 'schedule') as schedule:
+            game_logic.recover_deadlines(now=self.now, rearm=False)
+        schedule.assert_not_called()
+
+    def test_overdue_speaking_turn_moves_on(self):
+        first, second = self.room.players.all()[:2]
+        started = self.now - timedelta(minutes=2)
+        GameState.objects.create(
+            room=self.room, phase='day', day_number=1, speaking_order=[first.id, second.id],
+            current_speaker_id=first.id, speaker_started_at=started,
+            speaker_ends_at=started + timedelta(seconds=60),
+        )
+        with mock.patch.object(game_logic, 'send_room_update'), \
+                mock.patch.object(scheduler, 'schedule'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(game_logic.recover_deadlines(now=self.now), 1)
+        self.assertEqual(GameState.objects.get(room=self.room).current_speaker_id, second.id)
+
+    def test_finished_rooms_are_left_alone(self):
+        Room.objects.filter(pk=self.room.pk).update(status='finished')
+        GameState.objects.create(room=self.room, phase='voting', day_number=1,
+                                 timer_end=self.now - timedelta(minutes=5))
+        with mock.patch.object(game_logic, 'ballot_timed_out') as timed_out:
+            self.assertEqual(game_logic.recover_deadlines(now=self.now), 0)
+        timed_out.assert_not_called()
+
+
+class ProvisioningTests(TestCase):
+    def spec(self, players, **config):
+        return dict(config, max_players=players, players=[f'Player {i + 1}' for i in range(players)])
+
+    def test_started_rooms_get_a_role_for_every_player(self):
+        rooms = provision_batch([self.spec(6, num_wolves=2, num_seers=1)] * 2, start=True)
+        self.assertEqual([room['status'] for room in rooms], ['playing', 'playing'])
+        self.assertFalse(Player.objects.filter(role__isnull=True).exists())
+        self.assertEqual(GameState.objects.filter(phase='night').count(), 2)
+
+    def test_rooms_that_cannot_start_are_rejected_before_any_write(self):
+        # Five special roles by default, for three players
+        with self.assertRaisesMessage(ValueError, 'Too many special roles configured'):
+            provision_batch([self.spec(3)], start=True)
+        with self.assertRaisesMessage(ValueError, 'Started rooms must be full'):
+            provision_batch([dict(self.spec(6), max_players=8)], start=True)
+        self.assertFalse(Room.objects.exists())
+
+    def test_command_reports_rooms_that_cannot_start(self):
+        with self.assertRaisesMessage(CommandError, 'Too many special roles configured'):
+            call_command('provision_rooms', '--players', '3', '--start', stdout=io.StringIO())
+        self.assertFalse(Room.objects.exists())
+
+
+class StoreScenarios:
+    """The same game played against each GAME_STATE_BACKEND store"""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+        self.room = make_room(5, status='playing')
+        self.players = list(self.room.players.all())
+        for player, role in zip(self.players, ['wolf', 'wolf', 'seer', 'protector', 'citizen']):
+            player.role = role
+            player.save()
+        self.wolf, self.wolf2, self.seer, self.protector, self.citizen = self.players
+        self.game_state = GameState.objects.create(room=self.room, phase='voting', night_number=1, day_number=1)
+        self.store.start_game(self.room, self.players)
+        # Tallies are cached per process by room id, which the next test may reuse
+        self.addCleanup(close_ballots, self.room.id)
+
+    def test_vote_tally(self):
+        self.store.cast_vote(self.wolf, self.citizen, self.game_state)
+        self.store.cast_vote(self.wolf2, self.citizen, self.game_state)
+        error, _, counts = self.store.cast_vote(self.seer, self.wolf, self.game_state)
+        self.assertIsNone(error)
+        self.assertEqual(counts, {self.citizen.id: 2, self.wolf.id: 1})
+        self.assertEqual(self.store.ballot_leaders(self.room, 'elimination', 1, 0), ([self.citizen.id], 2))
+
+    def test_changed_vote_moves_its_weight(self):
+        self.store.cast_vote(self.wolf, self.citizen, self.game_state)
+        _, _, counts = self.store.cast_vote(self.wolf, self.seer, self.game_state)
+        self.assertEqual(counts, {self.seer.id: 1})
+
+    def test_leader_vote_counts_double(self):
+        self.seer.is_leader = True
+        self.seer.save()
+        self.store.cast_vote(self.wolf, self.citizen, self.game_state)
+        self.store.cast_vote(self.seer, self.wolf, self.game_state)
+        self.assertEqual(self.store.ballot_leaders(self.room, 'elimination', 1, 0), ([self.wolf.id], 2))
+
+    def test_resubmitted_vote_is_counted_once(self):
+        for _ in range(3):
+            _, _, counts = self.store.cast_vote(self.wolf, self.citizen, self.game_state)
+        self.assertEqual(counts, {self.citizen.id: 1})
+        self.assertEqual(self.store.ballot_leaders(self.room, 'elimination', 1, 0), ([self.citizen.id], 1))
+
+    def test_resubmitted_night_action_is_recorded_once(self):
+        for _ in range(2):
+            error, wolves_done = self.store.record_night_action(self.wolf, self.citizen, 'wolf_vote', 1)
+            self.assertIsNone(error)
+            self.assertFalse(wolves_done)
+        error, wolves_done = self.store.record_night_action(self.wolf2, self.citizen, 'wolf_vote', 1)
+        self.assertTrue(wolves_done)
+        self.assertEqual(self.store.night_actions(self.room, 1),
+                         {'wolf_vote': {self.wolf.id: self.citizen.id, self.wolf2.id: self.citizen.id}})
+
+    def test_protector_cannot_repeat_target(self):
+        self.assertEqual(self.store.record_night_action(self.protector, self.citizen, 'protector_protect', 1),
+                         (None, True))
+        self.protector.refresh_from_db()
+        error, _ = self.store.record_night_action(self.protector, self.citizen, 'protector_protect', 2)
+        self.assertEqual(error, 'Cannot protect same player twice in a row')
+
+    def test_seer_inspections_span_nights(self):
+        self.store.record_night_action(self.seer, self.wolf, 'seer_inspect', 1)
+        self.store.record_night_action(self.seer, self.citizen, 'seer_inspect', 2)
+        inspections = self.store.seer_inspections(self.room)
+        self.assertEqual(sorted(inspections[self.seer.id]), sorted([self.wolf.id, self.citizen.id]))
+
+    def test_finish_game_leaves_every_action_and_vote_in_the_database(self):
+        self.store.record_night_action(self.wolf, self.citizen, 'wolf_vote', 1)
+        self.store.record_night_action(self.seer, self.wolf, 'seer_inspect', 1)
+        self.store.cast_vote(self.wolf, self.seer, self.game_state)
+        self.store.cast_vote(self.citizen, self.wolf, self.game_state)
+        self.store.cast_vote(self.citizen, self.wolf2, self.game_state)
+        self.store.finish_game(self.room)
+
+        self.assertEqual(
+            set(Action.objects.filter(player__room=self.room).values_list(
+                'player_id', 'action_type', 'target_id', 'night_number')),
+            {(self.wolf.id, 'wolf_vote', self.citizen.id, 1), (self.seer.id, 'seer_inspect', self.wolf.id, 1)}
+        )
+        self.assertEqual(
+            Action.objects.get(action_type='seer_inspect').result_data, {'target_role': 'wolf'}
+        )
+        self.assertEqual(
+            set(Vote.objects.filter(player__room=self.room).values_list(
+                'player_id', 'target_id', 'vote_type', 'vote_phase', 'round')),
+            {(self.wolf.id, self.seer.id, 'elimination', 1, 0),
+             (self.citizen.id, self.wolf2.id, 'elimination', 1, 0)}
+        )
+
+
+class DatabaseStoreTests(StoreScenarios, TestCase):
+    def make_store(self):
+        return DatabaseStore()
+
+
+@skipIf(fakeredis is None, 'fakeredis is not installed')
+class RedisStoreTests(StoreScenarios, TestCase):
+    def make_store(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        with mock.patch('redis.Redis.from_url', return_value=self.redis):
+            return RedisStore('redis://test')
+
+    def test_dead_players_cannot_act_or_be_targeted(self):
+        self.store.player_died(self.room, self.citizen.id)
+        self.assertEqual(self.store.cast_vote(self.citizen, self.wolf, self.game_state)[0],
+                         'Dead players cannot vote')
+        self.assertEqual(self.store.cast_vote(self.wolf, self.citizen, self.game_state)[0],
+                         'Cannot vote for dead player')
+        self.assertEqual(self.store.record_night_action(self.wolf, self.citizen, 'wolf_vote', 1),
+                         ('Cannot target dead player', False))
+
+    def test_finish_game_drops_the_room_keys(self):
+        self.store.record_night_action(self.wolf, self.citizen, 'wolf_vote', 1)
+        self.store.cast_vote(self.wolf, self.seer, self.game_state)
+        self.store.finish_game(self.room)
+        self.assertEqual(self.redis.keys(f'game:{{{self.room.id}}}*'), [])
+
+
+# The manifest storage needs collectstatic, which tests don't run
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class OpsConsoleTests(TestCase):
+    """The console is part of the default urlconf, which the web service runs"""
+
+    def test_staff_see_the_console(self):
+        make_room(4, status='playing')
+        staff = get_user_model().objects.create_user('ops', password='x', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/admin/ops/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Operations')
+
+    def test_anonymous_users_are_sent_to_login(self):
+        response = self.client.get('/admin/ops/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/admin/login/', response['Location'])
+
+
+class ClientIdentTests(SimpleTestCase):
+    """Rate limits key on an IP the client can't choose"""
+
+    def ident(self, forwarded_for, num_proxies):
+        request = APIRequestFactory().post('/api/rooms/ABC123/join/', REMOTE_ADDR='10.0.0.1',
+                                           HTTP_X_FORWARDED_FOR=forwarded_for)
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': num_proxies}):
+            return JoinThrottle().get_ident(request)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        self.assertEqual(self.ident('1.2.3.4', 0), '10.0.0.1')
+
+    def test_only_the_proxy_appended_entry_is_used(self):
+        # The client sent "6.6.6.6, 7.7.7.7"; the proxy appended the real address
+        self.assertEqual(self.ident('6.6.6.6, 7.7.7.7, 203.0.113.9', 1), '203.0.113.9')
+
+
+class LifecycleTests(TestCase):
+    CHILDREN = [Player, GameState, Action, Vote, GameLog, GameEvent, GameSnapshot]
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.ttl = timedelta(minutes=60)
+
+    def aged(self, room, created, joined=None):
+        Room.objects.filter(pk=room.pk).update(created_at=self.now - created)
+        Player.objects.filter(room=room).update(joined_at=self.now - (joined or created))
+        return room
+
+    def played(self, room):
+        """Give the room a row in every child table"""
+        first, second = room.players.all()[:2]
+        Player.objects.filter(pk=first.pk).update(role='wolf')
+        GameState.objects.create(room=room, phase='day', night_number=1, day_number=1)
+        Action.objects.create(player=first, action_type='wolf_vote', target=second, night_number=1)
+        Vote.objects.create(player=first, target=second, vote_type='elimination', vote_phase=1)
+        GameLog.objects.create(room=room, phase='night', message='Night falls', metadata={'night': 1})
+        record_event(room, 'phase_changed', phase='day', night_number=1, day_number=1)
+        return room
+
+    def room_lookup(self, model):
+        return 'player__room_id' if model in (Action, Vote) else 'room_id'
+
+    def assertNoChildren(self, room_id):
+        for model in self.CHILDREN:
+            self.assertFalse(model.objects.filter(**{self.room_lookup(model): room_id}).exists(),
+                             model.__name__)
+
+    def test_recent_join_keeps_a_waiting_room_alive(self):
+        idle = self.aged(make_room(2), created=timedelta(hours=2))
+        boundary = self.aged(make_room(2), created=timedelta(hours=2), joined=self.ttl)
+        joined = self.aged(make_room(2), created=timedelta(hours=2), joined=timedelta(minutes=5))
+        young = self.aged(make_room(0), created=timedelta(minutes=5))
+
+        self.assertEqual(expire_idle_rooms(ttl=self.ttl, now=self.now), 1)
+        self.assertEqual(set(Room.objects.values_list('pk', flat=True)), {boundary.pk, joined.pk, young.pk})
+        self.assertNoChildren(idle.pk)
+
+    def test_archive_round_trips_the_full_record(self):
+        room = self.played(make_room(3, status='finished', finished_at=self.now - timedelta(hours=1)))
+        expected = json.loads(json.dumps(build_game_records([room])[room.id], cls=DjangoJSONEncoder))
+
+        self.assertEqual(archive_finished_rooms(grace=timedelta(minutes=30), now=self.now + timedelta(hours=1)), 1)
+        archive = ArchivedGame.objects.get()
+        self.assertEqual((archive.code, archive.finished_at), (room.code, room.finished_at))
+        self.assertEqual(archive.load(), expected)
+        self.assertEqual(len(expected['players']), 3)
+        self.assertTrue(all(expected[table] for table in ('actions', 'votes', 'logs', 'events')))
+        self.assertFalse(Room.objects.exists())
+        self.assertNoChildren(room.pk)
+
+    def test_other_rooms_are_left_alone(self):
+        waiting = self.aged(make_room(2), created=timedelta(days=1))
+        playing = self.aged(self.played(make_room(2, status='playing')), created=timedelta(days=1))
+        finished = self.aged(make_room(2, status='finished', finished_at=self.now), created=timedelta(days=1))
+
+        # The waiting room goes, but nothing is archived from it
+        self.assertEqual(archive_finished_rooms(grace=timedelta(minutes=30), now=self.now), 0)
+        self.assertEqual(expire_idle_rooms(ttl=self.ttl, now=self.now), 1)
+        self.assertEqual(set(Room.objects.values_list('pk', flat=True)), {playing.pk, finished.pk})
+        self.assertFalse(ArchivedGame.objects.exists())
+        for model in self.CHILDREN:
+            self.assertTrue(model.objects.filter(**{self.room_lookup(model): playing.pk}).exists(),
+                            model.__name__)
+        self.assertNoChildren(waiting.pk)
+
+
+class RoomCodeTests(TestCase):
+    def test_permute_is_a_bijection_on_a_small_space(self):
+        # The same Feistel network and cycle-walking, over 12 bits into 3000
+        with mock.patch.multiple(room_codes, _HALF_BITS=6, _HALF_MASK=63, CODE_SPACE=3000):
+            images = [room_codes.permute(value) for value in range(3000)]
+        self.assertEqual(sorted(images), list(range(3000)))
+
+    def test_permute_stays_in_the_code_space_without_collisions(self):
+        values = [*range(20000), *range(room_codes.CODE_SPACE - 20000, room_codes.CODE_SPACE)]
+        images = {room_codes.permute(value) for value in values}
+        self.assertEqual(len(images), len(values))
+        self.assertTrue(all(0 <= image < room_codes.CODE_SPACE for image in images))
+        self.assertRegex(room_codes.code_for(12345), r'^[A-Z0-9]{6}$')
+
+    def test_codes_already_in_use_are_skipped(self):
+        block = range(1000, 1005)
+        Room.objects.create(code=room_codes.code_for(1002), admin_token='legacy')
+        codes = room_codes.codes_for_block(block)
+        self.assertEqual(codes, [room_codes.code_for(value) for value in block if value != 1002])
+
+    def test_transactions_reserve_one_value_at_a_time(self):
+        room_codes.reserve_block(1)
+        before = RoomCodeCounter.objects.get(pk=1).next_value
+        with mock.patch.object(room_codes, '_pool', []) as pool, transaction.atomic():
+            first = room_codes.allocate_room_code()
+            second = room_codes.allocate_room_code()
+            self.assertEqual(pool, [])
+        self.assertEqual(RoomCodeCounter.objects.get(pk=1).next_value, before + 2)
+        self.assertEqual([first, second], [room_codes.code_for(before), room_codes.code_for(before + 1)])
+
+
+class IdempotencyTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(idempotency, 'responses', idempotency.TTLCache(60, 100))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = []
+        self.status = 200
+
+        @idempotency.idempotent
+        def act(viewset, request, pk=None):
+            self.calls.append(request.data)
+            return Response({'call': len(self.calls)}, status=self.status)
+        self.act = act
+
+    def post(self, body, key='key-1', token='token-1'):
+        headers = {'HTTP_X_PLAYER_TOKEN': token}
+        if key:
+            headers['HTTP_IDEMPOTENCY_KEY'] = key
+        request = APIRequestFactory().post('/', body, format='json', **headers)
+        return self.act(None, Request(request, parsers=[JSONParser()]), pk='7')
+
+    def test_retry_gets_the_first_response(self):
+        first = self.post({'target_id': 3})
+        retry = self.post({'target_id': 3})
+        self.assertEqual((retry.status_code, retry.data), (200, first.data))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(len(self.calls), 1)
+
+    def test_key_reused_for_another_body_is_rejected(self):
+        self.post({'target_id': 3})
+        response = self.post({'target_id': 4})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_only_successes_are_kept(self):
+        self.status = 400
+        self.post({'target_id': 3})
+        self.status = 200
+        response = self.post({'target_id': 3})
+        self.assertEqual(response.data, {'call': 2})
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_keys_are_scoped_to_the_player_token(self):
+        self.post({'target_id': 3}, token='token-1')
+        response = self.post({'target_id': 3}, token='token-2')
+        self.assertEqual(response.data, {'call': 2})
+
+    def test_requests_without_a_key_always_run(self):
+        self.post({'target_id': 3}, key=None)
+        self.post({'target_id': 3}, key=None)
+        self.assertEqual(len(self.calls), 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.rooms = [make_room(3, status='finished') for _ in range(3)]
+        Room.objects.update(finished_at=timezone.now() - timedelta(hours=2))
+
+    def age(self, rooms):
+        # Only rooms created before the grace period are archived
+        Room.objects.filter(pk__in=[room.pk for room in rooms]).update(
+            created_at=timezone.now() - timedelta(hours=3)
+        )
+
+    def exported_codes(self, batches):
+        return sorted(row['code'] for batch in batches for row in batch['games'])
+
+    def test_room_archived_mid_export_is_exported_once(self):
+        self.age(self.rooms)
+        batches = analytics.export_batches(batch_size=2)
+        first = next(batches)
+        # The reaper archives every room between the export's two reads
+        archive_finished_rooms(grace=timedelta(minutes=1))
+        self.assertFalse(Room.objects.exists())
+        codes = self.exported_codes([first, *batches])
+        self.assertEqual(codes, sorted(room.code for room in self.rooms))
+
+    def test_live_and_archived_games_are_both_exported(self):
+        self.age(self.rooms[:1])
+        archive_finished_rooms(grace=timedelta(minutes=1))
+        self.assertEqual(Room.objects.count(), 2)
+        codes = self.exported_codes(analytics.export_batches())
+        self.assertEqual(codes, sorted(room.code for room in self.rooms))
+
+
+class RoomVersionTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+        # Codes come back after a rolled-back test: drop what one left cached
+        cache.delete(version_key(self.room.code))
+        self.addCleanup(cache.delete, version_key(self.room.code))
+
+    def test_read_racing_a_bump_cannot_cache_the_old_version(self):
+        stale = current_version(self.room.code)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version(self.room)
+        # A read of the primary from before the commit fills the cache late
+        cache.add(version_key(self.room.code), stale)
+        self.assertEqual(current_version(self.room.code), (self.room.id, stale[1] + 1))
+
+    def test_bump_pins_the_room_to_the_primary(self):
+        with mock.patch('game.db_routers.replica_enabled', return_value=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                bump_version(self.room)
+        self.assertTrue(cache.get_many(pin_keys(self.room.code)))
+        cache.delete_many(pin_keys(self.room.code))
+
+    def test_etag_names_the_version_the_body_was_rendered_from(self):
+        url = f'/api/rooms/{self.room.code}/'
+        # The primary is a version ahead of what the view reads
+        cache.set(version_key(self.room.code), (self.room.id, self.room.version + 1))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'-{self.room.id}-{self.room.version}-', response['ETag'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ViewerClassTests(TestCase):
+    """Who sees which roles, through every read that renders a projection"""
+
+    def setUp(self):
+        # Projections are cached by room id and version, which repeat between tests
+        cache.clear()
+        self.room = make_room(5, status='playing')
+        self.players = list(self.room.players.order_by('id'))
+        for player, role in zip(self.players, ['wolf', 'wolf', 'seer', 'citizen', 'protector']):
+            player.role = role
+        self.players[4].is_alive = False
+        for player in self.players:
+            player.save()
+        self.wolf, self.other_wolf, self.seer, self.citizen, self.dead = self.players
+        GameState.objects.create(room=self.room, phase='day', night_number=1, day_number=1)
+        Action.objects.create(player=self.seer, action_type='seer_inspect', target=self.citizen, night_number=1)
+        GameLog.objects.create(room=self.room, phase='night', message='The seer inspected a player',
+                               metadata={'seer_id': self.seer.id})
+
+    def get(self, path, player=None):
+        headers = {'HTTP_X_PLAYER_TOKEN': player.token} if player else {}
+        response = self.client.get(path, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def roles_seen(self, player=None):
+        data = self.get(f'/api/rooms/{self.room.code}/', player).json()
+        return {entry['id']: entry['role'] for entry in data['players'] if entry['role']}
+
+    def test_public_and_citizens_only_see_the_dead(self):
+        self.assertEqual(self.roles_seen(), {self.dead.id: 'protector'})
+        self.assertEqual(self.roles_seen(self.citizen), {self.dead.id: 'protector'})
+
+    def test_wolves_see_each_other(self):
+        self.assertEqual(self.roles_seen(self.wolf), {
+            self.wolf.id: 'wolf', self.other_wolf.id: 'wolf', self.dead.id: 'protector'
+        })
+
+    def test_seer_sees_who_they_inspected(self):
+        self.assertEqual(self.roles_seen(self.seer), {self.citizen.id: 'citizen', self.dead.id: 'protector'})
+
+    def test_dead_players_see_everything(self):
+        self.assertEqual(len(self.roles_seen(self.dead)), 5)
+
+    def test_everyone_sees_everything_once_finished(self):
+        Room.objects.filter(pk=self.room.pk).update(status='finished', version=F('version') + 1)
+        self.assertEqual(len(self.roles_seen()), 5)
+
+    def test_you_is_the_callers_own_player(self):
+        data = self.get(f'/api/rooms/{self.room.code}/', self.seer).json()
+        self.assertEqual((data['you']['id'], data['you']['role']), (self.seer.id, 'seer'))
+        self.assertIsNone(self.get(f'/api/rooms/{self.room.code}/').json()['you'])
+
+    def assertNoTokens(self, content):
+        for token in [self.room.admin_token, *(player.token for player in self.players)]:
+            self.assertNotIn(token, content)
+
+    def test_tokens_never_leave_rest_reads(self):
+        for path in (f'/api/rooms/{self.room.code}/', f'/api/rooms/{self.room.code}/bundle/'):
+            for player in (None, self.wolf, self.dead):
+                self.assertNoTokens(self.get(path, player).content.decode())
+
+    async def test_tokens_never_leave_socket_views(self):
+        for player in (None, self.seer, self.dead):
+            consumer = consumers.GameConsumer()
+            consumer.room_code = self.room.code
+            consumer.player_token = player.token if player else None
+            state = await consumer.get_game_state()
+            self.assertNoTokens(json.dumps(state))
+            self.assertEqual(state['you'] and state['you']['id'], player and player.id)
+
+    def test_join_does_not_return_a_role(self):
+        room = make_room(2)
+        Player.objects.filter(room=room).last().delete()
+        Room.objects.filter(pk=room.pk).update(player_count=1)
+        response = self.client.post(f'/api/rooms/{room.code}/join/', {'nickname': 'newcomer'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('role', response.json()['player'])
+
+    def test_log_hides_the_seer_from_the_living(self):
+        paths = [f'/api/rooms/{self.room.code}/bundle/?fields=logs', f'/api/logs/?room_code={self.room.code}']
+        for path in paths:
+            for player in (None, self.citizen, self.wolf):
+                self.assertNotIn(str(self.seer.id), json.dumps(
+                    [entry['metadata'] for entry in self.logs(self.get(path, player).json())]
+                ))
+            metadata = [entry['metadata'] for entry in self.logs(self.get(path, self.dead).json())]
+            self.assertIn({'seer_id': self.seer.id}, metadata)
+
+    def logs(self, data):
+        if isinstance(data, dict):
+            return data.get('logs', data.get('results'))
+        return data
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class LobbyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        created = timezone.now() - timedelta(minutes=10)
+        self.rooms = []
+        for index in range(5):
+            room = make_room(1)
+            # Two rooms share each timestamp, so the id breaks the tie
+            Room.objects.filter(pk=room.pk).update(
+                max_players=3, player_count=1, created_at=created + timedelta(minutes=index // 2)
+            )
+            self.rooms.append(room)
+        full = make_room(2)
+        Room.objects.filter(pk=full.pk).update(player_count=2)
+        make_room(3, status='playing')
+
+    def lobby(self, **params):
+        response = self.client.get('/api/rooms/lobby/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pages_through_open_rooms_newest_first(self):
+        codes, cursor = [], None
+        while True:
+            page = self.lobby(limit=2, **({'cursor': cursor} if cursor else {}))
+            self.assertLessEqual(len(page['rooms']), 2)
+            codes += [room['code'] for room in page['rooms']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        expected = Room.objects.filter(pk__in=[room.pk for room in self.rooms]).order_by('-created_at', '-id')
+        self.assertEqual(codes, [room.code for room in expected])
+
+    def test_malformed_cursor_is_rejected(self):
+        response = self.client.get('/api/rooms/lobby/', {'cursor': '!!!'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_join_invalidates_cached_pages(self):
+        room = self.rooms[-1]
+
+        def entry():
+            return next((listed for listed in self.lobby()['rooms'] if listed['code'] == room.code), None)
+
+        self.assertEqual(entry()['player_count'], 1)
+
+        self.client.post(f'/api/rooms/{room.code}/join/', {'nickname': 'second'}, content_type='application/json')
+        self.assertEqual(entry()['player_count'], 2)
+
+        # The last seat fills the room, which leaves the lobby
+        self.client.post(f'/api/rooms/{room.code}/join/', {'nickname': 'third'}, content_type='application/json')
+        self.assertIsNone(entry())
+
+
+class SpeakingTurnTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch('game.speaking.scheduler')
+        self.scheduler = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.room = make_room(3, status='playing')
+        self.players = list(self.room.players.order_by('joined_at'))
+        self.game_state = GameState.objects.create(room=self.room, phase='day', night_number=1, day_number=1)
+        start_speaking_turns(self.room, self.game_state)
+
+    def state(self):
+        return GameState.objects.get(room=self.room)
+
+    def rewind_turn(self, seconds):
+        """Pretend the running turn started `seconds` ago"""
+        started = self.state().speaker_started_at - timedelta(seconds=seconds)
+        GameState.objects.filter(room=self.room).update(speaker_started_at=started)
+        return started
+
+    def test_turns_follow_join_order_and_charge_the_speaker(self):
+        first, second, third = self.players
+        self.assertEqual(self.state().speaking_order, [first.id, second.id, third.id])
+        self.assertEqual(self.state().current_speaker_id, first.id)
+        self.scheduler.schedule_on_commit.assert_called_once()
+
+        self.rewind_turn(10)
+        message, error = pass_turn(Player.objects.get(pk=first.pk))
+        self.assertIsNone(error)
+        self.assertEqual(message['speaker']['id'], second.id)
+        self.assertEqual(Player.objects.get(pk=first.pk).speaking_time_used, 10)
+        self.assertEqual(Player.objects.get(pk=second.pk).speaking_time_used, 0)
+
+    def test_only_the_speaker_can_pass(self):
+        message, error = pass_turn(self.players[1])
+        self.assertEqual((message, error), (None, 'Not your turn to speak'))
+        self.assertEqual(self.state().current_speaker_id, self.players[0].id)
+
+    def test_last_pass_ends_the_round(self):
+        for player in self.players:
+            message, error = pass_turn(Player.objects.get(pk=player.pk))
+        self.assertEqual(message, {'type': 'speaking_finished'})
+        self.assertIsNone(self.state().current_speaker_id)
+
+    def test_timeout_moves_on_only_for_the_running_turn(self):
+        first, second, _ = self.players
+        started = self.rewind_turn(30)
+        with mock.patch.object(game_logic, 'send_room_update'):
+            # A wakeup for an earlier turn of the same speaker
+            turn_timed_out(self.room.id, first.id, started - timedelta(minutes=1))
+            self.assertEqual(self.state().current_speaker_id, first.id)
+
+            turn_timed_out(self.room.id, first.id, started)
+        self.assertEqual(self.state().current_speaker_id, second.id)
+        self.assertEqual(Player.objects.get(pk=first.pk).speaking_time_used, 30)
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('game.db_routers.replica_enabled', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ReplicaRouter()
+        # Each request reports where the view's reads would go
+        self.middleware = ReplicaMiddleware(lambda request: self.router.db_for_read(Room))
+        self.factory = RequestFactory()
+
+    def get(self, path, token=None):
+        headers = {'HTTP_X_PLAYER_TOKEN': token} if token else {}
+        return self.middleware(self.factory.get(path, **headers))
+
+    def test_reads_go_to_the_replica_and_writes_to_the_primary(self):
+        self.assertEqual(self.get('/api/rooms/ABC123/'), REPLICA)
+        self.assertEqual(self.middleware(self.factory.post('/api/rooms/ABC123/join/')), 'default')
+        self.assertEqual(self.router.db_for_write(Room), 'default')
+        # Outside a request nothing reads from the replica
+        self.assertEqual(self.router.db_for_read(Room), 'default')
+
+    def test_post_pins_its_room_and_token(self):
+        self.middleware(self.factory.post('/api/rooms/ABC123/join/', HTTP_X_PLAYER_TOKEN='token-1'))
+        self.assertEqual(self.get('/api/rooms/ABC123/'), 'default')
+        self.assertEqual(self.get('/api/players/7/role/', token='token-1'), 'default')
+        # Other rooms and players still read from the replica
+        self.assertEqual(self.get('/api/rooms/XYZ789/'), REPLICA)
+        self.assertEqual(self.get('/api/players/8/role/', token='token-2'), REPLICA)
+
+    def test_pins_expire(self):
+        with self.settings(REPLICA_PIN_SECONDS=0.01):
+            self.middleware(self.factory.post('/api/rooms/ABC123/join/'))
+        time.sleep(0.02)
+        self.assertEqual(self.get('/api/rooms/ABC123/'), REPLICA)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class BotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def add_bots(self, room, **body):
+        return self.client.post(f'/api/rooms/{room.code}/add_bots/', body, content_type='application/json',
+                                HTTP_X_ADMIN_TOKEN=room.admin_token)
+
+    def test_bots_claim_only_the_free_seats(self):
+        room = make_room(1)
+        Player.objects.filter(room=room).update(nickname='Bot 1')
+        Room.objects.filter(pk=room.pk).update(max_players=4, player_count=1)
+        room.refresh_from_db()
+
+        self.assertEqual(self.add_bots(room, count=2).status_code, 201)
+        self.assertEqual(self.add_bots(room).status_code, 201)
+        room.refresh_from_db()
+        self.assertEqual(room.player_count, 4)
+        self.assertEqual(sorted(room.players.filter(is_bot=True).values_list('nickname', flat=True)),
+                         ['Bot 2', 'Bot 3', 'Bot 4'])
+
+        # Full: nothing more is claimed
+        self.assertEqual(self.add_bots(room).status_code, 400)
+        self.assertEqual(room.players.count(), 4)
+
+    def playing(self, phase, roles):
+        room = make_room(len(roles), status='playing')
+        players = list(room.players.order_by('id'))
+        for player, role in zip(players, roles):
+            player.role = role
+            player.is_bot = True
+            player.save()
+        GameState.objects.create(room=room, phase=phase, night_number=1, day_number=1)
+        self.addCleanup(close_ballots, room.id)
+        return room, players
+
+    def test_night_move_goes_through_player_actions(self):
+        room, (wolf, *others) = self.playing('night', ['wolf', 'seer', 'citizen', 'citizen'])
+        with mock.patch.object(player_actions, 'submit_night_action',
+                               wraps=player_actions.submit_night_action) as submit:
+            bots.night_move(room.id, wolf.id, 1)
+            # A wakeup for another night does nothing
+            bots.night_move(room.id, wolf.id, 2)
+        submit.assert_called_once()
+        action = Action.objects.get(player=wolf)
+        self.assertEqual(action.action_type, 'wolf_vote')
+        self.assertIn(action.target_id, [player.id for player in others])
+
+    def test_ballot_move_goes_through_player_actions(self):
+        room, (wolf, citizen, *_) = self.playing('voting', ['wolf', 'citizen', 'citizen'])
+        with mock.patch.object(player_actions, 'submit_vote', wraps=player_actions.submit_vote) as submit, \
+                mock.patch.object(player_actions, 'broadcast_game_update'):
+            bots.ballot_move(room.id, citizen.id, 'voting', 1, 0)
+        submit.assert_called_once()
+        vote = Vote.objects.get(player=citizen)
+        self.assertEqual((vote.vote_type, vote.vote_phase), ('elimination', 1))
+        self.assertNotEqual(vote.target_id, citizen.id)
+
+
+class BundleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.room = make_room(3, status='playing')
+        self.player = self.room.players.order_by('id').first()
+        GameState.objects.create(room=self.room, phase='night', night_number=1)
+        GameLog.objects.create(room=self.room, phase='setup', message='Game started - Roles assigned', metadata={})
+
+    def bundle(self, fields=None, token=None):
+        params = {'fields': fields} if fields is not None else {}
+        headers = {'HTTP_X_PLAYER_TOKEN': token} if token else {}
+        return self.client.get(f'/api/rooms/{self.room.code}/bundle/', params, **headers)
+
+    def test_every_section_by_default(self):
+        data = self.bundle().json()
+        self.assertEqual(set(data), {'room', 'players', 'game_state', 'you', 'logs'})
+        self.assertEqual(data['game_state']['phase'], 'night')
+        self.assertEqual([entry['message'] for entry in data['logs']], ['Game started - Roles assigned'])
+
+    def test_fields_picks_sections(self):
+        self.assertEqual(set(self.bundle('players,logs').json()), {'players', 'logs'})
+        self.assertEqual(set(self.bundle('game_state,').json()), {'game_state'})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.bundle('players,secrets,tokens')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Unknown fields: secrets, tokens'})
+
+    def test_you_needs_the_players_token(self):
+        self.assertIsNone(self.bundle('you').json()['you'])
+        self.assertIsNone(self.bundle('you', token='not-a-token').json()['you'])
+        you = self.bundle('you', token=self.player.token).json()['you']
+        self.assertEqual((you['id'], you['nickname']), (self.player.id, self.player.nickname))
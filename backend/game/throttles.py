@@ -0,0 +1,52 @@
+"""DRF throttles for the endpoints a client can spam.
+
+They run before the view touches the database: a rejection is a dict
+lookup and some arithmetic, answered with 429 and Retry-After. Budgets
+are RATELIMIT_* in settings; every rejection is counted in game.metrics
+(rate_limited_<name>) for the ops console.
+"""
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from .ratelimit import Limiter
+
+ip_limiter = Limiter('ip', settings.RATELIMIT_IP_RATE, settings.RATELIMIT_IP_BURST)
+action_limiter = Limiter('action', settings.RATELIMIT_ACTION_RATE, settings.RATELIMIT_ACTION_BURST)
+join_limiter = Limiter('join', settings.RATELIMIT_JOIN_RATE, settings.RATELIMIT_JOIN_BURST)
+
+
+class BucketThrottle(BaseThrottle):
+    wait_seconds = None
+
+    def limits(self, request):
+        """(limiter, key) pairs the request must pass, cheapest first"""
+        return [(ip_limiter, self.get_ident(request))]
+
+    def allow_request(self, request, view):
+        for limiter, key in self.limits(request):
+            wait = limiter.wait_time(key)
+            if wait:
+                self.wait_seconds = wait
+                return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class PlayerActionThrottle(BucketThrottle):
+    """Per client IP, then per player token"""
+
+    def limits(self, request):
+        limits = super().limits(request)
+        token = request.headers.get('X-Player-Token')
+        if token:
+            limits.append((action_limiter, token))
+        return limits
+
+
+class JoinThrottle(BucketThrottle):
+    """Per client IP, with a tighter budget for joins"""
+
+    def limits(self, request):
+        return super().limits(request) + [(join_limiter, self.get_ident(request))]
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RoomViewSet, PlayerViewSet, GameLogViewSet
+from .views import RoomViewSet, PlayerViewSet, GameLogViewSet, AnalyticsViewSet
 
 router = DefaultRouter()
 router.register(r'rooms', RoomViewSet, basename='room')
 router.register(r'players', PlayerViewSet, basename='player')
 router.register(r'logs', GameLogViewSet, basename='gamelog')
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
     path('', include(router.urls)),
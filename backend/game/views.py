@@ -1,26 +1,45 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from django.utils import timezone
 import secrets
 
-from .models import Room, Player, GameState, Action, Vote, GameLog
+from .models import Room, Player, Action, GameLog
 from .serializers import (
-    RoomSerializer, RoomCreateSerializer, PlayerSerializer, 
-    PlayerDetailSerializer, GameStateSerializer, ActionSerializer,
-    VoteSerializer, GameLogSerializer, JoinRoomSerializer,
-    NightActionSerializer, VoteSubmitSerializer, LeaderElectionSerializer,
-    SpeakingControlSerializer
+    RoomSerializer, RoomCreateSerializer, PlayerSerializer,
+    GameLogSerializer, JoinRoomSerializer,
+    NightActionSerializer, VoteSubmitSerializer,
+    SpeakingControlSerializer, GameEventSerializer, BulkProvisionSerializer,
+    LobbyFilterSerializer, AddBotsSerializer
 )
+from .fast_serializers import serialize_room, serialize_player
 from .game_logic import (
     assign_roles, advance_to_day, advance_to_voting, 
-    resolve_vote, elect_leader, broadcast_game_update,
-    advance_to_night, log_game_event
+    resolve_vote, broadcast_game_update,
+    log_game_event, needs_leader,
+    advance_to_leader_election, resolve_leader_election
 )
+from .events import record_event, history
+from .lobby import lobby_page, notify_lobby
+from .hotstate import get_store
+from .db_routers import pin_to_primary
+from .metrics import timed
+from .throttles import PlayerActionThrottle, JoinThrottle
+from .idempotency import idempotent
+from .etags import conditional, player_room_code
+from .projections import projection, log_tail
+from .player_actions import submit_night_action, submit_vote
+
+BUNDLE_SECTIONS = ('room', 'players', 'game_state', 'you', 'logs')
 
 class RoomViewSet(viewsets.ModelViewSet):
-    queryset = Room.objects.all()
+    queryset = Room.objects.prefetch_related('players')
     serializer_class = RoomSerializer
     lookup_field = 'code'
     
@@ -38,18 +57,66 @@ class RoomViewSet(viewsets.ModelViewSet):
         admin_token = secrets.token_urlsafe(24)
         
         room = serializer.save(admin_token=admin_token)
+        pin_to_primary(room.code)
+        notify_lobby(room)
         
         return Response({
-            'room': RoomSerializer(room).data,
+            'room': serialize_room(room),
             'admin_token': admin_token
         }, status=status.HTTP_201_CREATED)
     
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many rooms with preassigned players (requires provisioning token)"""
+        provisioning_token = request.headers.get('X-Provisioning-Token')
+        if not settings.PROVISIONING_TOKEN or provisioning_token != settings.PROVISIONING_TOKEN:
+            return Response(
+                {'error': 'Unauthorized'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = BulkProvisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        # Rarely used; kept off the import path of a cold-started worker
+        from .provisioning import provision_rooms
+        rooms = provision_rooms(
+            serializer.validated_data['rooms'],
+            start=serializer.validated_data['start']
+        )
+        if not serializer.validated_data['start']:
+            notify_lobby()
+        
+        return Response({'rooms': rooms}, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'])
+    def lobby(self, request):
+        """Open rooms, newest first, filtered and keyset-paginated"""
+        serializer = LobbyFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        
+        filters = dict(serializer.validated_data)
+        cursor = filters.pop('cursor', None)
+        limit = filters.pop('limit')
+        
+        try:
+            page = lobby_page(filters, cursor=cursor, limit=limit)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid cursor'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(page)
+    
+    @conditional(lambda request, kwargs: kwargs['code'], per_player=True)
     def retrieve(self, request, code=None):
-        """Get room details"""
+        """Get room details, with the roles the caller may see"""
         room = get_object_or_404(Room, code=code)
-        return Response(RoomSerializer(room).data)
+        view = projection(room).view(request.headers.get('X-Player-Token'))
+        return Response({**view['room'], 'players': view['players'], 'you': view['you']})
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[JoinThrottle])
     def join(self, request, code=None):
         """Join a room"""
         room = get_object_or_404(Room, code=code)
@@ -60,7 +127,7 @@ class RoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if room.players.count() >= room.max_players:
+        if room.player_count >= room.max_players:
             return Response(
                 {'error': 'Room is full'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -78,13 +145,25 @@ class RoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create player
+        # Claim a slot and create the player together, so concurrent joins
+        # can't overfill the room
         player_token = secrets.token_urlsafe(24)
-        player = Player.objects.create(
-            room=room,
-            nickname=nickname,
-            token=player_token
-        )
+        with transaction.atomic():
+            claimed = Room.objects.filter(
+                pk=room.pk, status='waiting', player_count__lt=F('max_players')
+            ).update(player_count=F('player_count') + 1)
+            if not claimed:
+                return Response(
+                    {'error': 'Room is full'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            player = Player.objects.create(
+                room=room,
+                nickname=nickname,
+                token=player_token
+            )
+        room.refresh_from_db(fields=['player_count', 'status'])
+        notify_lobby(room)
         
         # Broadcast to room
         broadcast_game_update(room, {
@@ -96,10 +175,75 @@ class RoomViewSet(viewsets.ModelViewSet):
         })
         
         return Response({
-            'player': PlayerDetailSerializer(player).data,
+            'player': serialize_player(player),
             'player_token': player_token
         }, status=status.HTTP_201_CREATED)
     
+    @action(detail=True, methods=['post'])
+    def add_bots(self, request, code=None):
+        """Fill empty seats with server-side bots (admin only)"""
+        room = get_object_or_404(Room, code=code)
+        
+        admin_token = request.headers.get('X-Admin-Token')
+        if admin_token != room.admin_token:
+            return Response(
+                {'error': 'Unauthorized'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        if room.status != 'waiting':
+            return Response(
+                {'error': 'Room is not accepting players'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = AddBotsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        count = serializer.validated_data.get('count', room.max_players - room.player_count)
+        
+        taken = set(room.players.values_list('nickname', flat=True))
+        names = (f'Bot {n}' for n in range(1, room.max_players + count + 1))
+        added = []
+        for nickname in names:
+            if len(added) == count:
+                break
+            if nickname in taken:
+                continue
+            # Same slot claim as join
+            with transaction.atomic():
+                claimed = Room.objects.filter(
+                    pk=room.pk, status='waiting', player_count__lt=F('max_players')
+                ).update(player_count=F('player_count') + 1)
+                if not claimed:
+                    break
+                added.append(Player.objects.create(
+                    room=room,
+                    nickname=nickname,
+                    token=secrets.token_urlsafe(24),
+                    is_bot=True
+                ))
+        
+        if not added:
+            return Response(
+                {'error': 'Room is full'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        room.refresh_from_db(fields=['player_count', 'status'])
+        notify_lobby(room)
+        
+        for player in added:
+            broadcast_game_update(room, {
+                'type': 'player_joined',
+                'player': {
+                    'id': player.id,
+                    'nickname': player.nickname
+                }
+            })
+        
+        return Response({
+            'players': [serialize_player(player) for player in added]
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'])
     def start_game(self, request, code=None):
         """Start the game (admin only)"""
@@ -132,6 +276,7 @@ class RoomViewSet(viewsets.ModelViewSet):
                 {'error': message},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        notify_lobby(room)
         
         return Response({
             'message': 'Game started',
@@ -159,8 +304,14 @@ class RoomViewSet(viewsets.ModelViewSet):
             advance_to_day(room)
             return Response({'message': 'Advanced to day'})
         elif current_phase == 'day':
+            if needs_leader(room):
+                advance_to_leader_election(room)
+                return Response({'message': 'Advanced to leader election'})
             advance_to_voting(room)
             return Response({'message': 'Advanced to voting'})
+        elif current_phase == 'leader_election':
+            resolve_leader_election(room)
+            return Response({'message': 'Leader election resolved'})
         elif current_phase == 'voting':
             resolve_vote(room)
             return Response({'message': 'Votes resolved'})
@@ -171,24 +322,77 @@ class RoomViewSet(viewsets.ModelViewSet):
             )
     
     @action(detail=True, methods=['get'])
+    @conditional(lambda request, kwargs: kwargs['code'], weak=True)
     def state(self, request, code=None):
         """Get current game state"""
         room = get_object_or_404(Room, code=code)
         
-        try:
-            game_state = room.game_state
-            return Response(GameStateSerializer(game_state).data)
-        except GameState.DoesNotExist:
+        game_state = projection(room).view()['game_state']
+        if game_state is None:
             return Response(
                 {'error': 'Game not started'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(game_state)
+
+    @action(detail=True, methods=['get'])
+    @conditional(lambda request, kwargs: kwargs['code'], per_player=True, weak=True)
+    def bundle(self, request, code=None):
+        """Room, players, game state, your role and the log tail in one response (?fields= picks sections)"""
+        fields = request.query_params.get('fields')
+        sections = [name for name in fields.split(',') if name] if fields else BUNDLE_SECTIONS
+        unknown = sorted(set(sections) - set(BUNDLE_SECTIONS))
+        if unknown:
+            return Response(
+                {'error': f"Unknown fields: {', '.join(unknown)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # The game state rides along for the views if they have to be rendered
+        room = get_object_or_404(Room.objects.select_related('game_state'), code=code)
+        token = request.headers.get('X-Player-Token')
+        views = projection(room)
+        view = views.view(token)
+        data = {name: view[name] for name in sections if name != 'logs'}
+        if 'logs' in sections:
+            data['logs'] = log_tail(room, everything=views.sees_everything(token))
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, code=None):
+        """Typed event history, optionally for one ?night= or ?day= (admin only until the game ends)"""
+        room = get_object_or_404(Room, code=code)
+        
+        if room.status != 'finished':
+            admin_token = request.headers.get('X-Admin-Token')
+            if admin_token != room.admin_token:
+                return Response(
+                    {'error': 'Unauthorized'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        try:
+            night = request.query_params.get('night')
+            day = request.query_params.get('day')
+            events = history(
+                room,
+                night_number=int(night) if night else None,
+                day_number=int(day) if day else None
+            )
+        except ValueError:
+            return Response(
+                {'error': 'night and day must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(GameEventSerializer(events, many=True).data)
 
 class PlayerViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
     
     @action(detail=True, methods=['get'])
+    @conditional(lambda request, kwargs: player_room_code(kwargs['pk']), per_player=True)
     def role(self, request, pk=None):
         """Get player's role (requires player token)"""
         player = get_object_or_404(Player, pk=pk)
@@ -205,12 +409,13 @@ class PlayerViewSet(viewsets.ReadOnlyModelViewSet):
             'role_display': player.get_role_display()
         })
     
-    @action(detail=True, methods=['post'])
-    def night_action(self, request, pk=None):
-        """Submit night action"""
+    @action(detail=True, methods=['post'], throttle_classes=[PlayerActionThrottle])
+    @idempotent
+    @timed('speaking')
+    def speaking(self, request, pk=None):
+        """Pass the floor (current speaker) or start another round of turns (leader)"""
         player = get_object_or_404(Player, pk=pk)
         
-        # Verify player token
         player_token = request.headers.get('X-Player-Token')
         if player_token != player.token:
             return Response(
@@ -218,98 +423,62 @@ class PlayerViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        if not player.is_alive:
+        serializer = SpeakingControlSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        from .speaking import pass_turn, start_round
+        if serializer.validated_data['action'] == 'pass':
+            message, error = pass_turn(player)
+        elif not player.is_leader:
             return Response(
-                {'error': 'Dead players cannot act'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': 'Only the leader can start a speaking round'},
+                status=status.HTTP_403_FORBIDDEN
             )
+        else:
+            message, error = start_round(player.room)
         
-        game_state = player.room.game_state
-        if game_state.phase != 'night':
+        if error:
             return Response(
-                {'error': 'Not night phase'},
+                {'error': error},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        serializer = NightActionSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        
-        target_id = serializer.validated_data['target_id']
-        target = get_object_or_404(Player, id=target_id, room=player.room)
+        broadcast_game_update(player.room, message)
+        return Response(message)
+    
+    @action(detail=True, methods=['post'], throttle_classes=[PlayerActionThrottle])
+    @idempotent
+    @timed('night_action')
+    def night_action(self, request, pk=None):
+        """Submit night action"""
+        player = get_object_or_404(Player, pk=pk)
         
-        if not target.is_alive:
+        # Verify player token
+        player_token = request.headers.get('X-Player-Token')
+        if player_token != player.token:
             return Response(
-                {'error': 'Cannot target dead player'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': 'Unauthorized'},
+                status=status.HTTP_403_FORBIDDEN
             )
         
-        # Determine action type based on role
-        action_type_map = {
-            'wolf': 'wolf_vote',
-            'seer': 'seer_inspect',
-            'protector': 'protector_protect'
-        }
+        serializer = NightActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
         
-        action_type = action_type_map.get(player.role)
-        if not action_type:
-            return Response(
-                {'error': 'Your role has no night action'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        target_id = serializer.validated_data['target_id']
+        target = get_object_or_404(Player, id=target_id, room=player.room)
         
-        # Protector cannot protect same player twice
-        if player.role == 'protector' and player.last_protected_player_id == target.id:
+        response_data, error = submit_night_action(player, target)
+        if error:
             return Response(
-                {'error': 'Cannot protect same player twice in a row'},
+                {'error': error},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create or update action
-        action, created = Action.objects.update_or_create(
-            player=player,
-            action_type=action_type,
-            night_number=game_state.night_number,
-            defaults={
-                'target': target,
-                'result_data': {'target_role': target.role} if player.role == 'seer' else None
-            }
-        )
-        
-        # Update protector tracking
-        if player.role == 'protector':
-            player.last_protected_player_id = target.id
-            player.save()
-        
-        # Update game state flags
-        if player.role == 'wolf':
-            # Check if all wolves voted
-            wolves = player.room.players.filter(role='wolf', is_alive=True)
-            wolf_votes = Action.objects.filter(
-                player__in=wolves,
-                action_type='wolf_vote',
-                night_number=game_state.night_number
-            ).count()
-            
-            if wolf_votes == wolves.count():
-                game_state.wolves_voted = True
-                game_state.save()
-        elif player.role == 'seer':
-            game_state.seer_acted = True
-            game_state.save()
-        elif player.role == 'protector':
-            game_state.protector_acted = True
-            game_state.save()
-        
-        response_data = {'message': 'Action submitted'}
-        if player.role == 'seer':
-            response_data['result'] = {
-                'target_nickname': target.nickname,
-                'target_role': target.role
-            }
-        
         return Response(response_data)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[PlayerActionThrottle])
+    @idempotent
+    @timed('vote')
     def vote(self, request, pk=None):
         """Submit vote"""
         player = get_object_or_404(Player, pk=pk)
@@ -322,49 +491,24 @@ class PlayerViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        if not player.is_alive:
-            return Response(
-                {'error': 'Dead players cannot vote'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        game_state = player.room.game_state
-        
-        if game_state.phase not in ['voting', 'leader_election']:
-            return Response(
-                {'error': 'Not a voting phase'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
         serializer = VoteSubmitSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         target_id = serializer.validated_data['target_id']
         target = get_object_or_404(Player, id=target_id, room=player.room)
         
-        if not target.is_alive:
+        response_data, error = submit_vote(player, target)
+        if error:
             return Response(
-                {'error': 'Cannot vote for dead player'},
+                {'error': error},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        vote_type = 'leader' if game_state.phase == 'leader_election' else 'elimination'
-        vote_phase = game_state.day_number
-        
-        # Create or update vote
-        vote, created = Vote.objects.update_or_create(
-            player=player,
-            vote_type=vote_type,
-            vote_phase=vote_phase,
-            defaults={'target': target}
-        )
-        
-        return Response({
-            'message': 'Vote submitted',
-            'vote': VoteSerializer(vote).data
-        })
+        return Response(response_data)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], throttle_classes=[PlayerActionThrottle])
+    @idempotent
+    @timed('hunter_revenge')
     def hunter_revenge(self, request, pk=None):
         """Hunter's revenge kill"""
         player = get_object_or_404(Player, pk=pk)
@@ -401,9 +545,27 @@ class PlayerViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Kill target
-        target.is_alive = False
-        target.save()
+        # One shot per hunter: the constraint on hunter_kill Actions makes a
+        # retried or concurrent second request fail here instead of killing again
+        game_state = player.room.game_state
+        try:
+            with transaction.atomic():
+                Action.objects.create(
+                    player=player, action_type='hunter_kill', target=target,
+                    night_number=game_state.night_number
+                )
+                # Kill target
+                target.is_alive = False
+                target.save()
+        except IntegrityError:
+            return Response(
+                {'error': 'Revenge already taken'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        get_store().player_died(player.room, target.id)
+        record_event(player.room, 'killed', player_id=target.id, cause='hunter',
+                     hunter_id=player.id, night_number=game_state.night_number,
+                     day_number=game_state.day_number)
         
         log_game_event(
             player.room, 
@@ -423,6 +585,58 @@ class PlayerViewSet(viewsets.ReadOnlyModelViewSet):
         
         return Response({'message': 'Hunter revenge executed'})
 
+class AnalyticsViewSet(viewsets.ViewSet):
+    """Finished games as columnar tables (see analytics.py)"""
+    
+    def retrieve(self, request, pk=None):
+        """Stream one table: games, players, actions or votes (requires analytics token)"""
+        analytics_token = request.headers.get('X-Analytics-Token')
+        if not settings.ANALYTICS_TOKEN or analytics_token != settings.ANALYTICS_TOKEN:
+            return Response(
+                {'error': 'Unauthorized'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # Rarely used and pulls in pyarrow; kept off the import path of a cold-started worker
+        from . import analytics
+        if pk not in analytics.TABLES:
+            return Response(
+                {'error': f"Unknown table, expected one of {', '.join(analytics.TABLES)}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Not ?format=, which DRF keeps for picking a renderer
+        format = request.query_params.get('output', analytics.default_format())
+        if format not in analytics.FORMATS:
+            return Response(
+                {'error': f"Unknown output, expected one of {', '.join(analytics.FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if format == 'parquet' and analytics.pyarrow is None:
+            return Response(
+                {'error': 'Parquet export requires pyarrow on the server'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        since = request.query_params.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response(
+                    {'error': 'since must be an ISO 8601 timestamp'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        until = timezone.now() - analytics.SETTLE
+        
+        response = StreamingHttpResponse(
+            analytics.stream_table_async(pk, format, since or None, until),
+            content_type='text/csv' if format == 'csv' else 'application/vnd.apache.parquet'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{pk}.{format}"'
+        # Pass back as since= to get only games finished after this export
+        response['X-Export-Until'] = until.isoformat().replace('+00:00', 'Z')
+        return response
+
 class GameLogViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = GameLogSerializer
     
@@ -431,3 +645,15 @@ class GameLogViewSet(viewsets.ReadOnlyModelViewSet):
         if room_code:
             return GameLog.objects.filter(room__code=room_code)
         return GameLog.objects.none()
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        room = Room.objects.filter(code=self.request.query_params.get('room_code')).first()
+        context['everything'] = room is not None and projection(room).sees_everything(
+            self.request.headers.get('X-Player-Token')
+        )
+        return context
+    
+    @conditional(lambda request, kwargs: request.query_params.get('room_code'), per_player=True)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
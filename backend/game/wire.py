@@ -0,0 +1,159 @@
+"""WebSocket wire formats negotiated through the Sec-WebSocket-Protocol header.
+
+JSON stays the default. Clients that offer one of the subprotocols below get
+a more compact encoding:
+
+- ``loupgarou.compact``: JSON text where every list of same-shaped objects
+  (players, deaths, ...) is sent column-wise as ``{"$cols": [...], "$rows": [[...]]}``
+  so keys like ``nickname``/``is_alive``/``is_leader`` appear once per frame.
+- ``loupgarou.msgpack``: the same packed structure as MessagePack binary frames.
+
+Group broadcasts carry the message itself plus a frame id (see broadcast).
+Each worker encodes a broadcast lazily, once per codec its own sockets
+actually use, and the rest of its sockets reuse those bytes.
+"""
+import json
+import uuid
+from collections import OrderedDict
+
+try:
+    import msgpack
+except ImportError:  # shipped with channels-redis, but keep it optional
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # optional speedup for the JSON codecs
+    orjson = None
+
+
+def dumps(message):
+    """Compact JSON text, through orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(message).decode('utf-8')
+    return json.dumps(message, separators=(',', ':'), ensure_ascii=False)
+
+
+def pack_records(value):
+    """Recursively turn lists of same-keyed dicts into a columnar table"""
+    if isinstance(value, dict):
+        return {key: pack_records(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if (
+            len(value) > 1
+            and all(isinstance(item, dict) for item in value)
+            and all(item.keys() == value[0].keys() for item in value)
+        ):
+            cols = list(value[0].keys())
+            return {
+                '$cols': cols,
+                '$rows': [[pack_records(item[col]) for col in cols] for item in value],
+            }
+        return [pack_records(item) for item in value]
+    return value
+
+
+def unpack_records(value):
+    """Inverse of pack_records"""
+    if isinstance(value, dict):
+        if '$cols' in value and '$rows' in value:
+            cols = value['$cols']
+            return [
+                {col: unpack_records(item) for col, item in zip(cols, row)}
+                for row in value['$rows']
+            ]
+        return {key: unpack_records(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [unpack_records(item) for item in value]
+    return value
+
+
+class JsonCodec:
+    name = 'json'
+    subprotocol = 'loupgarou.json'
+    binary = False
+    packed = False
+
+    def encode(self, message):
+        return self.serialize(pack_records(message) if self.packed else message)
+
+    def serialize(self, value):
+        return dumps(value)
+
+    def decode(self, payload):
+        if orjson is not None:
+            value = orjson.loads(payload)
+        else:
+            value = json.loads(payload)
+        return unpack_records(value) if self.packed else value
+
+
+class CompactJsonCodec(JsonCodec):
+    name = 'compact'
+    subprotocol = 'loupgarou.compact'
+    packed = True
+
+
+class MsgpackCodec(JsonCodec):
+    name = 'msgpack'
+    subprotocol = 'loupgarou.msgpack'
+    binary = True
+    packed = True
+
+    def serialize(self, value):
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, payload):
+        return unpack_records(msgpack.unpackb(payload, raw=False))
+
+
+DEFAULT_CODEC = JsonCodec()
+
+CODECS = {codec.subprotocol: codec for codec in (DEFAULT_CODEC, CompactJsonCodec())}
+if msgpack is not None:
+    CODECS[MsgpackCodec.subprotocol] = MsgpackCodec()
+
+
+def encode_frames(message):
+    """Encode a message with every codec, for fixed messages built once"""
+    packed = pack_records(message)
+    return {
+        codec.name: codec.serialize(packed if codec.packed else message)
+        for codec in CODECS.values()
+    }
+
+
+def broadcast(message):
+    """Channel-layer fields for a group broadcast of message (see frame_for)"""
+    return {'frame_id': uuid.uuid4().hex, 'message': message}
+
+
+# (frame id, codec name) -> payload, for the broadcasts this worker is fanning out.
+# Only touched from the worker's event loop, so no lock
+_frames = OrderedDict()
+FRAME_CACHE_SIZE = 256
+
+
+def frame_for(event, codec):
+    """The broadcast encoded with codec, encoded on the first socket that needs it"""
+    key = (event['frame_id'], codec.name)
+    payload = _frames.get(key)
+    if payload is None:
+        payload = codec.encode(event['message'])
+        _frames[key] = payload
+        if len(_frames) > FRAME_CACHE_SIZE:
+            _frames.popitem(last=False)
+    return payload
+
+
+def negotiate(subprotocols):
+    """Pick the first client-offered subprotocol we support.
+
+    Returns ``(codec, subprotocol)``; subprotocol is None when the client did
+    not offer any we know, in which case the handshake must not echo one.
+    """
+    for subprotocol in subprotocols or ():
+        codec = CODECS.get(subprotocol)
+        if codec is not None:
+            return codec, subprotocol
+    return DEFAULT_CODEC, None
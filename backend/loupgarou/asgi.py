@@ -1,7 +1,7 @@
 import os
+from django.apps import apps
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'loupgarou.settings')
@@ -9,12 +9,26 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'loupgarou.settings')
 django_asgi_app = get_asgi_application()
 
 from game.routing import websocket_urlpatterns
+from game.scheduler import scheduler
+
+
+def recover_deadlines():
+    from game.game_logic import recover_deadlines
+    recover_deadlines()
+
+
+# Deadline wakeups died with the previous process: re-arm them, off the
+# import path, on the scheduler's own thread
+scheduler.schedule('recover-deadlines', 0, recover_deadlines)
+
+websocket_app = URLRouter(websocket_urlpatterns)
+# Consumers authenticate with player/admin tokens; the session user is only
+# attached when auth is installed (not in the settings_api profile)
+if apps.is_installed('django.contrib.auth'):
+    from channels.auth import AuthMiddlewareStack
+    websocket_app = AuthMiddlewareStack(websocket_app)
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
-    "websocket": AllowedHostsOriginValidator(
-        AuthMiddlewareStack(
-            URLRouter(websocket_urlpatterns)
-        )
-    ),
+    "websocket": AllowedHostsOriginValidator(websocket_app),
 })
@@ -34,6 +34,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'game.db_routers.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'loupgarou.urls'
@@ -74,6 +75,18 @@ else:
         }
     }
 
+# Optional read replica for pure reads (see game/db_routers.py). Locally it
+# can be a second SQLite file, e.g. DATABASE_REPLICA_URL=sqlite:///replica.sqlite3
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.config(
+        env='DATABASE_REPLICA_URL',
+        conn_max_age=600,
+        conn_health_checks=True,
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['game.db_routers.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,7 +130,10 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
     'x-admin-token',
     'x-player-token',
+    'idempotency-key',
+    'if-none-match',
 ]
+CORS_EXPOSE_HEADERS = ['etag']
 
 # CSRF Settings
 CSRF_TRUSTED_ORIGINS = [
@@ -136,12 +152,116 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache (lobby pages); shared through Redis when REDIS_URL is set
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': redis_url,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'game.renderers.FastJSONRenderer',
     ],
+    # Proxies in front of the app that append to X-Forwarded-For (Render: 1).
+    # Client IPs (rate limits) come from those entries only; 0 means REMOTE_ADDR
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
 }
+
+# Room lifecycle (see game/lifecycle.py and `manage.py reap_rooms`)
+ROOM_WAITING_TTL_MINUTES = int(os.getenv('ROOM_WAITING_TTL_MINUTES', '60'))
+ROOM_ARCHIVE_GRACE_MINUTES = int(os.getenv('ROOM_ARCHIVE_GRACE_MINUTES', '30'))
+ROOM_REAPER_BATCH_SIZE = int(os.getenv('ROOM_REAPER_BATCH_SIZE', '200'))
+
+# Spectators (see game/spectators.py)
+SPECTATOR_DELAY_SECONDS = float(os.getenv('SPECTATOR_DELAY_SECONDS', '15'))
+SPECTATOR_BUFFER_SIZE = int(os.getenv('SPECTATOR_BUFFER_SIZE', '200'))
+SPECTATOR_QUEUE_SIZE = int(os.getenv('SPECTATOR_QUEUE_SIZE', '64'))
+
+# WebSocket admission control (per worker process)
+WS_CONNECT_RATE = float(os.getenv('WS_CONNECT_RATE', '200'))
+WS_CONNECT_BURST = int(os.getenv('WS_CONNECT_BURST', '500'))
+WS_RETRY_JITTER_SECONDS = float(os.getenv('WS_RETRY_JITTER_SECONDS', '5'))
+
+# WebSocket heartbeats and idle socket reaping (see game/presence.py)
+WS_HEARTBEAT_INTERVAL = float(os.getenv('WS_HEARTBEAT_INTERVAL', '20'))
+WS_HEARTBEAT_TIMEOUT = float(os.getenv('WS_HEARTBEAT_TIMEOUT', '60'))
+
+# Bulk room provisioning (POST /api/rooms/bulk/, disabled unless a token is set)
+PROVISIONING_TOKEN = os.getenv('PROVISIONING_TOKEN', '')
+PROVISIONING_MAX_ROOMS = int(os.getenv('PROVISIONING_MAX_ROOMS', '1000'))
+
+# Room codes are reserved from a shared counter this many at a time per process
+ROOM_CODE_BLOCK_SIZE = int(os.getenv('ROOM_CODE_BLOCK_SIZE', '100'))
+
+# Lobby listing (see game/lobby.py)
+LOBBY_CACHE_SECONDS = int(os.getenv('LOBBY_CACHE_SECONDS', '5'))
+LOBBY_MAX_PAGE_SIZE = int(os.getenv('LOBBY_MAX_PAGE_SIZE', '100'))
+
+# Leader election and tie-breaks (see game/elections.py), in seconds
+LEADER_ELECTION_SECONDS = int(os.getenv('LEADER_ELECTION_SECONDS', '120'))
+BALLOT_RUNOFF_SECONDS = int(os.getenv('BALLOT_RUNOFF_SECONDS', '60'))
+BALLOT_RUNOFF_ROUNDS = int(os.getenv('BALLOT_RUNOFF_ROUNDS', '1'))
+LEADER_DECISION_SECONDS = int(os.getenv('LEADER_DECISION_SECONDS', '30'))
+
+# Reads for a room or token stay on the primary this long after a write
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+# Where running games keep night actions and ballots: 'db' or 'redis' (see game/hotstate.py)
+GAME_STATE_BACKEND = os.getenv('GAME_STATE_BACKEND', 'db')
+GAME_STATE_REDIS_URL = os.getenv('GAME_STATE_REDIS_URL', redis_url)
+GAME_STATE_TTL_SECONDS = int(os.getenv('GAME_STATE_TTL_SECONDS', str(6 * 3600)))
+
+# Ops console (/admin/ops/, see game/metrics.py)
+METRICS_LATENCY_WINDOW = int(os.getenv('METRICS_LATENCY_WINDOW', '1000'))
+OPS_STUCK_GRACE_SECONDS = int(os.getenv('OPS_STUCK_GRACE_SECONDS', '30'))
+OPS_STUCK_LIMIT = int(os.getenv('OPS_STUCK_LIMIT', '50'))
+
+# Per-viewer room views are cached per room version this long (see game/projections.py)
+PROJECTION_CACHE_SECONDS = int(os.getenv('PROJECTION_CACHE_SECONDS', '300'))
+
+# Server-side bots (see game/bots.py)
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '2'))
+BOT_QUEUE_SIZE = int(os.getenv('BOT_QUEUE_SIZE', '1000'))
+BOT_DECISION_BUDGET_MS = float(os.getenv('BOT_DECISION_BUDGET_MS', '5'))
+
+# Rate limits (see game/throttles.py): tokens per second and burst size, per
+# client IP, per player token on player actions and per IP on joins
+RATELIMIT_IP_RATE = float(os.getenv('RATELIMIT_IP_RATE', '20'))
+RATELIMIT_IP_BURST = int(os.getenv('RATELIMIT_IP_BURST', '60'))
+RATELIMIT_ACTION_RATE = float(os.getenv('RATELIMIT_ACTION_RATE', '2'))
+RATELIMIT_ACTION_BURST = int(os.getenv('RATELIMIT_ACTION_BURST', '10'))
+RATELIMIT_JOIN_RATE = float(os.getenv('RATELIMIT_JOIN_RATE', '1'))
+RATELIMIT_JOIN_BURST = int(os.getenv('RATELIMIT_JOIN_BURST', '20'))
+RATELIMIT_MAX_KEYS = int(os.getenv('RATELIMIT_MAX_KEYS', '100000'))
+# Shared tier so limits hold across workers; unset keeps them per process
+RATELIMIT_REDIS_URL = os.getenv('RATELIMIT_REDIS_URL', '')
+# Messages a socket may send (ping, identify, request_state)
+WS_MESSAGE_RATE = float(os.getenv('WS_MESSAGE_RATE', '5'))
+WS_MESSAGE_BURST = int(os.getenv('WS_MESSAGE_BURST', '20'))
+
+# Successful player actions replayed for a retried Idempotency-Key (see game/idempotency.py)
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '300'))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', '50000'))
+
+# Analytics export of finished games (see game/analytics.py); the endpoint is off without a token
+ANALYTICS_TOKEN = os.getenv('ANALYTICS_TOKEN', '')
+ANALYTICS_BATCH_SIZE = int(os.getenv('ANALYTICS_BATCH_SIZE', '200'))
+
+# Room versions are cached by code this long for conditional GETs (see game/etags.py)
+ROOM_VERSION_CACHE_SECONDS = int(os.getenv('ROOM_VERSION_CACHE_SECONDS', '300'))
+
+# Log entries included in GET /api/rooms/{code}/bundle/
+ROOM_BUNDLE_LOG_TAIL = int(os.getenv('ROOM_BUNDLE_LOG_TAIL', '50'))
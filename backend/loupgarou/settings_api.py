@@ -0,0 +1,35 @@
+"""Startup-optimized profile for the API/WebSocket server.
+
+Same configuration as settings.py minus everything the game API never
+touches: the admin, auth, sessions, messages and staticfiles apps and
+their middleware, and the daphne app (it only adds `runserver`). A
+process started with it doesn't serve /admin/, so use it only for API
+servers deployed next to one running the default settings; run
+collectstatic, migrate and the management commands with the defaults.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'rest_framework',
+    'channels',
+    'corsheaders',
+    'game',
+]
+
+MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'game.db_routers.ReplicaMiddleware',
+]
+
+ROOT_URLCONF = 'loupgarou.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,  # noqa: F405
+    # Players authenticate with X-Player-Token/X-Admin-Token, not Django users
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'UNAUTHENTICATED_USER': None,
+}
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from game.admin import ops_console
 
 urlpatterns = [
+    path('admin/ops/', admin.site.admin_view(ops_console), name='ops_console'),
     path('admin/', admin.site.urls),
     path('api/', include('game.urls')),
 ]
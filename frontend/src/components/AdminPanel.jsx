@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { useGameStore } from '../store/gameStore';
-import { startGame, advancePhase, getRoom, getGameState } from '../services/api';
+import { startGame, addBots, advancePhase, getRoomBundle } from '../services/api';
 
 const AdminPanel = () => {
   const { roomCode, adminToken, room, gameState, setRoom, setGameState, addNotification } = useGameStore();
@@ -8,12 +8,11 @@ const AdminPanel = () => {
 
   const refreshGameState = async () => {
     try {
-      const [roomData, stateData] = await Promise.all([
-        getRoom(roomCode),
-        getGameState(roomCode)
-      ]);
-      setRoom(roomData);
-      setGameState(stateData);
+      const bundle = await getRoomBundle(roomCode, null, ['room', 'players', 'game_state']);
+      setRoom({ ...bundle.room, players: bundle.players });
+      if (bundle.game_state) {
+        setGameState(bundle.game_state);
+      }
     } catch (err) {
       console.error('Failed to refresh game state:', err);
     }
@@ -42,6 +41,19 @@ const AdminPanel = () => {
     }
   };
 
+  const handleAddBots = async () => {
+    setLoading(true);
+    try {
+      const data = await addBots(roomCode, adminToken);
+      addNotification(`${data.players.length} bot(s) joined`, 'success');
+      await refreshGameState();
+    } catch (err) {
+      addNotification(err.response?.data?.error || 'Failed to add bots', 'error');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleAdvancePhase = async () => {
     setLoading(true);
     try {
@@ -68,14 +80,25 @@ const AdminPanel = () => {
       
       <div className="space-y-4">
         {room?.status === 'waiting' && (
-          <button
-            onClick={handleStartGame}
-            disabled={loading}
-            className="w-full bg-green-600 hover:bg-green-700 disabled:bg-gray-600 
-                     py-3 rounded-lg font-bold transition-colors"
-          >
-            {loading ? 'Starting...' : 'Start Game'}
-          </button>
+          <>
+            <button
+              onClick={handleAddBots}
+              disabled={loading || room.player_count >= room.max_players}
+              className="w-full bg-gray-700 hover:bg-gray-800 disabled:bg-gray-600 
+                       py-3 rounded-lg font-bold transition-colors"
+            >
+              Fill Empty Seats with Bots
+            </button>
+
+            <button
+              onClick={handleStartGame}
+              disabled={loading}
+              className="w-full bg-green-600 hover:bg-green-700 disabled:bg-gray-600 
+                       py-3 rounded-lg font-bold transition-colors"
+            >
+              {loading ? 'Starting...' : 'Start Game'}
+            </button>
+          </>
         )}
 
         {room?.status === 'playing' && gameState && (
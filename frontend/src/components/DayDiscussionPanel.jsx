@@ -1,8 +1,20 @@
 import React from 'react';
 import { useGameStore } from '../store/gameStore';
+import { controlSpeaking } from '../services/api';
+import Timer from './Timer';
 
 const DayDiscussionPanel = () => {
-  const { player, players } = useGameStore();
+  const { player, playerToken, players, gameState, addNotification } = useGameStore();
+
+  const speaker = players.find(p => p.id === gameState?.current_speaker_id);
+
+  const handleSpeaking = async (action) => {
+    try {
+      await controlSpeaking(player.id, playerToken, action);
+    } catch (err) {
+      addNotification(err.response?.data?.error || 'Failed to update speaking turn', 'error');
+    }
+  };
 
   return (
     <div className="bg-gray-800 rounded-2xl p-6 shadow-xl">
@@ -14,6 +26,37 @@ const DayDiscussionPanel = () => {
         </p>
       </div>
 
+      <div className="bg-gray-700 rounded-xl p-4 mb-6 text-center">
+        {speaker ? (
+          <>
+            <div className="text-sm text-gray-400 mb-1">Now speaking</div>
+            <div className="text-2xl font-bold mb-3">{speaker.nickname}</div>
+            {/* Counts down locally from the server's deadline; no polling */}
+            {gameState.speaker_ends_at && <Timer endTime={gameState.speaker_ends_at} />}
+            {speaker.id === player?.id && (
+              <button
+                onClick={() => handleSpeaking('pass')}
+                className="mt-4 bg-blue-600 hover:bg-blue-700 px-6 py-2 rounded-lg font-semibold"
+              >
+                Pass the floor
+              </button>
+            )}
+          </>
+        ) : (
+          <>
+            <div className="text-gray-400">Everyone has spoken</div>
+            {player?.is_leader && (
+              <button
+                onClick={() => handleSpeaking('start')}
+                className="mt-4 bg-purple-600 hover:bg-purple-700 px-6 py-2 rounded-lg font-semibold"
+              >
+                Start another round
+              </button>
+            )}
+          </>
+        )}
+      </div>
+
       <div className="bg-yellow-900/30 border-2 border-yellow-600 rounded-xl p-6 mb-6">
         <h4 className="font-bold text-yellow-300 mb-3 text-lg">💡 Discussion Tips:</h4>
         <ul className="space-y-2 text-sm text-yellow-100">
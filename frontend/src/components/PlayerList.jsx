@@ -25,6 +25,9 @@ const PlayerList = ({ players, currentPlayerId }) => {
           {player.is_leader && (
             <span className="text-yellow-500 text-xl">👑</span>
           )}
+          {player.is_bot && (
+            <span className="text-xs bg-gray-600 px-2 py-1 rounded-full">Bot</span>
+          )}
           {player.id === currentPlayerId && (
             <span className="text-xs bg-blue-500 px-2 py-1 rounded-full">You</span>
           )}
@@ -1,13 +1,14 @@
 import React, { useState, useEffect } from 'react';
+import websocketService from '../services/websocket';
 
 const Timer = ({ endTime }) => {
   const [timeLeft, setTimeLeft] = useState(0);
 
   useEffect(() => {
     const calculateTimeLeft = () => {
-      const end = new Date(endTime);
-      const now = new Date();
-      const diff = Math.max(0, Math.floor((end - now) / 1000));
+      // Counted down locally against the server's clock, no polling
+      const end = new Date(endTime).getTime();
+      const diff = Math.max(0, Math.floor((end - websocketService.serverNow()) / 1000));
       setTimeLeft(diff);
     };
 
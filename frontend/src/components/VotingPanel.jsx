@@ -3,11 +3,19 @@ import { useGameStore } from '../store/gameStore';
 import { submitVote } from '../services/api';
 
 const VotingPanel = ({ isLeaderElection = false }) => {
-  const { player, playerToken, players, addNotification } = useGameStore();
+  const { player, playerToken, players, gameState, addNotification } = useGameStore();
   const [selectedTarget, setSelectedTarget] = useState(null);
   const [voteSubmitted, setVoteSubmitted] = useState(false);
 
-  const alivePlayers = players.filter(p => p.is_alive && (!isLeaderElection || p.id !== player.id));
+  // In a runoff only the tied players can be chosen
+  const candidates = gameState?.ballot_candidates || [];
+  const tally = gameState?.tally || {};
+
+  const alivePlayers = players.filter(p =>
+    p.is_alive
+    && (!isLeaderElection || p.id !== player.id)
+    && (candidates.length === 0 || candidates.includes(p.id))
+  );
 
   const handleSubmitVote = async () => {
     if (!selectedTarget) {
@@ -24,6 +32,16 @@ const VotingPanel = ({ isLeaderElection = false }) => {
     }
   };
 
+  if (gameState?.leader_decides && !player?.is_leader) {
+    return (
+      <div className="bg-gray-800 rounded-2xl p-8 text-center">
+        <div className="text-6xl mb-4">👑</div>
+        <h3 className="text-2xl font-bold mb-2">Still Tied</h3>
+        <p className="text-gray-400">The leader breaks the tie...</p>
+      </div>
+    );
+  }
+
   if (voteSubmitted) {
     return (
       <div className="bg-green-900 rounded-2xl p-8 text-center">
@@ -44,6 +62,11 @@ const VotingPanel = ({ isLeaderElection = false }) => {
       <div className="text-center mb-6">
         <h3 className="text-2xl font-bold mb-2">{title}</h3>
         <p className="text-gray-400">{description}</p>
+        {gameState?.vote_round > 0 && (
+          <p className="mt-2 text-yellow-400 font-semibold">
+            {gameState.leader_decides ? 'Tie again - you decide!' : `Runoff round ${gameState.vote_round}`}
+          </p>
+        )}
         {player?.is_leader && !isLeaderElection && (
           <div className="mt-3 bg-purple-900 rounded-lg p-3 inline-block">
             <span className="text-yellow-500 font-bold">👑 Your vote counts as 2!</span>
@@ -64,6 +87,7 @@ const VotingPanel = ({ isLeaderElection = false }) => {
           >
             <div className="font-semibold">{p.nickname}</div>
             {p.is_leader && <div className="text-yellow-500 text-sm">👑 Leader</div>}
+            {tally[p.id] > 0 && <div className="text-sm text-gray-300">{tally[p.id]} vote(s)</div>}
           </button>
         ))}
       </div>
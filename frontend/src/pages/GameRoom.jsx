@@ -2,7 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useGameStore } from '../store/gameStore';
 import websocketService from '../services/websocket';
-import { getRoom, getGameState, getPlayerRole } from '../services/api';
+import { getRoomBundle } from '../services/api';
 import RoleRevealModal from '../components/RoleRevealModal';
 import PlayerList from '../components/PlayerList';
 import PhaseIndicator from '../components/PhaseIndicator';
@@ -41,35 +41,31 @@ const GameRoom = () => {
   useEffect(() => {
     // Load from localStorage if needed
     const storedPlayerToken = localStorage.getItem('playerToken');
-    const storedPlayerId = localStorage.getItem('playerId');
     const storedAdminToken = localStorage.getItem('adminToken');
 
     const initializeRoom = async () => {
       try {
-        const roomData = await getRoom(roomCode);
+        const bundle = await getRoomBundle(
+          roomCode, storedPlayerToken, ['room', 'players', 'game_state', 'you']
+        );
+        const roomData = { ...bundle.room, players: bundle.players };
         setRoom(roomData);
         setRoomCode(roomCode);
         setPlayers(roomData.players);
 
         if (roomData.status === 'playing' || roomData.status === 'finished') {
-          const state = await getGameState(roomCode);
-          setGameState(state);
+          setGameState(bundle.game_state);
 
           if (roomData.status === 'finished') {
             setGameEnded(true);
           }
         }
 
-        // Get player role if playing
-        if (storedPlayerToken && storedPlayerId && roomData.status === 'playing') {
-          try {
-            const roleData = await getPlayerRole(storedPlayerId, storedPlayerToken);
-            const playerData = roomData.players.find(p => p.id === parseInt(storedPlayerId));
-            if (playerData) {
-              setPlayer({ ...playerData, role: roleData.role }, storedPlayerToken);
-            }
-          } catch (err) {
-            console.error('Failed to get role:', err);
+        // Set player role if playing
+        if (bundle.you && roomData.status === 'playing') {
+          const playerData = roomData.players.find(p => p.id === bundle.you.id);
+          if (playerData) {
+            setPlayer({ ...playerData, role: bundle.you.role }, storedPlayerToken);
           }
         }
 
@@ -94,8 +90,11 @@ const GameRoom = () => {
           setGameState(data.data.game_state);
         }
         if (data.data.players) {
-          setPlayers(data.data.players);
+          const online = new Set(data.online || []);
+          setPlayers(data.data.players.map(p => ({ ...p, is_online: online.has(p.id) })));
         }
+      } else if (data.type === 'presence') {
+        updatePlayer(data.player_id, { is_online: data.online });
       } else if (data.type === 'game_update') {
         handleGameUpdate(data.data);
       }
@@ -117,7 +116,16 @@ const GameRoom = () => {
         break;
 
       case 'phase_change':
-        setGameState(prev => ({ ...prev, phase: data.phase }));
+        // A new phase opens a fresh ballot (round 0, no runoff candidates)
+        setGameState({
+          ...useGameStore.getState().gameState,
+          phase: data.phase,
+          timer_end: data.timer_end ?? null,
+          vote_round: 0,
+          ballot_candidates: [],
+          leader_decides: false,
+          tally: {},
+        });
         
         if (data.phase === 'night') {
           addNotification(`Night ${data.night_number} begins...`, 'info');
@@ -133,6 +141,38 @@ const GameRoom = () => {
         }
         break;
 
+      case 'speaker_changed':
+        setGameState({
+          ...useGameStore.getState().gameState,
+          current_speaker_id: data.speaker.id,
+          speaker_ends_at: data.ends_at,
+        });
+        break;
+
+      case 'speaking_finished':
+        setGameState({
+          ...useGameStore.getState().gameState,
+          current_speaker_id: null,
+          speaker_ends_at: null,
+        });
+        break;
+
+      case 'runoff':
+        setGameState({
+          ...useGameStore.getState().gameState,
+          vote_round: data.round,
+          ballot_candidates: data.candidates,
+          leader_decides: data.leader_decides,
+          timer_end: data.timer_end,
+          tally: {},
+        });
+        addNotification(data.leader_decides ? 'Still tied - the leader decides' : 'Tie vote - runoff!', 'warning');
+        break;
+
+      case 'vote_tally':
+        setGameState({ ...useGameStore.getState().gameState, tally: data.counts });
+        break;
+
       case 'player_eliminated':
         updatePlayer(data.player.id, { is_alive: false });
         addNotification(`${data.player.nickname} was eliminated! They were ${data.player.role}`, 'error');
@@ -152,6 +192,8 @@ const GameRoom = () => {
       case 'game_ended':
         setGameEnded(true);
         setWinner(data.winner);
+        // Every role is public once the game is over
+        websocketService.send({ type: 'request_state' });
         addNotification(`Game Over! ${data.winner} win!`, 'success');
         break;
 
@@ -195,11 +237,11 @@ const GameRoom = () => {
         )}
 
         {gameState.phase === 'voting' && player?.is_alive && (
-          <VotingPanel />
+          <VotingPanel key={`voting-${gameState.vote_round}`} />
         )}
 
         {gameState.phase === 'leader_election' && player?.is_alive && (
-          <VotingPanel isLeaderElection />
+          <VotingPanel key={`leader-${gameState.vote_round}`} isLeaderElection />
         )}
       </div>
     );
@@ -9,12 +9,32 @@ const api = axios.create({
   },
 });
 
+// Player actions carry an Idempotency-Key and are retried with the same key
+// when the network drops, so the server replays instead of acting twice
+const postPlayerAction = async (url, body, playerToken, retries = 2) => {
+  const headers = { 'X-Player-Token': playerToken, 'Idempotency-Key': crypto.randomUUID() };
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await api.post(url, body, { headers });
+      return response.data;
+    } catch (err) {
+      if (err.response || attempt >= retries) throw err;
+      await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)));
+    }
+  }
+};
+
 // Room APIs
 export const createRoom = async (config) => {
   const response = await api.post('/rooms/', config);
   return response.data;
 };
 
+export const getLobby = async (filters = {}) => {
+  const response = await api.get('/rooms/lobby/', { params: filters });
+  return response.data;
+};
+
 export const getRoom = async (roomCode) => {
   const response = await api.get(`/rooms/${roomCode}/`);
   return response.data;
@@ -36,6 +56,17 @@ export const startGame = async (roomCode, adminToken) => {
   return response.data;
 };
 
+export const addBots = async (roomCode, adminToken, count) => {
+  const response = await api.post(
+    `/rooms/${roomCode}/add_bots/`,
+    count ? { count } : {},
+    {
+      headers: { 'X-Admin-Token': adminToken },
+    }
+  );
+  return response.data;
+};
+
 export const advancePhase = async (roomCode, adminToken) => {
   const response = await api.post(
     `/rooms/${roomCode}/advance_phase/`,
@@ -47,6 +78,16 @@ export const advancePhase = async (roomCode, adminToken) => {
   return response.data;
 };
 
+// Room, players, game state, your role and recent logs in one request;
+// fields narrows it to some of 'room', 'players', 'game_state', 'you', 'logs'
+export const getRoomBundle = async (roomCode, playerToken, fields) => {
+  const response = await api.get(`/rooms/${roomCode}/bundle/`, {
+    params: fields ? { fields: fields.join(',') } : {},
+    headers: playerToken ? { 'X-Player-Token': playerToken } : {},
+  });
+  return response.data;
+};
+
 export const getGameState = async (roomCode) => {
   const response = await api.get(`/rooms/${roomCode}/state/`);
   return response.data;
@@ -61,36 +102,19 @@ export const getPlayerRole = async (playerId, playerToken) => {
 };
 
 export const submitNightAction = async (playerId, playerToken, targetId) => {
-  const response = await api.post(
-    `/players/${playerId}/night_action/`,
-    { target_id: targetId },
-    {
-      headers: { 'X-Player-Token': playerToken },
-    }
-  );
-  return response.data;
+  return postPlayerAction(`/players/${playerId}/night_action/`, { target_id: targetId }, playerToken);
 };
 
 export const submitVote = async (playerId, playerToken, targetId) => {
-  const response = await api.post(
-    `/players/${playerId}/vote/`,
-    { target_id: targetId },
-    {
-      headers: { 'X-Player-Token': playerToken },
-    }
-  );
-  return response.data;
+  return postPlayerAction(`/players/${playerId}/vote/`, { target_id: targetId }, playerToken);
+};
+
+export const controlSpeaking = async (playerId, playerToken, action) => {
+  return postPlayerAction(`/players/${playerId}/speaking/`, { action }, playerToken);
 };
 
 export const hunterRevenge = async (playerId, playerToken, targetId) => {
-  const response = await api.post(
-    `/players/${playerId}/hunter_revenge/`,
-    { target_id: targetId },
-    {
-      headers: { 'X-Player-Token': playerToken },
-    }
-  );
-  return response.data;
+  return postPlayerAction(`/players/${playerId}/hunter_revenge/`, { target_id: targetId }, playerToken);
 };
 
 // Game Logs
@@ -5,6 +5,10 @@ class WebSocketService {
     this.reconnectAttempts = 0;
     this.maxReconnectAttempts = 5;
     this.reconnectDelay = 2000;
+    this.retryAfter = null;
+    // Server clock minus ours, from the clock_sync sample with the smallest round trip
+    this.clockOffset = 0;
+    this.clockRtt = Infinity;
   }
 
   connect(roomCode) {
@@ -16,10 +20,32 @@ class WebSocketService {
     this.ws.onopen = () => {
       console.log('WebSocket connected');
       this.reconnectAttempts = 0;
+
+      // Let the server track our presence if we are a player in this room
+      const playerId = localStorage.getItem('playerId');
+      const token = localStorage.getItem('playerToken');
+      if (playerId && token) {
+        this.send({ type: 'identify', player_id: parseInt(playerId), token });
+      }
+
+      this.syncClock();
     };
 
     this.ws.onmessage = (event) => {
       const data = JSON.parse(event.data);
+      if (data.type === 'heartbeat') {
+        this.send({ type: 'heartbeat_ack' });
+        return;
+      }
+      if (data.type === 'clock_sync') {
+        this.handleClockSync(data);
+        return;
+      }
+      if (data.type === 'retry') {
+        // Server is shedding a reconnect storm; come back when it says so
+        this.retryAfter = data.retry_after_ms;
+        return;
+      }
       this.notifyListeners(data);
     };
 
@@ -34,18 +60,53 @@ class WebSocketService {
   }
 
   attemptReconnect(roomCode) {
+    if (this.retryAfter !== null) {
+      // Admission rejections don't count against the reconnect budget
+      const delay = this.retryAfter;
+      this.retryAfter = null;
+      setTimeout(() => {
+        this.connect(roomCode);
+      }, delay);
+      return;
+    }
+
     if (this.reconnectAttempts < this.maxReconnectAttempts) {
       this.reconnectAttempts++;
       console.log(`Attempting to reconnect (${this.reconnectAttempts}/${this.maxReconnectAttempts})...`);
-      
+
+      // Jitter so clients dropped together don't all come back together
+      const delay = this.reconnectDelay * (0.5 + Math.random());
+
       setTimeout(() => {
         this.connect(roomCode);
-      }, this.reconnectDelay);
+      }, delay);
     } else {
       console.error('Max reconnection attempts reached');
     }
   }
 
+  // Measure the server clock a few times on connect; timers then count down
+  // locally to timer_end and only change when an event carries a new one
+  syncClock(samples = 5, interval = 200) {
+    this.clockRtt = Infinity;
+    for (let i = 0; i < samples; i++) {
+      setTimeout(() => this.send({ type: 'clock_sync', t0: Date.now() }), i * interval);
+    }
+  }
+
+  handleClockSync({ t0, t1, t2 }) {
+    const t3 = Date.now();
+    const rtt = (t3 - t0) - (t2 - t1);
+    if (rtt < this.clockRtt) {
+      this.clockRtt = rtt;
+      this.clockOffset = ((t1 - t0) + (t2 - t3)) / 2;
+    }
+  }
+
+  serverNow() {
+    return Date.now() + this.clockOffset;
+  }
+
   send(data) {
     if (this.ws && this.ws.readyState === WebSocket.OPEN) {
       this.ws.send(JSON.stringify(data));